@@ -1,2 +1,2 @@
 __version__ = "0.1.0"
-from .service import mise_en_forme, redaction  # noqa: F401
+from .service import amise_en_forme, aredaction, mise_en_forme, redaction  # noqa: F401
@@ -1,10 +1,35 @@
-from typing import List, Optional
+import asyncio
+import contextlib
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
-from .service import list_providers, mise_en_forme_by_name, redaction_by_name
+from . import codec, metrics
+from .batch import run_batch
+from .config import Settings
+from .health import CircuitOpenError, HealthProber
+from .jobs import KINDS, JobStore, JobWorkers, job_view
+from .limits import RateLimitTimeout
+from .outbound import BlockedURL
+from .providers import ProviderHTTPError
+from .reload import ConfigWatcher
+from .service import (
+    amise_en_forme_by_name,
+    amise_en_forme_stream_by_name,
+    aredaction_by_name,
+    aredaction_stream_by_name,
+    awarm_up,
+    get_flights,
+    get_registry,
+    list_providers,
+    load_settings,
+    provider_health,
+)
 
 # OpenAPI / Swagger metadata
 tags_metadata = [
@@ -20,8 +45,81 @@ tags_metadata = [
         "name": "mise_en_forme",
         "description": "Endpoints pour transformer un texte en HTML accessible.",
     },
+    {
+        "name": "jobs",
+        "description": (
+            "Travaux en arrière-plan : soumission immédiate, suivi par "
+            "identifiant, webhook optionnel en fin de travail."
+        ),
+    },
+    {
+        "name": "monitoring",
+        "description": (
+            "Compteurs internes (caches, files d'attente) et métriques Prometheus."
+        ),
+    },
 ]
 
+
+def _default_settings() -> Settings:
+    # Jobs and hot reload are set up from the default config
+    try:
+        return load_settings("config.yaml")
+    except Exception:
+        return Settings()  # no usable default config: default settings
+
+
+async def _warm_up(app: FastAPI) -> None:
+    # `GET /ready` answers 200 once this is done; an invalid default config
+    # keeps the service unready
+    try:
+        if os.path.exists("config.yaml"):
+            app.state.warmup = await awarm_up("config.yaml")
+        else:
+            app.state.warmup = {"config": "config.yaml", "providers": {}}
+    except Exception as e:
+        app.state.warmup = {
+            "config": "config.yaml",
+            "error": f"{type(e).__name__}: {e}",
+        }
+        return
+    app.state.ready = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the default config and open provider connections before the first
+    # request, in the background so that `GET /ready` can answer meanwhile
+    app.state.ready = False
+    app.state.warmup = None
+    tasks = [asyncio.create_task(_warm_up(app))]
+    # Probe the providers of the default config (and of any config loaded by
+    # a request) in the background so dead backends open their breaker
+    prober = HealthProber(lambda: get_registry().providers("config.yaml"))
+    tasks.append(asyncio.create_task(prober.run()))
+    settings = _default_settings()
+    # Swap in edited config files without a restart
+    if settings.reload.enabled:
+        watcher = ConfigWatcher(get_registry(), settings.reload)
+        tasks.append(asyncio.create_task(watcher.run()))
+    # Drain the job queue, picking up jobs left by a previous run
+    jobs_config = settings.jobs
+    if jobs_config.enabled:
+        app.state.jobs = JobWorkers(JobStore(jobs_config.path), jobs_config)
+        tasks.append(asyncio.create_task(app.state.jobs.run()))
+    yield
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    if app.state.jobs is not None:
+        app.state.jobs.store.close()
+        app.state.jobs = None
+    # Close the pooled provider HTTP clients cleanly on shutdown
+    await get_registry().aclose()
+
+
 app = FastAPI(
     title="MCP Rédactionnel HTTP API",
     version="0.1.0",
@@ -33,7 +131,11 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/openapi.json",
+    lifespan=lifespan,
 )
+app.state.jobs = None  # JobWorkers, while the app is running
+app.state.ready = False  # set by the startup warm-up
+app.state.warmup = None
 
 # Allow local clients (Postman/Bruno) to call the API conveniently
 app.add_middleware(
@@ -43,14 +145,58 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+class ProviderStatus(BaseModel):
+    state: Optional[str] = Field(
+        None,
+        example="closed",
+        description="Disjoncteur : closed, open, half_open (null si désactivé).",
+    )
+    consecutive_failures: int = 0
+    opened: int = 0
+    rejected: int = 0
+    last_probe_at: Optional[float] = Field(None, description="Horodatage Unix.")
+    last_probe_latency: Optional[float] = Field(
+        None, example=0.012, description="Secondes."
+    )
+    last_probe_error: Optional[str] = None
+    latency_p50: Optional[float] = Field(
+        None, example=1.8, description="Latence des appels (s), fenêtre glissante."
+    )
+    latency_p95: Optional[float] = Field(None, example=4.2)
+    samples: int = 0
 
 
 class ProviderListResponse(BaseModel):
     providers: List[str] = Field(..., example=["mistral_api", "ollama_local"])
+    status: Dict[str, ProviderStatus] = Field(default_factory=dict)
+
+
+class StatsResponse(BaseModel):
+    settings: dict = Field(..., example={"hits": 41, "misses": 1, "entries": 1})
+    responses: dict = Field(
+        ..., example={"/srv/config.yaml": {"memory_hits": 12, "hit_rate": 0.4}}
+    )
+    singleflight: dict = Field(
+        ..., example={"leaders": 120, "deduplicated": 7, "in_flight": 2}
+    )
+    limits: dict = Field(
+        ...,
+        example={"/srv/config.yaml": {"mistral_api": {"queue_depth": 3}}},
+    )
+    similar: dict = Field(
+        {}, example={"/srv/config.yaml": {"hits": 5, "misses": 20, "entries": 20}}
+    )
 
 
 class RedactionRequest(BaseModel):
-    provider: str = Field(..., example="mistral_api")
+    provider: str = Field(
+        ...,
+        example="mistral_api",
+        description="Nom d'un provider ou d'une chaîne de repli (`chains`).",
+    )
     sujet: str = Field(..., example="Qu'est-ce que l'économie circulaire ?")
     sources: Optional[List[str]] = Field(None, example=["https://example.com/article"])
     meta: Optional[dict] = Field(None, example={"tone": "formel", "length": "400"})
@@ -64,6 +210,13 @@ class RedactionRequest(BaseModel):
             "Default 'text'."
         ),
     )
+    no_cache: bool = Field(
+        False,
+        description=(
+            "Ignore the response cache for this call (the fresh result is "
+            "still stored). Same effect as a `Cache-Control: no-cache` header."
+        ),
+    )
 
     class Config:
         schema_extra = {
@@ -79,11 +232,44 @@ class RedactionRequest(BaseModel):
 
 class RedactionResponse(BaseModel):
     result: str = Field(..., example="<article>...</article>")
+    provider_used: Optional[str] = Field(
+        None,
+        example="mistral_api",
+        description="Provider ayant produit la réponse (null si servie du cache).",
+    )
+    attempts: int = Field(0, description="Nombre d'appels aux providers.")
+    cached: bool = Field(False, description="Réponse servie depuis le cache.")
+    usage: Optional[dict] = Field(
+        None,
+        example={"prompt_tokens": 812, "completion_tokens": 640},
+        description="Jetons consommés par cette requête (null si servie du cache).",
+    )
+
+
+class BatchItem(RedactionRequest):
+    id: Optional[str] = Field(
+        None, example="article-42", description="Défaut : position dans `items`."
+    )
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    concurrency: int = Field(
+        4, ge=1, description="Appels simultanés maximum par provider."
+    )
+    provider_concurrency: Optional[Dict[str, int]] = Field(
+        None, example={"mistral_api": 2, "ollama_local": 1}
+    )
 
 
 class MiseEnFormeRequest(BaseModel):
-    provider: str = Field(..., example="mistral_api")
+    provider: str = Field(
+        ...,
+        example="mistral_api",
+        description="Nom d'un provider ou d'une chaîne de repli (`chains`).",
+    )
     texte: str = Field(..., example="Texte à mettre en forme...")
+    no_cache: bool = Field(False, description="Ignore the response cache.")
 
     class Config:
         schema_extra = {
@@ -93,6 +279,74 @@ class MiseEnFormeRequest(BaseModel):
 
 class MiseEnFormeResponse(BaseModel):
     result: str = Field(..., example="<article>...</article>")
+    provider_used: Optional[str] = Field(
+        None,
+        example="mistral_api",
+        description="Provider ayant produit la réponse (null si servie du cache).",
+    )
+    attempts: int = Field(0, description="Nombre d'appels aux providers.")
+    cached: bool = Field(False, description="Réponse servie depuis le cache.")
+    usage: Optional[dict] = Field(
+        None,
+        example={"prompt_tokens": 812, "completion_tokens": 640},
+        description="Jetons consommés par cette requête (null si servie du cache).",
+    )
+
+
+class JobRequest(BaseModel):
+    kind: str = Field(
+        "redaction", example="redaction", description="`redaction` ou `mise_en_forme`."
+    )
+    provider: str = Field(
+        ...,
+        example="mistral_api",
+        description="Nom d'un provider ou d'une chaîne de repli (`chains`).",
+    )
+    sujet: Optional[str] = Field(
+        None, example="Qu'est-ce que l'économie circulaire ?", description="Rédaction."
+    )
+    texte: Optional[str] = Field(None, description="Mise en forme.")
+    sources: Optional[List[str]] = None
+    meta: Optional[dict] = None
+    format: Optional[str] = Field("text", description="Rédaction : 'text' ou 'html'.")
+    no_cache: bool = False
+    webhook: Optional[str] = Field(
+        None,
+        example="https://example.com/hooks/jobs",
+        description=(
+            "URL appelée en POST avec l'état final du travail (peut être "
+            "appelée plus d'une fois : dédoublonner sur `id`)."
+        ),
+    )
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "kind": "redaction",
+                "provider": "mistral_api",
+                "sujet": "Qu'est-ce que l'économie circulaire ?",
+                "format": "html",
+                "webhook": "https://example.com/hooks/jobs",
+            }
+        }
+
+
+class JobStatus(BaseModel):
+    id: str = Field(..., example="3f2a9c0e5b7d4e1f8a6b2c9d0e1f2a3b")
+    kind: str = Field(..., example="redaction")
+    status: str = Field(
+        ..., example="queued", description="queued, running, done ou error."
+    )
+    result: Optional[str] = None
+    error: Optional[str] = None
+    provider_used: Optional[str] = None
+    attempts: int = 0
+    created_at: float = Field(..., description="Horodatage Unix.")
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    webhook_status: Optional[str] = Field(
+        None, description="pending, delivered ou failed (null sans webhook)."
+    )
 
 
 @app.get(
@@ -102,7 +356,9 @@ class MiseEnFormeResponse(BaseModel):
     summary="Liste des providers",
     description=(
         "Retourne la liste des providers définis dans le fichier "
-        "de configuration (par défaut `config.yaml`)."
+        "de configuration (par défaut `config.yaml`), avec pour chacun l'état "
+        "de son disjoncteur, la latence de la dernière sonde et les p50/p95 "
+        "glissants des appels."
     ),
 )
 def get_providers(config: str = "config.yaml"):
@@ -110,7 +366,103 @@ def get_providers(config: str = "config.yaml"):
 
     - config: chemin vers le fichier de configuration YAML
     """
-    return {"providers": list_providers(config)}
+    return {"providers": list_providers(config), "status": provider_health(config)}
+
+
+@app.get(
+    "/stats",
+    response_model=StatsResponse,
+    tags=["monitoring"],
+    summary="Compteurs internes",
+    description=(
+        "Retourne les compteurs du cache de configuration "
+        "(hits/misses du registre `config.yaml`), du cache de réponses, du "
+        "cache des sujets quasi identiques (`similar`) et des générations "
+        "identiques dédoublonnées (`singleflight`), ainsi que "
+        "l'état des limiteurs de débit par provider (file, attente)."
+    ),
+)
+def get_stats():
+    registry = get_registry()
+    return {
+        "settings": registry.stats(),
+        "responses": registry.cache_stats(),
+        "singleflight": get_flights().stats(),
+        "limits": registry.limit_stats(),
+        "similar": registry.similar_stats(),
+    }
+
+
+@app.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    tags=["monitoring"],
+    summary="Métriques Prometheus",
+    description=(
+        "Métriques au format texte Prometheus : latence des appels aux "
+        "providers par provider et statut, requêtes par endpoint et format, "
+        "jetons consommés (`usage`), durée des requêtes HTTP, du nettoyage "
+        "HTML et du chargement de la configuration, ainsi que les compteurs "
+        "des caches, limiteurs de débit et disjoncteurs."
+    ),
+)
+def get_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get(
+    "/ready",
+    tags=["monitoring"],
+    summary="Disponibilité (readiness)",
+    description=(
+        "Répond 200 une fois le préchauffage terminé (configuration par défaut "
+        "chargée et validée, templates compilés, connexions ouvertes, modèles "
+        "Ollama chargés), 503 avant ou si `config.yaml` est invalide. Le "
+        "rapport `warmup` détaille la durée et le résultat par provider."
+    ),
+)
+def get_ready():
+    body = {"ready": app.state.ready, "warmup": app.state.warmup}
+    if app.state.ready:
+        return body
+    return JSONResponse(body, status_code=503, headers={"Retry-After": "1"})
+
+
+def _count(endpoint: str, format: Optional[str]) -> None:
+    # `format` is free text from the client: bound the label's values
+    label = format or "text"
+    metrics.REQUESTS.labels(
+        endpoint, label if label in ("text", "html") else "other"
+    ).inc()
+
+
+def _http_error(e: Exception) -> HTTPException:
+    """Map service errors to HTTP: quota/queue errors keep a Retry-After."""
+    if isinstance(e, (RateLimitTimeout, CircuitOpenError)):
+        return HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after + 0.999))},
+        )
+    if isinstance(e, ProviderHTTPError) and e.status_code == 429:
+        headers = None
+        if e.retry_after is not None:
+            headers = {"Retry-After": str(int(e.retry_after + 0.999))}
+        return HTTPException(status_code=429, detail=str(e), headers=headers)
+    return HTTPException(status_code=500, detail=str(e))
+
+
+def _served(info: dict) -> dict:
+    return {
+        "provider_used": info.get("provider"),
+        "attempts": info.get("attempts", 0),
+        "cached": info.get("cached", False),
+        "usage": info.get("usage"),
+    }
+
+
+def _no_cache(flag: bool, cache_control: Optional[str]) -> bool:
+    return flag or "no-cache" in (cache_control or "").lower()
 
 
 @app.post(
@@ -120,10 +472,17 @@ def get_providers(config: str = "config.yaml"):
     summary="Demander une rédaction",
     description=(
         "Demande à un provider de rédiger un texte. "
-        "Utilise le prompt configuré (texte ou HTML accessible)."
+        "Utilise le prompt configuré (texte ou HTML accessible). "
+        "Si la réponse provient du cache des sujets quasi identiques "
+        "(`cache.similar`), l'en-tête `X-Near-Match` donne la similarité."
     ),
 )
-def post_redaction(req: RedactionRequest, config: str = "config.yaml"):
+async def post_redaction(
+    req: RedactionRequest,
+    response: Response,
+    config: str = "config.yaml",
+    cache_control: Optional[str] = Header(None),
+):
     """Lance une rédaction via le provider indiqué.
 
     Exemple d'utilisation depuis Postman/Bruno:
@@ -132,18 +491,25 @@ def post_redaction(req: RedactionRequest, config: str = "config.yaml"):
     Content-Type: application/json
     Body: {"provider":"mistral_api","sujet":"Sujet"}
     """
+    _count("redaction", req.format)
+    info: dict = {}
     try:
-        out = redaction_by_name(
+        out = await aredaction_by_name(
             req.provider,
             req.sujet,
             sources=req.sources,
             meta=req.meta,
             config_path=config,
             format=(req.format or "text"),
+            no_cache=_no_cache(req.no_cache, cache_control),
+            info=info,
         )
-        return {"result": out}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+    if "similarity" in info:
+        # Served for a near-duplicate sujet (`cache.similar`)
+        response.headers["X-Near-Match"] = f"{info['similarity']:.3f}"
+    return {"result": out, **_served(info)}
 
 
 @app.post(
@@ -156,15 +522,193 @@ def post_redaction(req: RedactionRequest, config: str = "config.yaml"):
         "(balises sémantiques, ARIA, structure)."
     ),
 )
-def post_mise_en_forme(req: MiseEnFormeRequest, config: str = "config.yaml"):
+async def post_mise_en_forme(
+    req: MiseEnFormeRequest,
+    config: str = "config.yaml",
+    cache_control: Optional[str] = Header(None),
+):
     """Lance la mise en forme d'un texte en HTML accessible.
 
     Exemple:
     POST /mise_en_forme
     Body: {"provider":"mistral_api","texte":"Mon texte"}
     """
+    _count("mise_en_forme", "html")
+    info: dict = {}
+    try:
+        out = await amise_en_forme_by_name(
+            req.provider,
+            req.texte,
+            config_path=config,
+            no_cache=_no_cache(req.no_cache, cache_control),
+            info=info,
+        )
+        return {"result": out, **_served(info)}
+    except Exception as e:
+        raise _http_error(e)
+
+
+def _sse_response(chunks: AsyncIterator[str]) -> StreamingResponse:
+    """Relay text deltas as Server-Sent Events.
+
+    Each delta is sent as `data: {"delta": "..."}`; the stream ends with an
+    `event: done` (or `event: error` if the provider fails mid-stream).
+    """
+
+    async def events():
+        try:
+            async for chunk in chunks:
+                yield b"data: " + codec.dumps({"delta": chunk}) + b"\n\n"
+        except Exception as e:
+            yield b"event: error\ndata: " + codec.dumps({"detail": str(e)}) + b"\n\n"
+            return
+        yield b"event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post(
+    "/redaction/stream",
+    tags=["rédaction"],
+    summary="Demander une rédaction en streaming (SSE)",
+    description=(
+        "Comme `/redaction`, mais renvoie le texte au fil de la génération "
+        'sous forme de Server-Sent Events (`data: {"delta": ...}`).'
+    ),
+)
+async def post_redaction_stream(req: RedactionRequest, config: str = "config.yaml"):
+    _count("redaction/stream", req.format)
+    try:
+        chunks = aredaction_stream_by_name(
+            req.provider,
+            req.sujet,
+            sources=req.sources,
+            meta=req.meta,
+            config_path=config,
+            format=(req.format or "text"),
+        )
+    except Exception as e:
+        raise _http_error(e)
+    return _sse_response(chunks)
+
+
+@app.post(
+    "/mise_en_forme/stream",
+    tags=["mise_en_forme"],
+    summary="Demander une mise en forme HTML en streaming (SSE)",
+    description=(
+        "Comme `/mise_en_forme`, mais renvoie le HTML nettoyé au fil de la "
+        "génération sous forme de Server-Sent Events."
+    ),
+)
+async def post_mise_en_forme_stream(
+    req: MiseEnFormeRequest, config: str = "config.yaml"
+):
+    _count("mise_en_forme/stream", "html")
     try:
-        out = mise_en_forme_by_name(req.provider, req.texte, config_path=config)
-        return {"result": out}
+        chunks = amise_en_forme_stream_by_name(
+            req.provider, req.texte, config_path=config
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+    return _sse_response(chunks)
+
+
+@app.post(
+    "/redaction/batch",
+    tags=["rédaction"],
+    summary="Rédiger un lot de sujets",
+    description=(
+        "Exécute plusieurs rédactions avec une concurrence bornée par provider. "
+        "Les résultats sont renvoyés en NDJSON, dans l'ordre de fin, une ligne "
+        '`{"id", "result", "error"}` par élément (une erreur n\'interrompt '
+        "pas le lot)."
+    ),
+)
+async def post_redaction_batch(req: BatchRequest, config: str = "config.yaml"):
+    items = [
+        {
+            "id": item.id if item.id is not None else str(i),
+            "provider": item.provider,
+            "sujet": item.sujet,
+            "sources": item.sources,
+            "meta": item.meta,
+            "format": item.format,
+            "no_cache": item.no_cache,
+        }
+        for i, item in enumerate(req.items)
+    ]
+    for item in req.items:
+        _count("redaction/batch", item.format)
+
+    async def lines():
+        async for rec in run_batch(
+            items,
+            config_path=config,
+            concurrency=req.concurrency,
+            provider_concurrency=req.provider_concurrency,
+        ):
+            yield codec.dumps(rec) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _job_workers() -> JobWorkers:
+    if app.state.jobs is None:
+        raise HTTPException(status_code=503, detail="Travaux désactivés (jobs)")
+    return app.state.jobs
+
+
+@app.post(
+    "/jobs",
+    response_model=JobStatus,
+    status_code=202,
+    tags=["jobs"],
+    summary="Soumettre un travail",
+    description=(
+        "Enregistre une rédaction ou une mise en forme dans la file persistante "
+        "et renvoie immédiatement son identifiant (en-tête `Location`). Le "
+        "travail survit à un redémarrage du serveur ; son résultat se lit "
+        "avec `GET /jobs/{id}` ou arrive sur le `webhook`."
+    ),
+)
+def post_job(req: JobRequest, response: Response, config: str = "config.yaml"):
+    workers = _job_workers()
+    if req.kind not in KINDS:
+        raise HTTPException(status_code=422, detail=f"kind inconnu : {req.kind}")
+    field = "texte" if req.kind == "mise_en_forme" else "sujet"
+    if getattr(req, field) is None:
+        raise HTTPException(
+            status_code=422, detail=f"`{field}` est requis pour {req.kind}"
+        )
+    if req.webhook is not None:
+        try:
+            workers.policy.check_url(req.webhook)
+        except BlockedURL as e:
+            raise HTTPException(status_code=422, detail=f"webhook refusé : {e}")
+    _count("jobs", "html" if req.kind == "mise_en_forme" else req.format)
+    request = req.dict(exclude={"kind", "webhook"}, exclude_none=True)
+    job_id = workers.store.submit(req.kind, request, config, req.webhook)
+    # Read before waking the workers: the answer is the job as queued
+    job = workers.store.get(job_id)
+    workers.wake()
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return job_view(job)
+
+
+@app.get(
+    "/jobs/{job_id}",
+    response_model=JobStatus,
+    tags=["jobs"],
+    summary="État d'un travail",
+    description="Statut du travail et, une fois terminé, son résultat ou son erreur.",
+)
+def get_job(job_id: str):
+    job = _job_workers().store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Travail inconnu")
+    return job_view(job)
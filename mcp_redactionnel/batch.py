@@ -0,0 +1,97 @@
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Dict, Iterable, Optional, Set
+
+from .service import aredaction_by_name
+
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids already written without error to a JSONL results file.
+
+    The results file doubles as the checkpoint of a batch run: re-running the
+    same batch with the same output skips these items.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # partial last line after a crash
+            if rec.get("error") is None and "id" in rec:
+                done.add(str(rec["id"]))
+    return done
+
+
+async def _run_item(
+    index: int,
+    item: dict,
+    semaphore: asyncio.Semaphore,
+    config_path: str,
+) -> dict:
+    item_id = str(item.get("id", index))
+    info: dict = {}
+    async with semaphore:
+        try:
+            out = await aredaction_by_name(
+                item["provider"],
+                item["sujet"],
+                sources=item.get("sources"),
+                meta=item.get("meta"),
+                config_path=config_path,
+                format=item.get("format") or "text",
+                no_cache=bool(item.get("no_cache", False)),
+                info=info,
+            )
+        except Exception as e:
+            return {"id": item_id, "result": None, "error": f"{type(e).__name__}: {e}"}
+    return {
+        "id": item_id,
+        "result": out,
+        "error": None,
+        "provider_used": info.get("provider"),
+        "attempts": info.get("attempts", 0),
+        "usage": info.get("usage"),
+    }
+
+
+async def run_batch(
+    items: Iterable[dict],
+    config_path: str = "config.yaml",
+    concurrency: int = 4,
+    provider_concurrency: Optional[Dict[str, int]] = None,
+    skip: Optional[Set[str]] = None,
+) -> AsyncIterator[dict]:
+    """Run `RedactionRequest`-shaped dicts through `redaction`.
+
+    At most `concurrency` items run at once per provider (overridable per
+    provider with `provider_concurrency`). Results are yielded in completion
+    order as `{"id", "result", "error"}` (plus `provider_used` and
+    `attempts` on success); a failing item reports its error
+    instead of aborting the batch. Items whose id is in `skip` are not run.
+    """
+    provider_concurrency = provider_concurrency or {}
+    semaphores: Dict[str, asyncio.Semaphore] = {}
+    tasks = []
+    for index, item in enumerate(items):
+        if skip and str(item.get("id", index)) in skip:
+            continue
+        provider = item.get("provider", "")
+        if provider not in semaphores:
+            limit = provider_concurrency.get(provider, concurrency)
+            semaphores[provider] = asyncio.Semaphore(max(1, limit))
+        tasks.append(
+            asyncio.ensure_future(
+                _run_item(index, item, semaphores[provider], config_path)
+            )
+        )
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The consumer went away (client disconnect, Ctrl-C): stop the rest
+        for task in tasks:
+            task.cancel()
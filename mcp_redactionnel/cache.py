@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .config import CacheConfig
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)
+"""
+
+# Other processes write to the same file: the running byte count is
+# re-read from the table at least this often (seconds)
+_RESYNC_INTERVAL = 60.0
+
+
+class ResponseCache:
+    """Content-addressed cache of provider outputs.
+
+    A bounded in-memory LRU sits in front of an optional SQLite file. The
+    SQLite tier survives restarts and is shared by every worker process
+    pointing at the same file; it is kept under `max_bytes` by evicting the
+    least recently used rows.
+
+    `aget` / `aset` are the variants for the event loop: memory hits are
+    served inline and SQLite is only touched from a worker thread.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        memory_entries: int = 256,
+        max_bytes: int = 100_000_000,
+        ttl: float = 86400.0,
+    ):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(
+                path, timeout=5.0, isolation_level=None, check_same_thread=False
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+        self._disk_bytes = 0  # running total of `size`, see `_resync`
+        self._synced_at = -_RESYNC_INTERVAL
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_config(cls, config: CacheConfig) -> "ResponseCache":
+        return cls(
+            path=config.path,
+            memory_entries=config.memory_entries,
+            max_bytes=config.max_bytes,
+            ttl=config.ttl,
+        )
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Hash the request parts (provider, model, prompt, ...) into a key."""
+        raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, expires: float, value: str) -> None:
+        # Caller holds the lock
+        self._memory[key] = (expires, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                if item[0] > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return item[1]
+                del self._memory[key]
+            return None
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._db.execute(
+                        "UPDATE responses SET last_access = ? WHERE key = ?",
+                        (now, key),
+                    )
+                    self._remember(key, row[1], row[0])
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        hit = self._memory_get(key, now)
+        return hit if hit is not None else self._disk_get(key, now)
+
+    async def aget(self, key: str) -> Optional[str]:
+        now = time.time()
+        hit = self._memory_get(key, now)
+        if hit is not None or self._db is None:
+            return hit if hit is not None else self._disk_get(key, now)
+        return await asyncio.to_thread(self._disk_get, key, now)
+
+    def _store(
+        self, key: str, value: str, ttl: Optional[float], provider: str
+    ) -> Optional[tuple]:
+        """Remember `value` in memory; returns the row for the disk tier."""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return None
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._remember(key, now + ttl, value)
+        if self._db is None or size > self.max_bytes:
+            return None
+        return (key, provider, value, size, now + ttl, now)
+
+    def _write(self, row: tuple) -> None:
+        key, size, now = row[0], row[3], row[5]
+        with self._lock:
+            if self._db is None:
+                return
+            old = self._db.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, provider, value, size, expires, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            self._disk_bytes += size - (old[0] if old else 0)
+            self._evict(now)
+
+    def set(
+        self, key: str, value: str, ttl: Optional[float] = None, provider: str = ""
+    ) -> None:
+        row = self._store(key, value, ttl, provider)
+        if row is not None:
+            self._write(row)
+
+    async def aset(
+        self, key: str, value: str, ttl: Optional[float] = None, provider: str = ""
+    ) -> None:
+        row = self._store(key, value, ttl, provider)
+        if row is not None:
+            await asyncio.to_thread(self._write, row)
+
+    def _resync(self) -> None:
+        # Caller holds the lock
+        (self._disk_bytes,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        self._synced_at = time.monotonic()
+
+    def _evict(self, now: float) -> None:
+        # Caller holds the lock. Expired rows go first, then LRU rows; the
+        # table is only summed when over budget or every _RESYNC_INTERVAL
+        if time.monotonic() - self._synced_at >= _RESYNC_INTERVAL:
+            self._resync()
+        expired, expired_bytes = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            " WHERE expires <= ?",
+            (now,),
+        ).fetchone()
+        if expired:
+            self._db.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+            self.evictions += expired
+            self._disk_bytes -= expired_bytes
+        if self._disk_bytes <= self.max_bytes:
+            return
+        self._resync()  # rows written by other processes count too
+        if self._disk_bytes <= self.max_bytes:
+            return
+        for key, size in self._db.execute(
+            "SELECT key, size FROM responses ORDER BY last_access"
+        ).fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            self.evictions += 1
+            self._disk_bytes -= size
+            if self._disk_bytes <= self.max_bytes:
+                break
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._disk_bytes = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            disk_entries = disk_bytes = 0
+            if self._db is not None:
+                disk_entries, disk_bytes = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+                ),
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "disk_bytes": disk_bytes,
+            }
@@ -0,0 +1,175 @@
+"""Removal of common LLM artifacts from generated HTML fragments.
+
+See docs/NETTOYAGE_HTML.md. The same rules are applied to a complete output
+(`clean_html_fragment`) or incrementally to a stream (`HTMLStreamCleaner`).
+"""
+
+import re
+
+_FENCE = "```"
+
+# Chatty openings such as "Voici le HTML demandé :" or "Bien sûr ! Voici...".
+# Only stripped when the sentence ends (":", ".", "!" or a line break) right
+# before markup (a tag or a fence), so a plain-text answer is never truncated.
+_PREAMBLE_LEADS = (
+    "voici",
+    "voilà",
+    "voila",
+    "ci-dessous",
+    "j'ai",
+    "j’ai",
+    "je vous propose",
+    "bien sûr",
+    "certainement",
+    "here is",
+    "here's",
+    "here’s",
+    "sure",
+)
+_PREAMBLE = re.compile(
+    r"(?:%s)\b"  # opening word, apostrophes possibly escaped
+    r"(?:[^<`\n\\]|\\(?!n)){0,300}?"  # rest of the sentence, single line
+    r"(?:[:.!]|[ \t]*(?:\n|\\n))"  # its end
+    r"(?:\s|\\n){0,20}(?=<|```)"  # blank lines, then the markup
+    % "|".join(re.escape(w).replace("'", r"\\?'") for w in _PREAMBLE_LEADS),
+    re.IGNORECASE,
+)
+# Longest text `_PREAMBLE` can match, plus the fence of its lookahead
+_PREAMBLE_WINDOW = 400
+
+_ESCAPES = ((r"\n", "\n"), (r"\t", "\t"), (r"\"", '"'), (r"\'", "'"))
+
+
+def _unescape(text: str) -> str:
+    """Turn literal `\\n`, `\\t`, `\\"` and `\\'` sequences into characters."""
+    # Well-behaved outputs have no backslash at all: skip the passes
+    if "\\" not in text:
+        return text
+    for literal, char in _ESCAPES:
+        text = text.replace(literal, char)
+    return text
+
+
+def _strip_preamble(text: str) -> str:
+    m = _PREAMBLE.match(text)
+    return text[m.end() :] if m else text
+
+
+def clean_html_fragment(s: str) -> str:
+    """
+    Clean HTML fragment from common LLM artifacts:
+    - Drop a chatty preamble ("Voici le HTML :") in front of the markup
+    - Remove Markdown code fences (```html or ```)
+    - Replace literal backslash-n/t with real newlines/tabs
+    - Replace literal backslash-quote with real quotes
+
+    The fences are found by position rather than by a regex over the whole
+    output and the escape passes only run when a backslash is present, so a
+    clean output is copied at most once.
+    """
+    if s is None:
+        return s
+    text = _strip_preamble(s.strip())
+
+    # A fenced block must open and close: ```html ... ``` or ``` ... ```
+    if len(text) >= 6 and text.startswith(_FENCE) and text.endswith(_FENCE):
+        start = 7 if text.startswith("html", 3) else 3
+        text = text[start:-3].strip()
+
+    # The LLM outputs the actual characters '\' followed by 'n' (not a
+    # newline); same for \t, \" and \'
+    return _unescape(text).strip()
+
+
+class HTMLStreamCleaner:
+    """Incremental counterpart of `clean_html_fragment` for streamed output.
+
+    `feed()` returns the cleaned text that is safe to emit so far and
+    `flush()` the remainder once the stream ends. Only a few characters are
+    held back: leading whitespace, a possible preamble and the opening fence,
+    a trailing lone backslash (possibly the first half of an escape) and
+    trailing whitespace/backticks (possibly the closing fence).
+
+    Unlike the buffered function, an opening ```html fence is dropped as soon
+    as it is seen, without waiting to know whether a closing fence follows.
+    """
+
+    def __init__(self):
+        self._head = ""
+        self._preamble_checked = False
+        self._started = False
+        self._fenced = False
+        self._emitted = False
+        self._raw_tail = ""
+        self._pending = ""
+
+    @staticmethod
+    def _may_be_preamble(head: str) -> bool:
+        lead = head[:20].lower().replace("\\", "")
+        return any(w.startswith(lead) or lead.startswith(w) for w in _PREAMBLE_LEADS)
+
+    def _start(self, chunk: str) -> str | None:
+        head = (self._head + chunk).lstrip()
+        self._head = head
+        if not head:
+            return None
+        if not self._preamble_checked:
+            if (
+                len(head) < _PREAMBLE_WINDOW
+                and "<" not in head
+                and _FENCE not in head
+                and self._may_be_preamble(head)
+            ):
+                return None  # wait for the markup that would end a preamble
+            self._preamble_checked = True
+            head = self._head = _strip_preamble(head)
+        if head.startswith(_FENCE):
+            rest = head[3:]
+            if "html".startswith(rest[:4]) and len(rest) < 4:
+                return None  # could still be ```html
+            if rest.startswith("html"):
+                rest = rest[4:]
+            rest = rest.lstrip()
+            if not rest:
+                return None  # wait for the first character after the fence
+            self._fenced = True
+            head = rest
+        elif _FENCE.startswith(head):
+            return None  # one or two backticks: maybe a fence
+        self._started = True
+        self._head = ""
+        return head
+
+    def feed(self, chunk: str) -> str:
+        if not self._started:
+            chunk = self._start(chunk)
+            if chunk is None:
+                return ""
+        raw = self._raw_tail + chunk
+        # A trailing backslash may be the first half of an escape sequence
+        if raw.endswith("\\"):
+            raw, self._raw_tail = raw[:-1], "\\"
+        else:
+            self._raw_tail = ""
+        text = self._pending + _unescape(raw)
+        if not self._emitted:
+            text = text.lstrip()
+        keep = len(text.rstrip(" \t\r\n\f\v`"))
+        out, self._pending = text[:keep], text[keep:]
+        if out:
+            self._emitted = True
+        return out
+
+    def flush(self) -> str:
+        if not self._started:
+            # Never saw any content past a potential preamble or fence
+            text = _unescape(self._head)
+        else:
+            text = self._pending + _unescape(self._raw_tail)
+        text = text.rstrip()
+        if self._fenced and text.endswith(_FENCE):
+            text = text[:-3].rstrip()
+        if not self._emitted:
+            text = text.lstrip()
+        self._head = self._pending = self._raw_tail = ""
+        return text
@@ -0,0 +1,153 @@
+"""JSON codec of the service and compiled `response_path` accessors.
+
+`loads` / `dumps` use orjson when it is installed (`pip install orjson`)
+and the standard library otherwise. They are used for provider payloads
+(requests, responses, stream lines) and for the API's JSON responses.
+
+Both backends are held to the same rules for JSON values (dicts, lists,
+strings, numbers, booleans, None): compact UTF-8 output, NaN and Infinity
+refused with `ValueError` on the way in and out (orjson would write them
+as null, the standard library as bare `NaN`), and what orjson cannot
+encode (non-str keys, integers over 64 bits) is handed to the standard
+library, which writes it or raises `TypeError`. orjson still encodes a
+few other types natively (datetime, dataclasses, UUID) that the standard
+library refuses.
+
+A provider's `response_path` (e.g. `choices.0.message.content`) is compiled
+once, when the configuration is loaded, into a `ResponsePath` that walks a
+decoded response without re-parsing the path.
+"""
+
+import json
+import math
+from functools import lru_cache
+from typing import Any, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def loads(data: Union[bytes, bytearray, str]) -> Any:
+    """Decode a JSON document; raises `ValueError` if it is not valid JSON."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data, parse_float=_finite, parse_constant=_no_constant)
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON (non-ASCII characters kept as is)."""
+    if orjson is None:
+        return _dumps(obj)
+    try:
+        out = orjson.dumps(obj)
+    except orjson.JSONEncodeError:
+        return _dumps(obj)
+    if b"null" in out:  # where orjson puts NaN and Infinity
+        _reject_non_finite(obj)
+    return out
+
+
+def _dumps(obj: Any) -> bytes:
+    return json.dumps(
+        obj, ensure_ascii=False, separators=(",", ":"), allow_nan=False
+    ).encode("utf-8")
+
+
+def _finite(text: str) -> float:
+    value = float(text)
+    if math.isinf(value):
+        raise ValueError(f"number out of range: {text}")
+    return value
+
+
+def _no_constant(name: str) -> Any:
+    raise ValueError(f"{name} is not valid JSON")
+
+
+def _reject_non_finite(obj: Any) -> None:
+    if isinstance(obj, float):
+        if not math.isfinite(obj):
+            raise ValueError(f"out of range float values are not JSON: {obj}")
+    elif isinstance(obj, dict):
+        for value in obj.values():
+            _reject_non_finite(value)
+    elif isinstance(obj, (list, tuple)):
+        for value in obj:
+            _reject_non_finite(value)
+
+
+class ResponsePath:
+    """A dotted `response_path`, split and checked once.
+
+    Segments are object keys, or list indexes when they are integers
+    (`choices.0.text`); a negative index counts from the end. Walking a
+    response that does not have the expected shape gives None.
+    """
+
+    __slots__ = ("path", "_steps")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._steps: Tuple[Tuple[str, Optional[int]], ...] = tuple(
+            (segment, _index(segment)) for segment in _segments(path)
+        )
+
+    def __repr__(self) -> str:
+        return f"ResponsePath({self.path!r})"
+
+    def find(self, obj: Any) -> Any:
+        cur = obj
+        for key, index in self._steps:
+            if isinstance(cur, dict):
+                cur = cur.get(key)
+            elif isinstance(cur, list) and index is not None:
+                if not -len(cur) <= index < len(cur):
+                    return None
+                cur = cur[index]
+            else:
+                return None
+        return cur
+
+    def extract(self, obj: Any) -> Optional[str]:
+        """The value at this path as text (None if absent)."""
+        value = self.find(obj)
+        if value is None or isinstance(value, str):
+            return value
+        return str(value)
+
+
+def _segments(path: str) -> Tuple[str, ...]:
+    if "[" in path or "]" in path:
+        raise ValueError(
+            f"invalid response_path {path!r}: use dots for list indexes "
+            "(e.g. 'choices.0.message.content')"
+        )
+    segments = tuple(path.split("."))
+    for segment in segments:
+        if not segment or segment != segment.strip():
+            raise ValueError(
+                f"invalid response_path {path!r}: empty segment or surrounding "
+                "spaces"
+            )
+    return segments
+
+
+def _index(segment: str) -> Optional[int]:
+    try:
+        return int(segment)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def compile_path(path: Optional[str]) -> Optional[ResponsePath]:
+    """`ResponsePath` for `path` (None if unset); raises `ValueError` if the
+    path is malformed. Cached, so every provider built from one config
+    shares the accessor checked at load time."""
+    if not path:
+        return None
+    return ResponsePath(path)
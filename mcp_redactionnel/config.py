@@ -1,27 +1,230 @@
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional, Union
 
 import yaml
 from pydantic import BaseModel
 
+from .codec import compile_path
+
+
+class PoolConfig(BaseModel):
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+
+
+class TimeoutConfig(BaseModel):
+    connect: float = 10.0
+    read: float = 30.0
+    write: float = 30.0
+    pool: float = 10.0
+
+
+class SimilarCacheConfig(BaseModel):
+    # Opt-in: serve a redaction whose normalized sujet is close enough to a
+    # previous one (same provider, format, meta and sources); in memory
+    enabled: bool = False
+    # Jaccard similarity of the sujets' shingles; their numbers, names and
+    # negations must also be the same (2020 vs 2026 scores 0.87)
+    threshold: float = 0.85
+    num_perm: int = 64  # MinHash functions, split into `bands` LSH bands
+    bands: int = 16
+    shingle_size: int = 3  # characters
+    max_entries: int = 10_000
+    ttl: float = 86400.0
+
+
+class CacheConfig(BaseModel):
+    enabled: bool = False
+    path: Optional[str] = ".cache/responses.sqlite3"  # None: memory only
+    memory_entries: int = 256
+    max_bytes: int = 100_000_000
+    ttl: float = 86400.0
+    similar: SimilarCacheConfig = SimilarCacheConfig()
+
+
+class SourcesConfig(BaseModel):
+    # Fetch the http(s) URLs of `sources` and inject excerpts in the prompt;
+    # when disabled the list is passed to the template as is
+    enabled: bool = True
+    timeout: float = 10.0  # per document, once a connection slot is free
+    max_connections: int = 20
+    per_host: int = 2  # simultaneous requests to one host
+    max_bytes: int = 2_000_000  # download cap per document
+    # Keep only the passages most relevant to the sujet (BM25), within
+    # `token_budget`; `budget` applies when retrieval is off or finds nothing
+    retrieval: bool = True
+    token_budget: int = 3_000
+    passage_chars: int = 800
+    budget: int = 12_000  # characters of excerpts, shared by all documents
+    cache_path: Optional[str] = ".cache/sources.sqlite3"  # None: no cache
+    fresh_for: float = 3600.0  # seconds before a cached page is revalidated
+    user_agent: str = "mcp-redactionnel/0.1"
+    # Hosts that may be fetched ("example.org", "*.example.org"); empty:
+    # any host. Hosts resolving to loopback, private or link-local
+    # addresses are refused unless `allow_private` (intranet sources)
+    allowed_hosts: List[str] = []
+    allow_private: bool = False
+
+
+class LongTextConfig(BaseModel):
+    # A `mise_en_forme` texte longer than `threshold` characters is split
+    # into parts formatted concurrently, then stitched; 0 disables
+    threshold: int = 6_000
+    chunk_chars: int = 3_000
+    concurrency: int = 4  # parts formatted at the same time
+
+
+class JobsConfig(BaseModel):
+    # Background jobs (`POST /jobs`), read from the API's default config;
+    # queued jobs are kept in `path` and survive restarts
+    enabled: bool = True
+    path: str = ".cache/jobs.sqlite3"
+    workers: int = 2  # jobs run at the same time by this process
+    # A running job is claimed again once its worker stops renewing the
+    # lease (crash, kill -9), at most `max_claims` times
+    lease: float = 60.0
+    max_claims: int = 3
+    poll_interval: float = 1.0  # seconds between checks for new jobs
+    webhook_timeout: float = 10.0
+    webhook_attempts: int = 3
+    # Same policy as `sources`: webhooks to loopback, private or link-local
+    # addresses are refused unless `webhook_allow_private`
+    webhook_allowed_hosts: List[str] = []
+    webhook_allow_private: bool = False
+    retention: float = 7 * 86400.0  # finished jobs are deleted after this
+
+
+class WarmupConfig(BaseModel):
+    # Done by the API at startup, before `GET /ready` answers 200: load and
+    # validate the default config, compile templates, then per provider
+    # open a pooled connection and, for Ollama, load the model.
+    # enabled: false only loads the config
+    enabled: bool = True
+    connections: bool = True
+    models: bool = True  # Ollama: load the model (see `keep_alive`)
+    timeout: float = 120.0  # per provider; a cold model load can be slow
+
+
+class ReloadConfig(BaseModel):
+    # Hot reload by the API (read from the default config): loaded config
+    # files are watched and swapped in when they change and validate
+    enabled: bool = True
+    inotify: bool = True  # Linux; otherwise (or if unavailable) polling
+    interval: float = 2.0  # polling period (a safety net with inotify)
+    debounce: float = 0.2  # wait for an editor to finish writing
+    # Old provider pools are closed once their calls end, or after this
+    drain_timeout: float = 300.0
+
+
+class RetryPolicy(BaseModel):
+    max_attempts: int = 1  # 1: no retry
+    backoff_base: float = 0.5  # delay before the 2nd attempt, doubled after
+    backoff_max: float = 10.0
+    jitter: float = 1.0  # 0: fixed delays, 1: "full jitter" in [0, delay]
+    retry_on_status: List[int] = [429, 500, 502, 503, 504]
+    # httpx exception class names (subclasses match too)
+    retry_on_exceptions: List[str] = [
+        "ConnectError",
+        "ConnectTimeout",
+        "ReadTimeout",
+        "ReadError",
+        "RemoteProtocolError",
+        "PoolTimeout",
+    ]
+
+
+class HealthConfig(BaseModel):
+    # Consecutive failures (network errors, 5xx) that open the circuit
+    # breaker; 0 disables it
+    failure_threshold: int = 5
+    cooldown: float = 30.0  # seconds open before a trial request
+    probe_interval: float = 30.0  # background probe period; 0 disables
+    probe_timeout: float = 5.0
+    # Defaults to a cheap endpoint of the provider type (Ollama /api/version,
+    # Mistral /v1/models); generic providers are only probed if set
+    probe_url: Optional[str] = None
+
 
 class ProviderConfig(BaseModel):
     type: str
     endpoint: str
     method: str = "POST"
+    model: Optional[str] = None
     headers: Optional[Dict[str, str]] = {}
     body_template: Optional[str] = None
     response_path: Optional[str] = None
+    # HTTP client settings (one pooled client per provider instance)
+    pool: PoolConfig = PoolConfig()
+    timeouts: TimeoutConfig = TimeoutConfig()
+    http2: bool = False  # requires the `h2` package (pip install httpx[http2])
+    # Ollama: how long the model stays loaded after a request ("30m", 3600,
+    # -1: until the server stops); None keeps the Ollama default (5 minutes)
+    keep_alive: Optional[Union[str, int]] = None
+    # Ollama: default model `options` (num_ctx, temperature...); `meta.num_ctx`
+    # and `meta.num_predict` override them per request
+    options: Dict[str, Any] = {}
+    # Ceiling of the output tokens requested from this provider's model,
+    # whatever the budget derived from `meta.length` (None: no ceiling)
+    max_tokens: Optional[int] = None
+    # Mistral: follow-up requests when an answer stops at `max_tokens`
+    continuations: int = 2
+    # Response cache TTL in seconds (None: `cache.ttl`, 0: never cache)
+    cache_ttl: Optional[float] = None
+    # Outbound limits (None: unlimited); requests queue up to `max_queue_wait`
+    max_concurrency: Optional[int] = None
+    requests_per_second: Optional[float] = None
+    tokens_per_minute: Optional[int] = None
+    max_queue_wait: float = 30.0
+    retry: RetryPolicy = RetryPolicy()
+    health: HealthConfig = HealthConfig()
 
 
 class Settings(BaseModel):
     providers: Dict[str, ProviderConfig] = {}
+    cache: CacheConfig = CacheConfig()
+    # Named failover chains: providers tried in order, e.g.
+    # {"redaction": ["mistral_api", "ollama_local"]}
+    chains: Dict[str, List[str]] = {}
+    sources: SourcesConfig = SourcesConfig()
+    long_text: LongTextConfig = LongTextConfig()
+    jobs: JobsConfig = JobsConfig()
+    warmup: WarmupConfig = WarmupConfig()
+    reload: ReloadConfig = ReloadConfig()
 
     @classmethod
     def load(cls, path: str):
         with open(path, "r") as f:
-            data = yaml.safe_load(f) or {}
+            return cls.from_yaml(f.read())
+
+    @classmethod
+    def from_yaml(cls, text):
+        data = yaml.safe_load(text) or {}
         # Normalize providers
         providers = {}
         for k, v in data.get("providers", {}).items():
             providers[k] = ProviderConfig(**v)
-        return cls(providers=providers)
+            # Fail at load time rather than with a silent None per response
+            try:
+                compile_path(providers[k].response_path)
+            except ValueError as e:
+                raise ValueError(f"Provider {k}: {e}") from None
+        similar = (data.get("cache") or {}).get("similar") or {}
+        if similar.get("num_perm", 64) % similar.get("bands", 16):
+            raise ValueError("cache.similar: num_perm must be a multiple of bands")
+        chains = data.get("chains") or {}
+        for name, members in chains.items():
+            if name in providers:
+                raise ValueError(f"Chain {name} has the same name as a provider")
+            missing = [m for m in members if m not in providers]
+            if not members or missing:
+                raise ValueError(f"Chain {name} has unknown providers: {missing}")
+        return cls(
+            providers=providers,
+            cache=CacheConfig(**(data.get("cache") or {})),
+            chains=chains,
+            sources=SourcesConfig(**(data.get("sources") or {})),
+            long_text=LongTextConfig(**(data.get("long_text") or {})),
+            jobs=JobsConfig(**(data.get("jobs") or {})),
+            warmup=WarmupConfig(**(data.get("warmup") or {})),
+            reload=ReloadConfig(**(data.get("reload") or {})),
+        )
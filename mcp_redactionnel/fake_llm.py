@@ -0,0 +1,340 @@
+"""Stand-in LLM server for load tests and offline development.
+
+Emulates the wire formats the providers speak:
+
+- Mistral `POST /v1/chat/completions` (JSON, or SSE with `"stream": true`)
+- Ollama `POST /api/generate` and `POST /api/chat` (NDJSON stream by
+  default, JSON with `"stream": false`)
+- the cheap endpoints used by the health prober (`GET /v1/models`,
+  `GET /api/version`)
+
+Latency before the first byte follows a configurable distribution, streamed
+chunks can be spaced out, a share of the requests can be answered with 429
+and the completion size is set in words (capped by `max_tokens` /
+`num_predict`). Service times are recorded per `[bench:<id>]` marker found
+in the prompt so a load test can subtract upstream time from its latencies
+(`GET /_fake/stats`).
+
+Usage:
+  python -m mcp_redactionnel.fake_llm --port 8081 --latency lognormal:0.8:0.5
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+_WORDS = (
+    "l'économie circulaire réduit les déchets en prolongeant la durée de vie "
+    "des produits grâce au réemploi à la réparation et au recyclage des "
+    "matériaux les collectivités les entreprises et les citoyens y participent"
+).split()
+_MARKER = re.compile(r"\[bench:([\w-]+)\]")
+
+Sampler = Callable[[random.Random], float]
+
+
+def parse_latency(spec: str) -> Sampler:
+    """Latency distribution from `kind:params`, in seconds.
+
+    `fixed:0.2`, `uniform:0.1:0.5`, `normal:0.3:0.05`, `exponential:0.3`
+    (mean) or `lognormal:0.3:0.5` (median, sigma). Samples are never
+    negative.
+    """
+    kind, _, rest = spec.partition(":")
+    try:
+        params = [float(p) for p in rest.split(":")] if rest else []
+    except ValueError:
+        raise ValueError(f"Invalid latency parameters: {spec!r}")
+    arity = {"fixed": 1, "uniform": 2, "normal": 2, "exponential": 1, "lognormal": 2}
+    if arity.get(kind) != len(params):
+        raise ValueError(
+            f"Invalid latency spec {spec!r}: expected one of "
+            "fixed:S, uniform:MIN:MAX, normal:MEAN:STD, exponential:MEAN, "
+            "lognormal:MEDIAN:SIGMA"
+        )
+    if kind == "fixed":
+        return lambda rng: max(0.0, params[0])
+    if kind == "uniform":
+        return lambda rng: max(0.0, rng.uniform(params[0], params[1]))
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(params[0], params[1]))
+    if kind == "exponential":
+        return lambda rng: rng.expovariate(1.0 / params[0]) if params[0] > 0 else 0.0
+    median, sigma = params
+    return lambda rng: median * rng.lognormvariate(0.0, sigma)
+
+
+class FakeLLMSettings(BaseModel):
+    latency: str = "fixed:0"  # before the first byte, see `parse_latency`
+    chunk_delay: float = 0.0  # between streamed chunks, seconds
+    words: int = 200  # completion size
+    words_per_chunk: int = 4
+    rate_limit_ratio: float = 0.0  # share of requests answered with 429
+    retry_after: float = 1.0
+    seed: Optional[int] = None
+
+
+class _Recorder:
+    """Counters and per-marker service times, read by the load test."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.rate_limited = 0
+            self.service_times: Dict[str, float] = {}
+
+    def count(self, rate_limited: bool = False) -> None:
+        with self._lock:
+            self.requests += 1
+            self.rate_limited += rate_limited
+
+    def record(self, marker: Optional[str], seconds: float) -> None:
+        if marker is not None:
+            with self._lock:
+                self.service_times[marker] = seconds
+
+    def snapshot(self, reset: bool = False) -> dict:
+        with self._lock:
+            snap = {
+                "requests": self.requests,
+                "rate_limited": self.rate_limited,
+                "service_times": dict(self.service_times),
+            }
+        if reset:
+            self.reset()
+        return snap
+
+
+def create_app(settings: Optional[FakeLLMSettings] = None) -> FastAPI:
+    settings = settings or FakeLLMSettings()
+    sample_latency = parse_latency(settings.latency)
+    rng = random.Random(settings.seed)
+    recorder = _Recorder()
+    app = FastAPI(title="Fake LLM", docs_url=None, redoc_url=None)
+    app.state.settings = settings
+    app.state.recorder = recorder
+
+    def completion(limit: Optional[int]) -> tuple:
+        count = settings.words if not limit else min(settings.words, int(limit))
+        text = " ".join(_WORDS[i % len(_WORDS)] for i in range(count))
+        return text, count, "length" if count < settings.words else "stop"
+
+    def chunks(text: str) -> list:
+        words = text.split(" ")
+        step = max(1, settings.words_per_chunk)
+        return [
+            " ".join(words[i : i + step]) + (" " if i + step < len(words) else "")
+            for i in range(0, len(words), step)
+        ]
+
+    def marker_of(prompt: str) -> Optional[str]:
+        m = _MARKER.search(prompt)
+        return m.group(1) if m else None
+
+    async def admit() -> Optional[JSONResponse]:
+        """Sleep the first-byte latency, or answer 429."""
+        if settings.rate_limit_ratio and rng.random() < settings.rate_limit_ratio:
+            recorder.count(rate_limited=True)
+            return JSONResponse(
+                {
+                    "object": "error",
+                    "message": "Requests rate limit exceeded",
+                    "type": "rate_limited",
+                },
+                status_code=429,
+                headers={"Retry-After": f"{settings.retry_after:g}"},
+            )
+        recorder.count()
+        delay = sample_latency(rng)
+        if delay:
+            await asyncio.sleep(delay)
+        return None
+
+    async def paced(items: list) -> AsyncIterator[str]:
+        for index, item in enumerate(items):
+            if index and settings.chunk_delay:
+                await asyncio.sleep(settings.chunk_delay)
+            yield item
+
+    @app.get("/v1/models")
+    def mistral_models():
+        return {"object": "list", "data": [{"id": "fake-small", "object": "model"}]}
+
+    @app.get("/api/version")
+    def ollama_version():
+        return {"version": "0.0.0-fake"}
+
+    @app.get("/_fake/stats")
+    def stats(reset: bool = False):
+        return recorder.snapshot(reset)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        start = time.monotonic()
+        body = await request.json()
+        prompt = " ".join(str(m.get("content", "")) for m in body.get("messages") or [])
+        marker = marker_of(prompt)
+        rejected = await admit()
+        if rejected is not None:
+            return rejected
+        model = body.get("model") or "fake-small"
+        text, count, finish = completion(body.get("max_tokens"))
+        usage = {
+            "prompt_tokens": len(prompt.split()),
+            "completion_tokens": count,
+            "total_tokens": len(prompt.split()) + count,
+        }
+        base = {
+            "id": f"cmpl-{uuid.uuid4().hex}",
+            "created": int(time.time()),
+            "model": model,
+        }
+        if not body.get("stream"):
+            recorder.record(marker, time.monotonic() - start)
+            return {
+                **base,
+                "object": "chat.completion",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": finish,
+                    }
+                ],
+                "usage": usage,
+            }
+
+        def event(delta: dict, finish_reason=None, **extra) -> str:
+            obj = {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+                **extra,
+            }
+            return f"data: {json.dumps(obj, ensure_ascii=False)}\n\n"
+
+        async def sse() -> AsyncIterator[str]:
+            yield event({"role": "assistant", "content": ""})
+            async for piece in paced(chunks(text)):
+                yield event({"content": piece})
+            yield event({}, finish, usage=usage)
+            yield "data: [DONE]\n\n"
+            recorder.record(marker, time.monotonic() - start)
+
+        return StreamingResponse(sse(), media_type="text/event-stream")
+
+    async def ollama(request: Request, chat: bool):
+        start = time.monotonic()
+        body = await request.json()
+        if chat:
+            messages = body.get("messages") or []
+            prompt = " ".join(str(m.get("content", "")) for m in messages)
+        else:
+            prompt = str(body.get("prompt", ""))
+        marker = marker_of(prompt)
+        rejected = await admit()
+        if rejected is not None:
+            return rejected
+        model = body.get("model") or "fake"
+        options = body.get("options") or {}
+        text, count, finish = completion(options.get("num_predict"))
+
+        def text_of(piece: str) -> dict:
+            if chat:
+                return {"message": {"role": "assistant", "content": piece}}
+            return {"response": piece}
+
+        def line(obj: dict) -> str:
+            return json.dumps(
+                {"model": model, "created_at": _now_iso(), **obj},
+                ensure_ascii=False,
+            )
+
+        def final(elapsed: float) -> dict:
+            return {
+                **text_of(""),
+                "done": True,
+                "done_reason": finish,
+                "total_duration": int(elapsed * 1e9),
+                "load_duration": 0,
+                "prompt_eval_count": len(prompt.split()),
+                "prompt_eval_duration": 0,
+                "eval_count": count,
+                "eval_duration": int(elapsed * 1e9),
+            }
+
+        # Like Ollama, stream unless told otherwise
+        if body.get("stream") is False:
+            elapsed = time.monotonic() - start
+            recorder.record(marker, elapsed)
+            return JSONResponse(json.loads(line({**final(elapsed), **text_of(text)})))
+
+        async def ndjson() -> AsyncIterator[str]:
+            async for piece in paced(chunks(text)):
+                yield line({**text_of(piece), "done": False}) + "\n"
+            elapsed = time.monotonic() - start
+            yield line(final(elapsed)) + "\n"
+            recorder.record(marker, elapsed)
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        return await ollama(request, chat=False)
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        return await ollama(request, chat=True)
+
+    return app
+
+
+def _now_iso() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux serveur LLM (Mistral/Ollama).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", default="fixed:0", help="ex. lognormal:0.8:0.5")
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    parser.add_argument("--words", type=int, default=200)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    settings = FakeLLMSettings(
+        latency=args.latency,
+        chunk_delay=args.chunk_delay,
+        words=args.words,
+        rate_limit_ratio=args.rate_limit_ratio,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    uvicorn.run(
+        create_app(settings), host=args.host, port=args.port, log_level="warning"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Iterable, Optional
+
+import httpx
+
+from .config import ProviderConfig
+from .providers import ProviderHTTPError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider's circuit breaker is open: the call was not attempted."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_failure(exc: BaseException) -> bool:
+    """Whether `exc` says the backend is unhealthy (vs. a bad request)."""
+    if isinstance(exc, ProviderHTTPError):
+        return exc.status_code >= 500
+    # Unreachable or too slow; anything else (a template or parsing error, a
+    # local limit) says nothing about the backend
+    return isinstance(exc, (httpx.TransportError, TimeoutError, asyncio.TimeoutError))
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    Closed: calls go through. After `failure_threshold` consecutive failures
+    it opens and calls fail fast with `CircuitOpenError`. Once `cooldown`
+    seconds have passed it is half-open: a single trial call is let through,
+    whose outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial = False
+        self.failures = 0  # consecutive
+        self.opened = 0
+        self.rejected = 0
+
+    def _current(self) -> str:
+        # Caller holds the lock
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+            self._trial = False
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current()
+
+    def allow(self) -> None:
+        """Raise `CircuitOpenError` unless a call may go through now."""
+        with self._lock:
+            state = self._current()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return
+            self.rejected += 1
+            retry_after = max(1.0, self.cooldown - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(
+            f"Circuit open after {self.failures} consecutive failures",
+            retry_after=retry_after,
+        )
+
+    def _open(self) -> None:
+        # Caller holds the lock
+        if self._state != OPEN:
+            self.opened += 1
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._trial = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._state = CLOSED
+            self._trial = False
+
+    def half_open(self) -> None:
+        """End the cooldown early (e.g. the health probe succeeded)."""
+        with self._lock:
+            if self._current() == OPEN:
+                self._state = HALF_OPEN
+                self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._current() == HALF_OPEN or self.failures >= self.failure_threshold:
+                self._open()
+
+    def release(self) -> None:
+        """Give back a half-open trial whose call ended without an outcome."""
+        with self._lock:
+            self._trial = False
+
+    def trip(self) -> None:
+        """Open now (e.g. the health probe could not reach the backend)."""
+        with self._lock:
+            self.failures = max(self.failures, 1)
+            self._open()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._current(),
+                "consecutive_failures": self.failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+class LatencyWindow:
+    """The last `size` latency samples, for rolling percentiles."""
+
+    def __init__(self, size: int = 256):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class ProviderHealth:
+    """Breaker, call latencies and last probe result of one provider."""
+
+    def __init__(
+        self,
+        breaker: Optional[CircuitBreaker] = None,
+        probe_interval: float = 0.0,
+        probe_timeout: float = 5.0,
+    ):
+        self.breaker = breaker
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.latencies = LatencyWindow()
+        self.probe_supported = True
+        self.last_probe_at: Optional[float] = None  # wall clock
+        self.last_probe_latency: Optional[float] = None
+        self.last_probe_error: Optional[str] = None
+        self._next_probe = 0.0  # monotonic
+
+    @classmethod
+    def from_config(cls, config: ProviderConfig) -> "ProviderHealth":
+        health = config.health
+        breaker = (
+            CircuitBreaker(health.failure_threshold, health.cooldown)
+            if health.failure_threshold > 0
+            else None
+        )
+        return cls(breaker, health.probe_interval, health.probe_timeout)
+
+    @contextmanager
+    def track(self):
+        """Guard one upstream call: fail fast if open, record its outcome."""
+        if self.breaker is not None:
+            self.breaker.allow()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if self.breaker is not None:
+                if is_failure(e):
+                    self.breaker.record_failure()
+                elif isinstance(e, ProviderHTTPError):
+                    self.breaker.record_success()  # it answered
+                else:
+                    self.breaker.release()
+            raise
+        except BaseException:
+            # Cancelled or abandoned stream: no verdict on the backend
+            if self.breaker is not None:
+                self.breaker.release()
+            raise
+        self.latencies.add(time.monotonic() - start)
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+    def probe_due(self, now: float) -> bool:
+        return (
+            self.probe_supported
+            and self.probe_interval > 0
+            and (now >= self._next_probe)
+        )
+
+    def record_probe(
+        self, latency: float, error: Optional[BaseException] = None
+    ) -> None:
+        self._next_probe = time.monotonic() + self.probe_interval
+        self.last_probe_at = time.time()
+        self.last_probe_latency = latency
+        self.last_probe_error = (
+            None if error is None else f"{type(error).__name__}: {error}"
+        )
+        if self.breaker is None:
+            return
+        if error is None:
+            # Let the next call through as a trial rather than closing: the
+            # probe endpoint being up does not mean generation works
+            self.breaker.half_open()
+        elif is_failure(error):
+            self.breaker.trip()
+
+    def stats(self) -> dict:
+        return {
+            **(self.breaker.stats() if self.breaker is not None else {"state": None}),
+            "last_probe_at": self.last_probe_at,
+            "last_probe_latency": self.last_probe_latency,
+            "last_probe_error": self.last_probe_error,
+            "latency_p50": self.latencies.percentile(0.50),
+            "latency_p95": self.latencies.percentile(0.95),
+            "samples": len(self.latencies),
+        }
+
+
+class HealthProber:
+    """Background task probing each provider's cheap health endpoint.
+
+    `targets` returns the provider instances to watch; it is called on every
+    tick so that providers of reloaded configs are picked up. A probe that
+    cannot reach the backend opens its breaker right away, so requests fail
+    fast instead of waiting for the full HTTP timeout; a successful probe
+    half-opens it, so the next call is tried without waiting for `cooldown`.
+    """
+
+    def __init__(self, targets: Callable[[], Iterable[Any]], tick: float = 1.0):
+        self.targets = targets
+        self.tick = tick
+
+    async def _probe(self, provider: Any, health: ProviderHealth) -> None:
+        start = time.monotonic()
+        try:
+            probed = await asyncio.wait_for(provider.aprobe(), health.probe_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            health.record_probe(time.monotonic() - start, e)
+            return
+        if not probed:
+            health.probe_supported = False
+            return
+        health.record_probe(time.monotonic() - start)
+
+    async def probe_once(self) -> int:
+        """Probe every provider that is due; returns how many were probed."""
+        try:
+            providers = list(self.targets())
+        except Exception:
+            return 0  # e.g. config file missing or invalid: retry next tick
+        now = time.monotonic()
+        due = []
+        for provider in providers:
+            health = getattr(provider, "health", None)
+            if health is not None and getattr(provider, "aprobe", None) is not None:
+                if health.probe_due(now):
+                    due.append(self._probe(provider, health))
+        await asyncio.gather(*due)
+        return len(due)
+
+    async def run(self) -> None:
+        while True:
+            await self.probe_once()
+            await asyncio.sleep(self.tick)
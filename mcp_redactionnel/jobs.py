@@ -0,0 +1,390 @@
+"""Background jobs: accept a request now, run it later, keep the result.
+
+Jobs are rows of a SQLite file (`JobStore`) drained by `JobWorkers`, a
+pool of asyncio workers calling `redaction` / `mise_en_forme`. A worker
+claims a job by taking a lease that it renews while the job runs; a job
+whose lease runs out (worker killed, server restarted) is claimed again, so
+every accepted job is run at least once. The completion webhook is
+delivered under the same lease and may therefore reach the receiver more
+than once: the job `id` identifies duplicates.
+
+The store is SQLite, possibly shared with other processes: workers call it
+from a thread so that a busy lock never blocks the event loop.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+import httpx
+
+from . import metrics
+from .config import JobsConfig
+from .outbound import BlockedURL, OutboundPolicy
+from .service import amise_en_forme_by_name, aredaction_by_name
+
+log = logging.getLogger(__name__)
+
+KINDS = ("redaction", "mise_en_forme")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    request TEXT NOT NULL,
+    config_path TEXT NOT NULL,
+    webhook TEXT,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    provider_used TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claims INTEGER NOT NULL DEFAULT 0,
+    webhook_status TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    lease_until REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_claimable ON jobs (lease_until, created_at);
+"""
+
+# Unfinished jobs, and finished ones whose webhook is still to be sent
+_CLAIMABLE = (
+    "lease_until <= ? AND (status IN ('queued', 'running') "
+    "OR webhook_status = 'pending')"
+)
+
+JOBS = metrics.counter(
+    "mcp_jobs_total",
+    "Background jobs finished, by kind and status (done, error).",
+    ("kind", "status"),
+)
+WEBHOOKS = metrics.counter(
+    "mcp_job_webhooks_total",
+    "Job completion webhooks, by outcome (delivered, failed).",
+    ("status",),
+)
+
+
+def job_view(row: dict) -> dict:
+    """The public fields of a job row (what `GET /jobs/{id}` returns)."""
+    return {
+        "id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "result": row["result"],
+        "error": row["error"],
+        "provider_used": row["provider_used"],
+        "attempts": row["attempts"],
+        "created_at": row["created_at"],
+        "started_at": row["started_at"],
+        "finished_at": row["finished_at"],
+        "webhook_status": row["webhook_status"],
+    }
+
+
+class JobStore:
+    """SQLite queue of jobs, shared by every process pointing at `path`.
+
+    Status goes `queued` → `running` → `done` | `error`. Claims are atomic
+    (`BEGIN IMMEDIATE`), so several workers and processes can drain the same
+    file.
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(
+            path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        kind: str,
+        request: dict,
+        config_path: str = "config.yaml",
+        webhook: Optional[str] = None,
+    ) -> str:
+        if kind not in KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, request, config_path, webhook, "
+                "status, webhook_status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+                (
+                    job_id,
+                    kind,
+                    json.dumps(request, ensure_ascii=False),
+                    config_path,
+                    webhook,
+                    "pending" if webhook else None,
+                    time.time(),
+                ),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return None if row is None else dict(row)
+
+    def claim(self, lease: float) -> Optional[dict]:
+        """Take the oldest claimable job for `lease` seconds, or None.
+
+        An unfinished job comes back `running` with `claims` incremented; a
+        finished one only needs its webhook sent.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    f"SELECT * FROM jobs WHERE {_CLAIMABLE} "
+                    "ORDER BY created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    return None
+                job = dict(row)
+                job["lease_until"] = now + lease
+                if job["status"] in ("queued", "running"):
+                    job["status"] = "running"
+                    job["claims"] += 1
+                    job["started_at"] = job["started_at"] or now
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, claims = ?, started_at = ?, "
+                    "lease_until = ? WHERE id = ?",
+                    (
+                        job["status"],
+                        job["claims"],
+                        job["started_at"],
+                        job["lease_until"],
+                        job["id"],
+                    ),
+                )
+            finally:
+                self._db.execute("COMMIT")
+        return job
+
+    def renew(self, job_id: str, lease: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ?",
+                (time.time() + lease, job_id),
+            )
+
+    def release(self, job_id: str) -> None:
+        """Give an interrupted job back to the queue (clean shutdown)."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'queued', claims = claims - 1, "
+                "lease_until = 0 WHERE id = ? AND status = 'running'",
+                (job_id,),
+            )
+
+    def finish(
+        self,
+        job_id: str,
+        result: Optional[str] = None,
+        error: Optional[str] = None,
+        info: Optional[dict] = None,
+    ) -> None:
+        # The lease is kept: the same worker sends the webhook next
+        info = info or {}
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, "
+                "provider_used = ?, attempts = ?, finished_at = ? WHERE id = ?",
+                (
+                    "error" if error is not None else "done",
+                    result,
+                    error,
+                    info.get("provider"),
+                    info.get("attempts", 0),
+                    time.time(),
+                    job_id,
+                ),
+            )
+
+    def notified(self, job_id: str, delivered: bool) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET webhook_status = ?, lease_until = 0 WHERE id = ?",
+                ("delivered" if delivered else "failed", job_id),
+            )
+
+    def purge(self, older_than: float) -> int:
+        """Delete jobs finished more than `older_than` seconds ago."""
+        with self._lock:
+            cur = self._db.execute(
+                "DELETE FROM jobs WHERE finished_at < ? "
+                "AND (webhook_status IS NULL OR webhook_status != 'pending')",
+                (time.time() - older_than,),
+            )
+        return cur.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return {status: n for status, n in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class JobWorkers:
+    """Pool of `config.workers` asyncio workers draining a `JobStore`.
+
+    Workers poll the store every `poll_interval` seconds; `wake()` lets a
+    job submitted by this process start right away. Each wake-up bumps a
+    counter, so one worker going back to sleep does not swallow it for the
+    others.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        config: JobsConfig,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.store = store
+        self.config = config
+        self._transport = transport  # webhook client transport (tests)
+        self.policy = OutboundPolicy(
+            config.webhook_allowed_hosts, config.webhook_allow_private
+        )
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeups = 0
+        self._woken: Optional[asyncio.Condition] = None  # bound to run()'s loop
+
+    def wake(self) -> None:
+        """Have idle workers look for jobs now; callable from any thread
+        (e.g. a sync endpoint in the threadpool)."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return  # not running yet: the first claim finds the job
+        asyncio.run_coroutine_threadsafe(self._notify(), loop)
+
+    async def _notify(self) -> None:
+        async with self._woken:
+            self._wakeups += 1
+            self._woken.notify_all()
+
+    async def _wait(self, seen: int) -> None:
+        """Return once woken after `seen` wake-ups, or after `poll_interval`."""
+        with contextlib.suppress(TimeoutError):
+            async with asyncio.timeout(self.config.poll_interval):
+                async with self._woken:
+                    await self._woken.wait_for(lambda: self._wakeups != seen)
+
+    async def run(self) -> None:
+        self._woken = asyncio.Condition()
+        self._loop = asyncio.get_running_loop()
+        await asyncio.to_thread(self.store.purge, self.config.retention)
+        async with httpx.AsyncClient(
+            timeout=self.config.webhook_timeout,
+            transport=self._transport or self.policy.transport(),
+            event_hooks={"request": [self.policy.request_hook]},
+        ) as client:
+            await asyncio.gather(
+                *(self._worker(client) for _ in range(max(1, self.config.workers)))
+            )
+
+    async def _worker(self, client: httpx.AsyncClient) -> None:
+        while True:
+            # Read before claiming so a wake() in between is not lost
+            seen = self._wakeups
+            job = await asyncio.to_thread(self.store.claim, self.config.lease)
+            if job is None:
+                await self._wait(seen)
+                continue
+            await self.process(job, client)
+
+    async def process(self, job: dict, client: httpx.AsyncClient) -> None:
+        """Run a claimed job (unless already finished), then its webhook."""
+        if job["status"] == "running":
+            heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+            try:
+                if job["claims"] > self.config.max_claims:
+                    result, error, info = None, "abandoned after repeated claims", {}
+                else:
+                    result, error, info = await self._execute(job)
+            except asyncio.CancelledError:
+                # Inline: awaiting here could be cut short by the shutdown
+                self.store.release(job["id"])
+                raise
+            finally:
+                heartbeat.cancel()
+            await asyncio.to_thread(self.store.finish, job["id"], result, error, info)
+            JOBS.labels(job["kind"], "error" if error is not None else "done").inc()
+        if job["webhook"]:
+            delivered = await self._deliver(job["id"], job["webhook"], client)
+            await asyncio.to_thread(self.store.notified, job["id"], delivered)
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.config.lease / 3)
+            await asyncio.to_thread(self.store.renew, job_id, self.config.lease)
+
+    async def _execute(self, job: dict):
+        request = json.loads(job["request"])
+        info: dict = {}
+        try:
+            if job["kind"] == "mise_en_forme":
+                out = await amise_en_forme_by_name(
+                    request["provider"],
+                    request["texte"],
+                    config_path=job["config_path"],
+                    no_cache=bool(request.get("no_cache", False)),
+                    info=info,
+                )
+            else:
+                out = await aredaction_by_name(
+                    request["provider"],
+                    request["sujet"],
+                    sources=request.get("sources"),
+                    meta=request.get("meta"),
+                    config_path=job["config_path"],
+                    format=request.get("format") or "text",
+                    no_cache=bool(request.get("no_cache", False)),
+                    info=info,
+                )
+        except Exception as e:
+            return None, f"{type(e).__name__}: {e}", info
+        return out, None, info
+
+    async def _deliver(self, job_id: str, url: str, client: httpx.AsyncClient) -> bool:
+        payload = job_view(await asyncio.to_thread(self.store.get, job_id))
+        for attempt in range(1, max(1, self.config.webhook_attempts) + 1):
+            try:
+                resp = await client.post(url, json=payload)
+                if resp.is_success:
+                    WEBHOOKS.labels("delivered").inc()
+                    return True
+            except httpx.HTTPError:
+                pass
+            except BlockedURL as e:
+                log.warning("Webhook of job %s refused: %s", job_id, e)
+                break
+            if attempt < self.config.webhook_attempts:
+                await asyncio.sleep(min(30.0, 0.5 * 2 ** (attempt - 1)))
+        WEBHOOKS.labels("failed").inc()
+        return False
@@ -0,0 +1,260 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Deque, Optional
+
+from .config import ProviderConfig
+
+
+def estimate_tokens(prompt: str, max_tokens: Optional[int] = None) -> float:
+    """Rough token cost of a call: ~4 characters per prompt token + output."""
+    return len(prompt) / 4 + (max_tokens or 512)
+
+
+class RateLimitTimeout(RuntimeError):
+    """A request waited longer than `max_queue_wait` for its turn."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """One queued request; woken from any thread, waited on sync or async."""
+
+    def __init__(self, tokens: float, loop: Optional[asyncio.AbstractEventLoop]):
+        self.tokens = tokens
+        self.admitted = False
+        self.delay: Optional[float] = None
+        self._loop = loop
+        if loop is None:
+            self._event = threading.Event()
+        else:
+            self._aevent = asyncio.Event()
+
+    def wake(self) -> None:
+        if self._loop is None:
+            self._event.set()
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._aevent.set)
+        except RuntimeError:
+            pass  # loop closed: the waiter is gone
+
+    def wait(self, timeout: float) -> None:
+        self._event.wait(timeout)
+        self._event.clear()
+
+    async def await_(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._aevent.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._aevent.clear()
+
+
+class _Bucket:
+    """Token bucket refilled continuously at `rate` tokens per second."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self._stamp = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def delay_for(self, amount: float) -> float:
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+
+class ProviderLimiter:
+    """Outbound concurrency/rate governor for one provider.
+
+    Requests queue in FIFO order and are admitted only when a concurrency
+    slot is free, the request and token buckets can pay for them and no
+    upstream `Retry-After` pause is active. A request that cannot be admitted
+    within `max_wait` seconds gets `RateLimitTimeout` instead of tripping the
+    provider's quota.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        requests_per_second: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_wait: float = 30.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self._requests = (
+            _Bucket(requests_per_second, max(1.0, requests_per_second))
+            if requests_per_second
+            else None
+        )
+        self._tokens = (
+            _Bucket(tokens_per_minute / 60.0, tokens_per_minute)
+            if tokens_per_minute
+            else None
+        )
+        self._lock = threading.Lock()
+        self._queue: Deque[_Waiter] = deque()
+        self._paused_until = 0.0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.pauses = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    @classmethod
+    def from_config(cls, config: ProviderConfig) -> Optional["ProviderLimiter"]:
+        if not (
+            config.max_concurrency
+            or config.requests_per_second
+            or config.tokens_per_minute
+        ):
+            return None
+        return cls(
+            max_concurrency=config.max_concurrency,
+            requests_per_second=config.requests_per_second,
+            tokens_per_minute=config.tokens_per_minute,
+            max_wait=config.max_queue_wait,
+        )
+
+    def _dispatch(self, caller: Optional[_Waiter] = None) -> None:
+        # Caller holds the lock. Admit queued requests in order while the
+        # head fits; otherwise tell the head how long to sleep (waking it up,
+        # unless it is the one running the dispatcher).
+        now = time.monotonic()
+        for bucket in (self._requests, self._tokens):
+            if bucket is not None:
+                bucket.refill(now)
+        while self._queue:
+            head = self._queue[0]
+            if (
+                self.max_concurrency is not None
+                and self.in_flight >= self.max_concurrency
+            ):
+                return  # woken again by `release`
+            delay = max(0.0, self._paused_until - now)
+            if self._requests is not None:
+                delay = max(delay, self._requests.delay_for(1))
+            if self._tokens is not None:
+                delay = max(delay, self._tokens.delay_for(head.tokens))
+            if delay > 0:
+                head.delay = delay
+                if head is not caller:
+                    head.wake()
+                return
+            self._queue.popleft()
+            if self._requests is not None:
+                self._requests.level -= 1
+            if self._tokens is not None:
+                self._tokens.level -= min(head.tokens, self._tokens.capacity)
+            self.in_flight += 1
+            self.admitted += 1
+            head.admitted = True
+            head.wake()
+
+    def _enqueue(self, waiter: _Waiter) -> float:
+        with self._lock:
+            self._queue.append(waiter)
+            self._dispatch(waiter)
+        return time.monotonic()
+
+    def _next_timeout(self, waiter: _Waiter, deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if waiter.delay is not None:
+            remaining = min(remaining, waiter.delay)
+            waiter.delay = None
+        return max(0.0, remaining)
+
+    def _check(self, waiter: _Waiter, start: float, deadline: float) -> bool:
+        """Re-run the dispatcher; True once admitted, raise past the deadline."""
+        with self._lock:
+            if not waiter.admitted:
+                self._dispatch(waiter)
+            if waiter.admitted:
+                waited = time.monotonic() - start
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+                return True
+            if time.monotonic() < deadline:
+                return False
+            self._queue.remove(waiter)
+            self.rejected += 1
+            self._dispatch()
+        raise RateLimitTimeout(
+            f"Rate limit: no slot available within {self.max_wait:.0f}s",
+            retry_after=max(1.0, self._paused_until - time.monotonic()),
+        )
+
+    def acquire(self, tokens: float = 0) -> None:
+        waiter = _Waiter(tokens, None)
+        start = self._enqueue(waiter)
+        deadline = start + self.max_wait
+        while not self._check(waiter, start, deadline):
+            waiter.wait(self._next_timeout(waiter, deadline))
+
+    async def aacquire(self, tokens: float = 0) -> None:
+        waiter = _Waiter(tokens, asyncio.get_running_loop())
+        start = self._enqueue(waiter)
+        deadline = start + self.max_wait
+        try:
+            while not self._check(waiter, start, deadline):
+                await waiter.await_(self._next_timeout(waiter, deadline))
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.admitted:
+                    self.in_flight -= 1
+                else:
+                    self._queue.remove(waiter)
+                self._dispatch()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._dispatch()
+
+    def pause(self, seconds: float) -> None:
+        """Hold every queued request for `seconds` (upstream `Retry-After`)."""
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._paused_until:
+                self._paused_until = until
+                self.pauses += 1
+
+    @contextmanager
+    def slot(self, tokens: float = 0):
+        self.acquire(tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self, tokens: float = 0):
+        await self.aacquire(tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": len(self._queue),
+                "in_flight": self.in_flight,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "pauses": self.pauses,
+                "paused_for": max(0.0, self._paused_until - time.monotonic()),
+                "wait_seconds_total": self.wait_seconds,
+                "max_wait_seconds": self.max_wait_seconds,
+            }
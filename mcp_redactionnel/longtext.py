@@ -0,0 +1,166 @@
+"""Long-document mode of `mise_en_forme`: split, format in parts, stitch.
+
+A long `texte` is cut at section then paragraph boundaries (`split_text`),
+each part is formatted by the provider on its own, and the cleaned HTML
+fragments are joined by `Stitcher` into one `<article>`: a single `<h1>`,
+headings of later parts shifted below it, and `id`s made unique across
+parts (with the `href="#..."` / `aria-*` / `for` references that point to
+them rewritten).
+"""
+
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from .retrieval import split_passages
+
+# Heading-like lines: Markdown (#), numbered ("2.", "II -", "A)"), or a short
+# line without final punctuation
+_MARKDOWN_HEADING = re.compile(r"^#{1,6}\s")
+_NUMBERED_HEADING = re.compile(r"^(?:\d+(?:\.\d+)*|[IVXLC]+|[A-Z])[.)\-–]\s+\S")
+_BLANK_LINES = re.compile(r"\n[ \t]*\n")
+
+_OUTER_ARTICLE = re.compile(r"^\s*(<article\b[^>]*>)(.*)</article>\s*$", re.S | re.I)
+_ARTICLE_TAG = re.compile(r"<(/?)article\b[^>]*>", re.I)
+_HEADING_TAG = re.compile(r"<(/?)h([1-6])\b", re.I)
+_ID_ATTR = re.compile(r'(\bid\s*=\s*")([^"]*)(")', re.I)
+_REF_ATTR = re.compile(
+    r'(\b(?:href\s*=\s*"#|(?:aria-labelledby|aria-describedby|aria-controls|for)'
+    r'\s*=\s*"))([^"]*)(")',
+    re.I,
+)
+
+
+def _is_heading(block: str) -> bool:
+    line = block.strip()
+    if "\n" in line or not line:
+        return False
+    if _MARKDOWN_HEADING.match(line) or _NUMBERED_HEADING.match(line):
+        return len(line) <= 120
+    return len(line) <= 80 and line[-1] not in ".!?…:;,"
+
+
+def split_text(texte: str, max_chars: int) -> List[str]:
+    """Parts of at most ~`max_chars` characters, cut between paragraphs.
+
+    A part never ends with a heading, and a new section starts a new part
+    once the current one is at least half full. Paragraphs longer than
+    `max_chars` are cut at sentence ends.
+    """
+    blocks: List[str] = []
+    for block in _BLANK_LINES.split(texte.strip()):
+        block = block.strip()
+        if not block:
+            continue
+        if len(block) > max_chars:
+            blocks.extend(split_passages(block, max_chars))
+        else:
+            blocks.append(block)
+
+    parts: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for block in blocks:
+        heading = _is_heading(block)
+        full = size + len(block) > max_chars
+        if current and (full or (heading and size >= max_chars / 2)):
+            carried = []
+            # Keep a trailing heading with the paragraph it introduces
+            while current and _is_heading(current[-1]):
+                carried.insert(0, current.pop())
+            if current:
+                parts.append(current)
+            current = carried
+            size = sum(len(b) + 2 for b in current)
+        current.append(block)
+        size += len(block) + 2
+    if current:
+        parts.append(current)
+    return ["\n\n".join(part) for part in parts]
+
+
+def _unwrap(fragment: str) -> Tuple[Optional[str], str]:
+    """The opening tag and content of a fragment that is a single
+    `<article>`, or `(None, fragment)`."""
+    m = _OUTER_ARTICLE.match(fragment)
+    if m is None:
+        return None, fragment.strip()
+    depth = 0
+    for tag in _ARTICLE_TAG.finditer(m.group(2)):
+        depth += -1 if tag.group(1) else 1
+        if depth < 0:  # "<article>a</article><article>b</article>"
+            return None, fragment.strip()
+    if depth:
+        return None, fragment.strip()
+    return m.group(1), m.group(2).strip()
+
+
+class Stitcher:
+    """Joins formatted parts into one accessible fragment, in order.
+
+    `opening` is the first part's own `<article>` tag (attributes included)
+    once that part is added, a bare `<article>` otherwise.
+    """
+
+    closing = "\n</article>"
+
+    def __init__(self):
+        self.opening = "<article>\n"
+        self._ids: Set[str] = set()
+        self._top = None  # highest heading level of the first part
+        self._parts = 0
+
+    def _unique(self, name: str) -> str:
+        candidate, n = name, 2
+        while candidate in self._ids:
+            candidate, n = f"{name}-{n}", n + 1
+        self._ids.add(candidate)
+        return candidate
+
+    def add(self, fragment: str) -> str:
+        """`fragment` rewritten to fit after the parts already added."""
+        first = self._parts == 0
+        wrapper, html = _unwrap(fragment)
+        if first and wrapper is not None:
+            # Its ids and references are made unique along with the content
+            html = f"{wrapper}\n{html}"
+
+        levels = [int(level) for _, level in _HEADING_TAG.findall(html)]
+        if self._parts == 0:
+            self._top = min(levels, default=1)
+        elif levels:
+            # Only the first part may use the top level when it is <h1>
+            floor = 2 if self._top == 1 else self._top
+            shift = max(0, floor - min(levels))
+            if shift:
+                html = _HEADING_TAG.sub(
+                    lambda t: f"<{t.group(1)}h{min(6, int(t.group(2)) + shift)}",
+                    html,
+                )
+        self._parts += 1
+
+        renamed: Dict[str, str] = {}
+
+        def rename_id(t: re.Match) -> str:
+            name = t.group(2)
+            new = self._unique(name)
+            renamed.setdefault(name, new)
+            return f"{t.group(1)}{new}{t.group(3)}"
+
+        def rename_ref(t: re.Match) -> str:
+            names = " ".join(renamed.get(n, n) for n in t.group(2).split())
+            return f"{t.group(1)}{names}{t.group(3)}"
+
+        html = _ID_ATTR.sub(rename_id, html)
+        if renamed:
+            html = _REF_ATTR.sub(rename_ref, html)
+        if first and wrapper is not None:
+            tag = _ARTICLE_TAG.match(html)
+            self.opening = tag.group(0) + "\n"
+            html = html[tag.end() :].lstrip()
+        return html
+
+
+def stitch(fragments: List[str]) -> str:
+    stitcher = Stitcher()
+    body = "\n".join(stitcher.add(f) for f in fragments)
+    return stitcher.opening + body + stitcher.closing
@@ -0,0 +1,395 @@
+"""Model Context Protocol server over stdio.
+
+A long-lived process speaking JSON-RPC 2.0, one message per line on
+stdin/stdout (the MCP stdio transport). It exposes three tools:
+`redaction`, `mise_en_forme` and `list_providers`. Agents keep it running
+instead of starting `scripts/redact.py` for every call: the config, the
+compiled templates and the provider instances with their connection pools
+are loaded once (and warmed up at startup) and shared by every call.
+
+Each request runs in its own task, so several tool calls can be in flight
+at once; responses are written as they complete, in any order, and a
+`notifications/cancelled` from the client cancels the matching call.
+Only protocol messages go to stdout; logs go to stderr.
+
+Usage:
+  python -m mcp_redactionnel.mcp_server --config config.yaml
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import sys
+from typing import Any, BinaryIO, Dict, Optional
+
+from . import __version__, codec
+from .reload import ConfigWatcher
+from .service import (
+    amise_en_forme_by_name,
+    aredaction_by_name,
+    awarm_up,
+    get_registry,
+    load_settings,
+)
+
+log = logging.getLogger(__name__)
+
+# Newest first; an older version asked by the client is answered as is
+PROTOCOL_VERSIONS = ("2025-06-18", "2025-03-26", "2024-11-05")
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+
+_PROVIDER = {
+    "type": "string",
+    "description": "Nom d'un provider ou d'une chaîne de repli (`chains`).",
+}
+_NO_CACHE = {
+    "type": "boolean",
+    "description": "Ignore le cache de réponses (le résultat est tout de même "
+    "mis en cache).",
+}
+
+TOOLS = [
+    {
+        "name": "redaction",
+        "description": "Rédige un texte en français sur un sujet, à partir de "
+        "sources facultatives (URL téléchargées ou textes), en texte brut ou "
+        "en fragment HTML accessible.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "provider": _PROVIDER,
+                "sujet": {"type": "string"},
+                "sources": {"type": "array", "items": {"type": "string"}},
+                "meta": {
+                    "type": "object",
+                    "description": 'Consignes, ex. {"tone": "formel", '
+                    '"length": "400"}.',
+                },
+                "format": {"type": "string", "enum": ["text", "html"]},
+                "no_cache": _NO_CACHE,
+            },
+            "required": ["provider", "sujet"],
+        },
+    },
+    {
+        "name": "mise_en_forme",
+        "description": "Transforme un texte en fragment HTML accessible "
+        "(balises sémantiques, ARIA, structure).",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "provider": _PROVIDER,
+                "texte": {"type": "string"},
+                "no_cache": _NO_CACHE,
+            },
+            "required": ["provider", "texte"],
+        },
+    },
+    {
+        "name": "list_providers",
+        "description": "Liste les providers et les chaînes de repli configurés.",
+        "inputSchema": {"type": "object", "properties": {}},
+    },
+]
+_TOOL_NAMES = {tool["name"] for tool in TOOLS}
+
+
+class RPCError(Exception):
+    """Answered as a JSON-RPC error object."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def _argument(args: dict, name: str, kind: type, required: bool = False) -> Any:
+    value = args.get(name)
+    if value is None:
+        if required:
+            raise RPCError(INVALID_PARAMS, f"Missing argument: {name}")
+        return None
+    if not isinstance(value, kind):
+        raise RPCError(INVALID_PARAMS, f"Invalid argument: {name}")
+    return value
+
+
+def _served(out: str, info: dict) -> dict:
+    return {
+        "content": [{"type": "text", "text": out}],
+        "structuredContent": {
+            "result": out,
+            "provider_used": info.get("provider"),
+            "attempts": info.get("attempts", 0),
+            "cached": info.get("cached", False),
+            "usage": info.get("usage"),
+        },
+        "isError": False,
+    }
+
+
+class MCPServer:
+    """Dispatch of MCP requests to the service, for one config file."""
+
+    def __init__(self, config_path: str = "config.yaml"):
+        self.config_path = config_path
+        self._calls: Dict[Any, asyncio.Task] = {}
+        self._write_lock = asyncio.Lock()
+
+    # Methods
+
+    def _initialize(self, params: dict) -> dict:
+        requested = params.get("protocolVersion")
+        version = requested if requested in PROTOCOL_VERSIONS else PROTOCOL_VERSIONS[0]
+        return {
+            "protocolVersion": version,
+            "capabilities": {"tools": {"listChanged": False}},
+            "serverInfo": {"name": "mcp-redactionnel", "version": __version__},
+        }
+
+    async def _call_tool(self, params: dict) -> dict:
+        name = params.get("name")
+        args = params.get("arguments") or {}
+        if name not in _TOOL_NAMES:
+            raise RPCError(INVALID_PARAMS, f"Unknown tool: {name}")
+        if not isinstance(args, dict):
+            raise RPCError(INVALID_PARAMS, "Invalid arguments")
+        if name == "list_providers":
+            settings = load_settings(self.config_path)
+            listing = {
+                "providers": {
+                    key: {"type": p.type, "model": p.model}
+                    for key, p in settings.providers.items()
+                },
+                "chains": settings.chains,
+            }
+            return {
+                "content": [{"type": "text", "text": codec.dumps(listing).decode()}],
+                "structuredContent": listing,
+                "isError": False,
+            }
+
+        provider = _argument(args, "provider", str, required=True)
+        no_cache = _argument(args, "no_cache", bool) or False
+        info: dict = {}
+        if name == "redaction":
+            call = aredaction_by_name(
+                provider,
+                _argument(args, "sujet", str, required=True),
+                sources=_argument(args, "sources", list),
+                meta=_argument(args, "meta", dict),
+                config_path=self.config_path,
+                format=_argument(args, "format", str) or "text",
+                no_cache=no_cache,
+                info=info,
+            )
+        else:
+            call = amise_en_forme_by_name(
+                provider,
+                _argument(args, "texte", str, required=True),
+                config_path=self.config_path,
+                no_cache=no_cache,
+                info=info,
+            )
+        try:
+            out = await call
+        except Exception as e:
+            # Tool failures are results the model can read, not protocol errors
+            return {
+                "content": [{"type": "text", "text": f"{type(e).__name__}: {e}"}],
+                "isError": True,
+            }
+        return _served(out, info)
+
+    async def handle(self, message: Any) -> Optional[dict]:
+        """The response to one message (None for notifications)."""
+        if not isinstance(message, dict):
+            return _error(None, INVALID_REQUEST, "Invalid request")
+        if message.get("jsonrpc") != "2.0":
+            return _error(message.get("id"), INVALID_REQUEST, "Invalid request")
+        method = message.get("method")
+        params = message.get("params") or {}
+        if "id" not in message:
+            self._notify(method, params)
+            return None
+        msg_id = message["id"]
+        try:
+            if not isinstance(params, dict):
+                raise RPCError(INVALID_PARAMS, "Invalid params")
+            if method == "initialize":
+                result = self._initialize(params)
+            elif method == "ping":
+                result = {}
+            elif method == "tools/list":
+                result = {"tools": TOOLS}
+            elif method == "tools/call":
+                result = await self._call_tool(params)
+            else:
+                raise RPCError(METHOD_NOT_FOUND, f"Method not found: {method}")
+        except RPCError as e:
+            return _error(msg_id, e.code, str(e))
+        return {"jsonrpc": "2.0", "id": msg_id, "result": result}
+
+    def _notify(self, method: Optional[str], params: Any) -> None:
+        if method == "notifications/cancelled" and isinstance(params, dict):
+            task = self._calls.get(params.get("requestId"))
+            if task is not None:
+                task.cancel()
+        # notifications/initialized and the others need no action
+
+    # Transport
+
+    async def _send(self, writer: asyncio.StreamWriter, message: dict) -> None:
+        async with self._write_lock:
+            writer.write(codec.dumps(message) + b"\n")
+            await writer.drain()
+
+    async def _respond(self, writer: asyncio.StreamWriter, message: dict) -> None:
+        try:
+            response = await self.handle(message)
+        except asyncio.CancelledError:
+            return  # cancelled by the client: no response is expected
+        except Exception as e:
+            log.exception("Error handling %s", message.get("method"))
+            response = _error(message.get("id"), -32603, f"Internal error: {e}")
+        if response is not None:
+            await self._send(writer, response)
+
+    async def serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answer messages until the input is closed, then finish the calls
+        in flight."""
+        while True:
+            line = await _readline(reader)
+            if line == b"":
+                break
+            if line is None:  # over the stream limit
+                await self._send(writer, _error(None, PARSE_ERROR, "Parse error"))
+                continue
+            if not line.strip():
+                continue
+            try:
+                message = codec.loads(line)
+            except ValueError:
+                await self._send(writer, _error(None, PARSE_ERROR, "Parse error"))
+                continue
+            if not isinstance(message, dict) or "id" not in message:
+                await self._respond(writer, message)
+                continue
+            msg_id = message["id"]
+            if not isinstance(msg_id, (str, int, float, type(None))):
+                await self._send(writer, _error(None, INVALID_REQUEST, "Invalid id"))
+                continue
+            if msg_id in self._calls:
+                # Its response could not be told apart from the first one's
+                error = _error(msg_id, INVALID_REQUEST, "Duplicate request id")
+                await self._send(writer, error)
+                continue
+            task = asyncio.create_task(self._respond(writer, message))
+            self._calls[msg_id] = task
+            task.add_done_callback(lambda _, key=msg_id: self._calls.pop(key, None))
+        if self._calls:
+            await asyncio.gather(*self._calls.values(), return_exceptions=True)
+
+
+def _error(msg_id: Any, code: int, message: str) -> dict:
+    return {"jsonrpc": "2.0", "id": msg_id, "error": {"code": code, "message": message}}
+
+
+async def _readline(reader: asyncio.StreamReader) -> Optional[bytes]:
+    """The next line (b"" at EOF), or None for a line over the reader's
+    limit, which is skipped up to its newline."""
+    overrun = False
+    while True:
+        try:
+            line = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            line = e.partial  # last line without a newline, or EOF
+        except asyncio.LimitOverrunError as e:
+            # Left in the buffer: drop it and look for the end of the line
+            overrun = True
+            await reader.readexactly(e.consumed)
+            continue
+        return None if overrun else line
+
+
+async def open_streams(
+    stdin: BinaryIO, stdout: BinaryIO
+) -> "tuple[asyncio.StreamReader, asyncio.StreamWriter]":
+    """Non-blocking streams over two pipe file objects (stdio by default)."""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=64 * 1024 * 1024)  # long textes
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), stdin)
+    transport, protocol = await loop.connect_write_pipe(
+        asyncio.streams.FlowControlMixin, stdout
+    )
+    writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+    return reader, writer
+
+
+async def _warm_up(config_path: str) -> None:
+    try:
+        report = await awarm_up(config_path)
+    except Exception as e:
+        log.error("Warm-up of %s failed: %s: %s", config_path, type(e).__name__, e)
+        return
+    failed = [k for k, v in report["providers"].items() if not v.get("ok")]
+    log.info("Warm-up done in %.2fs; failed: %s", report["seconds"], failed or "none")
+
+
+async def run(
+    config_path: str = "config.yaml",
+    stdin: Optional[BinaryIO] = None,
+    stdout: Optional[BinaryIO] = None,
+) -> None:
+    """Serve MCP on `stdin`/`stdout` until the client closes the input."""
+    server = MCPServer(config_path)
+    tasks = []
+    if os.path.exists(config_path):
+        tasks.append(asyncio.create_task(_warm_up(config_path)))
+        try:
+            reload = load_settings(config_path).reload
+        except Exception:
+            reload = None  # reported by the warm-up
+        if reload is not None and reload.enabled:
+            watcher = ConfigWatcher(get_registry(), reload)
+            tasks.append(asyncio.create_task(watcher.run()))
+    reader, writer = await open_streams(
+        stdin or sys.stdin.buffer, stdout or sys.stdout.buffer
+    )
+    try:
+        await server.serve(reader, writer)
+    finally:
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        writer.close()
+        await get_registry().aclose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur MCP (stdio).")
+    parser.add_argument(
+        "--config", "-c", default="config.yaml", help="Chemin vers le fichier de config"
+    )
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+    # stdout carries the protocol: logs go to stderr
+    logging.basicConfig(
+        stream=sys.stderr,
+        level=args.log_level.upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    asyncio.run(run(args.config))
+
+
+if __name__ == "__main__":
+    main()
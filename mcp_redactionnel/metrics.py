@@ -0,0 +1,397 @@
+"""Minimal Prometheus instrumentation (text exposition format 0.0.4).
+
+Counters, gauges and histograms with labels, kept in a process-wide
+`REGISTRY`. Recording is a dict lookup plus a locked add, cheap enough for
+the request path; values that already live elsewhere (cache, limiter and
+breaker statistics) are not mirrored on every event but read at scrape time
+through collectors (`Registry.add_collector`).
+"""
+
+import asyncio
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upstream LLM calls take from milliseconds (cache-like fake) to minutes
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+# Local work (HTML cleaning, settings parsing): microseconds to tens of ms
+FAST_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+
+# (name, labels, value) rows of one metric family
+Sample = Tuple[str, Dict[str, str], float]
+# (name, type, help, samples)
+Family = Tuple[str, str, str, Iterable[Sample]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return "{" + inner + "}"
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last one: +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.label_names:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """The child for these label values (created on first use)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}")
+            with self._lock:
+                child = self._children.setdefault(
+                    tuple(str(v) for v in values), self._new_child()
+                )
+                self._children.setdefault(values, child)
+        return child
+
+    def _items(self) -> List[Tuple[Dict[str, str], object]]:
+        with self._lock:
+            items = list(self._children.items())
+        seen = set()
+        rows = []
+        for values, child in items:
+            if id(child) in seen:
+                continue
+            seen.add(id(child))
+            rows.append((dict(zip(self.label_names, map(str, values))), child))
+        return rows
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, child in self._items():
+            yield self.name, labels, child.value
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labels)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, child in self._items():
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else _format_value(bound)
+                yield f"{self.name}_bucket", {**labels, "le": le}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collect: Callable[[], Iterable[Family]]) -> None:
+        """`collect()` is called on every scrape and returns metric families."""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self) -> str:
+        with self._lock:
+            families: List[Family] = [
+                (m.name, m.type, m.help, m.samples()) for m in self._metrics.values()
+            ]
+            collectors = list(self._collectors)
+        for collect in collectors:
+            families.extend(collect())
+        lines = []
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(
+                    f"{sample_name}{_format_labels(labels)} {_format_value(value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def family(
+    name: str, kind: str, help: str, rows: Iterable[Tuple[Dict[str, str], float]]
+) -> Family:
+    """A collector family from `(labels, value)` rows."""
+    return name, kind, help, [(name, labels, value) for labels, value in rows]
+
+
+def counter(name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labels))
+
+
+def gauge(name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labels))
+
+
+def histogram(
+    name: str,
+    help: str,
+    labels: Sequence[str] = (),
+    buckets: Sequence[float] = LATENCY_BUCKETS,
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labels, buckets))
+
+
+# Metrics recorded by the service itself
+UPSTREAM_LATENCY = histogram(
+    "mcp_upstream_request_duration_seconds",
+    "Duration of provider calls, by provider and outcome "
+    "(HTTP status, 'ok' or exception name).",
+    ("provider", "status"),
+)
+UPSTREAM_IN_FLIGHT = gauge(
+    "mcp_upstream_in_flight", "Provider calls in progress.", ("provider",)
+)
+TOKENS = counter(
+    "mcp_tokens_total",
+    "Tokens reported by the provider (`usage`), by kind (prompt/completion).",
+    ("provider", "kind"),
+)
+OLLAMA_DURATION = histogram(
+    "mcp_ollama_duration_seconds",
+    "Time reported by Ollama per phase: model load, prompt evaluation "
+    "(prompt_eval) and generation (eval).",
+    ("provider", "phase"),
+)
+REQUESTS = counter(
+    "mcp_requests_total",
+    "Generation requests received, by endpoint and output format.",
+    ("endpoint", "format"),
+)
+HTTP_LATENCY = histogram(
+    "mcp_http_request_duration_seconds",
+    "HTTP request duration (until the last byte of the body is sent).",
+    ("endpoint", "method", "status"),
+)
+HTTP_IN_FLIGHT = gauge("mcp_http_in_flight", "HTTP requests in progress.")
+CLEAN_LATENCY = histogram(
+    "mcp_html_clean_duration_seconds",
+    "Time spent cleaning generated HTML.",
+    buckets=FAST_BUCKETS,
+)
+SETTINGS_LOAD = histogram(
+    "mcp_settings_load_duration_seconds",
+    "Time spent parsing a config file (first load or after a change).",
+    buckets=FAST_BUCKETS,
+)
+
+
+def status_of(exc: BaseException) -> str:
+    """Value of the `status` label for a failed provider call."""
+    if isinstance(exc, (GeneratorExit, asyncio.CancelledError)):
+        return "cancelled"  # client went away mid-call
+    status = getattr(exc, "status_code", None)
+    return str(status) if status is not None else type(exc).__name__
+
+
+# Tokens of the generation being served, see `usage_scope`
+_request_usage: ContextVar[Optional[Dict[str, int]]] = ContextVar(
+    "request_usage", default=None
+)
+
+
+@contextmanager
+def usage_scope() -> Iterator[Dict[str, int]]:
+    """Collect the tokens reported by the provider calls made inside.
+
+    The dict is shared with the tasks and `asyncio.to_thread` calls started
+    in the scope, so retries and continuations add up.
+    """
+    usage = {"prompt_tokens": 0, "completion_tokens": 0}
+    token = _request_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _request_usage.reset(token)
+
+
+def record_usage(provider: str, usage: dict) -> None:
+    """Count the `usage` block of an OpenAI/Mistral-style response."""
+    if not isinstance(usage, dict):
+        return
+    scope = _request_usage.get()
+    for kind in ("prompt", "completion"):
+        count = usage.get(f"{kind}_tokens")
+        if isinstance(count, (int, float)) and count > 0:
+            TOKENS.labels(provider, kind).inc(count)
+            if scope is not None:
+                scope[f"{kind}_tokens"] += int(count)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request.
+
+    The `endpoint` label is the route template (`/redaction`), or `other` for
+    unmatched paths so that random URLs cannot grow the label set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # The router stores the matched route in the (shared) scope
+            endpoint = getattr(scope.get("route"), "path", None) or "other"
+            HTTP_LATENCY.labels(endpoint, scope["method"], status).observe(
+                time.perf_counter() - start
+            )
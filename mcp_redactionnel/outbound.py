@@ -0,0 +1,151 @@
+"""Checks on URLs the server fetches on behalf of its callers.
+
+`sources` URLs and job webhooks are chosen by whoever calls the API or the
+MCP tools. Fetched as is, they would reach the server's own network:
+loopback, the cloud metadata service on 169.254.169.254, private ranges.
+`OutboundPolicy` lets through http(s) URLs whose host is allowed and
+resolves only to public addresses. Installed as a request hook on a
+client, it also vets every redirect.
+
+The hook resolves the host name to check it, and the connection would
+resolve it again: a DNS server answering with a public address, then with
+an internal one (DNS rebinding), would get past the hook. The transport
+from `OutboundPolicy.transport` closes that gap by connecting only to the
+addresses it has just vetted, while TLS (SNI, certificate) and the `Host`
+header keep the original name. It does not go through the `HTTP(S)_PROXY`
+environment variables.
+"""
+
+import asyncio
+import fnmatch
+import ipaddress
+import socket
+from typing import Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import httpcore
+import httpx
+
+
+class BlockedURL(ValueError):
+    """The URL is refused by the outbound policy."""
+
+
+async def resolve(host: str, port: int) -> List[str]:
+    """Addresses `host` resolves to (an IP literal resolves to itself)."""
+    infos = await asyncio.get_running_loop().getaddrinfo(
+        host, port, type=socket.SOCK_STREAM
+    )
+    return [info[4][0] for info in infos]
+
+
+class OutboundPolicy:
+    """Which URLs may be requested.
+
+    `allowed_hosts` holds host names or patterns (`"*.example.org"`); when
+    empty, any host is allowed. Unless `allow_private` is set, every address
+    the host resolves to must be public, and clients should use
+    `transport()` so the connection goes to the addresses checked.
+    """
+
+    def __init__(self, allowed_hosts: Iterable[str] = (), allow_private: bool = False):
+        self.allowed_hosts = [h.lower() for h in allowed_hosts]
+        self.allow_private = allow_private
+
+    def check_url(self, url: str) -> str:
+        """Check the scheme and the host name; returns the host."""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise BlockedURL(f"scheme not allowed: {parts.scheme or '(none)'}")
+        host = (parts.hostname or "").lower()
+        if not host:
+            raise BlockedURL(f"no host in {url}")
+        if self.allowed_hosts and not any(
+            fnmatch.fnmatchcase(host, pattern) for pattern in self.allowed_hosts
+        ):
+            raise BlockedURL(f"host not allowed: {host}")
+        return host
+
+    async def acheck(self, url: str) -> None:
+        """Raise `BlockedURL` unless `url` may be requested."""
+        host = self.check_url(url)
+        if self.allow_private:
+            return
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        await self.public_addresses(host, port)
+
+    async def public_addresses(self, host: str, port: int) -> List[str]:
+        """Addresses of `host`; raise `BlockedURL` if one is not public."""
+        addresses = await resolve(host, port)
+        for address in addresses:
+            ip = ipaddress.ip_address(address.split("%", 1)[0])  # IPv6 scope
+            if not ip.is_global:
+                raise BlockedURL(f"{host} resolves to a non-public address ({ip})")
+        return addresses
+
+    async def request_hook(self, request: httpx.Request) -> None:
+        """`event_hooks={"request": [...]}` entry: runs for each redirect."""
+        await self.acheck(str(request.url))
+
+    def transport(
+        self, limits: httpx.Limits = httpx.Limits()
+    ) -> Optional[httpx.AsyncHTTPTransport]:
+        """Transport connecting only to vetted addresses.
+
+        None with `allow_private`: nothing to pin, the client keeps its
+        default transport. A client given a transport ignores its own
+        `limits`, so they are passed here.
+        """
+        if self.allow_private:
+            return None
+        return _PinnedTransport(self, limits)
+
+
+class _VettedBackend(httpcore.AsyncNetworkBackend):
+    """Network backend resolving each host once, through the policy.
+
+    httpcore hands it the URL's host name and does the TLS handshake on the
+    returned stream with that same name, so only the socket is pinned.
+    """
+
+    def __init__(
+        self,
+        policy: OutboundPolicy,
+        backend: Optional[httpcore.AsyncNetworkBackend] = None,
+    ):
+        self._policy = policy
+        self._backend = backend or httpcore.AnyIOBackend()
+
+    async def connect_tcp(
+        self, host, port, timeout=None, local_address=None, socket_options=None
+    ) -> httpcore.AsyncNetworkStream:
+        error: Optional[Exception] = None
+        for address in await self._policy.public_addresses(host, port):
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout, local_address, socket_options
+                )
+            except httpcore.ConnectError as e:
+                error = e
+        raise error or httpcore.ConnectError(f"no address for {host}")
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        raise BlockedURL("unix sockets are not allowed")
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class _PinnedTransport(httpx.AsyncHTTPTransport):
+    """`httpx.AsyncHTTPTransport` whose connections go through `_VettedBackend`."""
+
+    def __init__(self, policy: OutboundPolicy, limits: httpx.Limits):
+        super().__init__(limits=limits)
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            network_backend=_VettedBackend(policy),
+        )
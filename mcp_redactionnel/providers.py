@@ -1,99 +1,554 @@
-from typing import Any, Optional
+import asyncio
+import contextlib
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
 
 import httpx
-from jinja2 import Template
 
+from . import codec, metrics
 from .config import ProviderConfig
+from .templating import compile_headers, compile_template
+
+_DEFAULT_BODY_TEMPLATE = '{"prompt": "{{ prompt }}"}'
+# `meta` keys passed to Ollama as `options`
+_META_OPTIONS = ("num_ctx", "num_predict")
+
+
+class ProviderHTTPError(RuntimeError):
+    """Error status returned by a provider endpoint.
+
+    `retry_after` holds the upstream `Retry-After` delay in seconds, if any.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        status_code: int,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """`Retry-After` is either a number of seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
 
 
 class BaseProvider:
     def generate(self, prompt: str, **kwargs) -> str:
         raise NotImplementedError
 
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        """Async variant of `generate`.
 
-def _extract_path(obj: Any, path: Optional[str]) -> Optional[str]:
-    if not path:
-        return None
-    parts = path.split(".")
-    cur = obj
+        The default runs `generate` in a worker thread so that providers
+        without a native async implementation still work from async code.
+        """
+        return await asyncio.to_thread(self.generate, prompt, **kwargs)
+
+    def generate_stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Yield the generated text as successive deltas.
+
+        Providers without a streaming wire format yield the whole text once.
+        """
+        yield self.generate(prompt, **kwargs)
+
+    async def agenerate_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        yield await self.agenerate(prompt, **kwargs)
+
+    async def aprobe(self) -> bool:
+        """Cheap liveness check used by the background health prober.
+
+        Returns False when there is nothing to probe; raises if the backend
+        is unreachable or answers with an error status.
+        """
+        return False
+
+    async def awarm(self, models: bool = True) -> bool:
+        """Get ready for the first request (connections, model loading).
+
+        Returns False when there is nothing to warm up; raises if the backend
+        cannot be reached.
+        """
+        return False
+
+    def close(self) -> None:
+        """Release resources held by the provider (no-op by default)."""
+
+    async def aclose(self) -> None:
+        self.close()
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _encoded(request_kwargs: dict) -> dict:
+    """Serialize a `json=` body with the service codec instead of httpx's."""
+    if "json" not in request_kwargs:
+        return request_kwargs
+    request_kwargs = dict(request_kwargs)
+    body = request_kwargs.pop("json")
+    headers = request_kwargs.get("headers") or {}
+    if not any(k.lower() == "content-type" for k in headers):
+        headers = {**headers, "Content-Type": "application/json"}
+    request_kwargs["headers"] = headers
+    request_kwargs["content"] = codec.dumps(body)
+    return request_kwargs
+
+
+# Strong references to fire-and-forget tasks until they are done
+_background: "set[asyncio.Task]" = set()
+
+
+def _spawn(coro) -> None:
+    task = asyncio.get_running_loop().create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _aclose_orphan(client: httpx.AsyncClient) -> None:
+    """Close an `AsyncClient`, even one whose event loop is closed: its
+    sockets are released, then the transports fail to schedule their last
+    callbacks on the dead loop."""
+    with contextlib.suppress(RuntimeError):
+        await client.aclose()
+
+
+def retire_client(client: httpx.AsyncClient, loop) -> None:
+    """Close `client`, opened on `loop`, without waiting for it: on that
+    loop if it still runs in another thread, from the running one if not
+    (or right away, from synchronous code)."""
     try:
-        for p in parts:
-            if isinstance(cur, list):
-                idx = int(p)
-                cur = cur[idx]
-            else:
-                cur = cur.get(p)
-    except Exception:
-        return None
-    if isinstance(cur, str):
-        return cur
-    # fallback to stringify
-    return None if cur is None else str(cur)
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if loop is not running and loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+    elif running is None:
+        asyncio.run(_aclose_orphan(client))
+    else:
+        _spawn(_aclose_orphan(client))
 
 
 class GenericHTTPProvider(BaseProvider):
     def __init__(self, config: ProviderConfig):
         self.config = config
+        # Templates are compiled once per provider instance, not per call
+        self._body_template = compile_template(
+            config.body_template or _DEFAULT_BODY_TEMPLATE
+        )
+        self._header_templates = compile_headers(config.headers)
+        self._response_path = codec.compile_path(config.response_path)
+        self._lock = threading.Lock()
+        self._client: Optional[httpx.Client] = None
+        # One async client per event loop using the provider. Not weak
+        # references: a client must outlive its loop to be closed
+        self._aclients: Dict[Any, httpx.AsyncClient] = {}
 
-    def generate(self, prompt: str, **kwargs) -> str:
-        import json
-
-        template = self.config.body_template or '{"prompt": "{{ prompt }}"}'
-        body = Template(template).render(prompt=prompt, **kwargs)
-        headers = {
-            k: Template(v).render(**kwargs)
-            for k, v in (self.config.headers or {}).items()
+    def _client_kwargs(self) -> dict:
+        pool = self.config.pool
+        timeouts = self.config.timeouts
+        return {
+            "limits": httpx.Limits(
+                max_connections=pool.max_connections,
+                max_keepalive_connections=pool.max_keepalive_connections,
+                keepalive_expiry=pool.keepalive_expiry,
+            ),
+            "timeout": httpx.Timeout(
+                connect=timeouts.connect,
+                read=timeouts.read,
+                write=timeouts.write,
+                pool=timeouts.pool,
+            ),
+            "http2": self.config.http2,
         }
 
-        # Try to send as JSON when the template renders valid JSON
+    @property
+    def client(self) -> httpx.Client:
+        """Long-lived pooled client, created on first use."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(**self._client_kwargs())
+        return self._client
+
+    @property
+    def aclient(self) -> httpx.AsyncClient:
+        """Async twin of `client`, bound to the running event loop.
+
+        Connections of an `AsyncClient` cannot be shared across event loops,
+        so each loop using the provider gets its own client. Those left by
+        loops that have since closed (`asyncio.run` wrappers) are closed
+        when a new one is opened.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._aclients.get(loop)
+        if client is not None:
+            return client
+        with self._lock:
+            stale = [(o, c) for o, c in self._aclients.items() if o.is_closed()]
+            for owner, _ in stale:
+                del self._aclients[owner]
+            client = self._aclients.get(loop)
+            if client is None:
+                client = self._aclients[loop] = httpx.AsyncClient(
+                    **self._client_kwargs()
+                )
+        for owner, old in stale:
+            retire_client(old, owner)
+        return client
+
+    def close(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+            aclients = list(self._aclients.items())
+            self._aclients.clear()
+        if client is not None:
+            client.close()
+        for owner, aclient in aclients:
+            retire_client(aclient, owner)
+
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            aclients = list(self._aclients.items())
+            self._aclients.clear()
+        self.close()
+        for owner, aclient in aclients:
+            if owner is loop or owner.is_closed():
+                await _aclose_orphan(aclient)
+            else:
+                # Still serving another thread's loop: close it there
+                asyncio.run_coroutine_threadsafe(aclient.aclose(), owner)
+
+    def _render_headers(self, **kwargs) -> dict:
+        return {k: t.render(**kwargs) for k, t in self._header_templates.items()}
+
+    def _build_request(self, prompt: str, **kwargs) -> dict:
+        """Return the keyword arguments for `client.request`."""
+        body = self._body_template.render(prompt=prompt, **kwargs)
         request_kwargs = {
-            "headers": headers,
-            "timeout": 30.0,
+            "method": self.config.method,
+            "url": self.config.endpoint,
+            "headers": self._render_headers(**kwargs),
         }
+        # Try to send as JSON when the template renders valid JSON
         try:
-            json_body = json.loads(body)
+            json_body = codec.loads(body)
             request_kwargs["json"] = json_body
-        except Exception:
+        except ValueError:
             request_kwargs["content"] = body
+        return request_kwargs
 
-        resp = httpx.request(
-            self.config.method,
-            self.config.endpoint,
-            **request_kwargs,
-        )
-        # On error, include response body to ease debugging
+    def _max_tokens(self, kwargs: dict, default: Optional[int] = None) -> Optional[int]:
+        """Requested output tokens, capped by the provider's `max_tokens`."""
+        requested = kwargs.get("max_tokens") or default
+        ceiling = self.config.max_tokens
+        if requested is None or ceiling is None:
+            return requested or ceiling
+        return min(requested, ceiling)
+
+    def _parse_response(self, resp: httpx.Response) -> str:
+        return self._parse_data(resp)[0]
+
+    def _parse_data(self, resp: httpx.Response) -> Tuple[str, Any]:
+        """The generated text and the decoded body (None if not JSON)."""
+        # The body is decoded once: JSON straight from the bytes, and the
+        # text only when it is not JSON or has nothing at `response_path`
         try:
-            resp.raise_for_status()
-        except httpx.HTTPStatusError as exc:
-            content = None
+            data = codec.loads(resp.content)
+        except ValueError:
+            data = None
+
+        # On error, include response body to ease debugging
+        if resp.is_error:
+            content = data if data is not None else resp.text
+            raise ProviderHTTPError(
+                f"HTTP {resp.status_code} from {self.config.endpoint}: {content}",
+                status_code=resp.status_code,
+                retry_after=_parse_retry_after(resp.headers.get("retry-after")),
+            )
+
+        if data is None:
+            return resp.text, None
+        self._record_usage(data)
+        return self._extract(data) or resp.text, data
+
+    def _extract(self, data: Any) -> Optional[str]:
+        """The generated text in a decoded response (None if not found)."""
+        if self._response_path is None:
+            return None
+        return self._response_path.extract(data)
+
+    def _metrics_name(self) -> str:
+        return getattr(self, "name", None) or self.config.model or "unknown"
+
+    def _record_usage(self, data: Any) -> None:
+        # OpenAI/Mistral-style `usage` block, when the backend reports one
+        if isinstance(data, dict) and data.get("usage"):
+            metrics.record_usage(self._metrics_name(), data["usage"])
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        resp = self.client.request(**_encoded(self._build_request(prompt, **kwargs)))
+        return self._parse_response(resp)
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        req = _encoded(self._build_request(prompt, **kwargs))
+        resp = await self.aclient.request(**req)
+        return self._parse_response(resp)
+
+    def _probe_url(self) -> Optional[str]:
+        return self.config.health.probe_url
+
+    async def aprobe(self) -> bool:
+        url = self._probe_url()
+        if not url:
+            return False
+        resp = await self.aclient.get(
+            url,
+            headers=self._render_headers(),
+            timeout=self.config.health.probe_timeout,
+        )
+        # A 401/404 is no success: it says nothing of the backend's health
+        if resp.is_error:
+            self._parse_response(resp)
+        return True
+
+    async def awarm(self, models: bool = True) -> bool:
+        # Any answer opens (and pools) the TCP/TLS connection
+        if self._probe_url():
             try:
-                content = resp.json()
-            except Exception:
-                content = resp.text
-            raise RuntimeError(
-                f"HTTP {resp.status_code} from {self.config.endpoint}: {content}"
-            ) from exc
+                return await self.aprobe()
+            except ProviderHTTPError as e:
+                if e.status_code >= 500:
+                    raise
+                return True
+        await self.aclient.head(self.config.endpoint, headers=self._render_headers())
+        return True
 
-        try:
-            data = resp.json()
-        except Exception:
-            return resp.text
-        extracted = _extract_path(data, self.config.response_path)
-        return extracted or (resp.text if isinstance(resp.text, str) else str(data))
+    # Streaming: subclasses that know their wire format override
+    # `_build_stream_request` and `_parse_stream_line`.
+    def _build_stream_request(self, prompt: str, **kwargs) -> Optional[dict]:
+        return None
+
+    def _parse_stream_line(self, line: str) -> Tuple[Optional[str], bool]:
+        """Return `(delta, done)` for one line of the streamed body."""
+        raise NotImplementedError
+
+    def generate_stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        req = self._build_stream_request(prompt, **kwargs)
+        if req is None:
+            yield self.generate(prompt, **kwargs)
+            return
+        with self.client.stream(**_encoded(req)) as resp:
+            if resp.is_error:
+                resp.read()
+                self._parse_response(resp)
+            for line in resp.iter_lines():
+                delta, done = self._parse_stream_line(line)
+                if delta:
+                    yield delta
+                if done:
+                    break
+
+    async def agenerate_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        req = self._build_stream_request(prompt, **kwargs)
+        if req is None:
+            yield await self.agenerate(prompt, **kwargs)
+            return
+        async with self.aclient.stream(**_encoded(req)) as resp:
+            if resp.is_error:
+                await resp.aread()
+                self._parse_response(resp)
+            async for line in resp.aiter_lines():
+                delta, done = self._parse_stream_line(line)
+                if delta:
+                    yield delta
+                if done:
+                    break
+
+
+def _ollama_text(obj: Any) -> Optional[str]:
+    # /api/generate answers in `response`, /api/chat in `message.content`
+    if not isinstance(obj, dict):
+        return None
+    text = obj.get("response")
+    if text is None:
+        text = (obj.get("message") or {}).get("content")
+    return text
 
 
 class OllamaProvider(GenericHTTPProvider):
-    def __init__(self, config: ProviderConfig):
-        # Ollama usually expects JSON with 'prompt' and returns
-        # 'choices[0].message.content' or similar
-        super().__init__(config)
+    """Native Ollama client.
+
+    Without `body_template`, generations go to `/api/chat` with a native
+    payload: `model`, one user message, an explicit `stream`, `keep_alive`
+    and `options` (the provider's `options`, then `max_tokens` as
+    `num_predict`, then `meta.num_ctx` / `meta.num_predict`). With a
+    `body_template`, the templated body is posted to `endpoint` as before,
+    completed with the same fields when it leaves them out.
+
+    The last object of every answer (JSON, or the final NDJSON line) feeds
+    `mcp_tokens_total` (`prompt_eval_count` / `eval_count`) and
+    `mcp_ollama_duration_seconds` (load, prompt evaluation, generation).
+    """
+
+    def _probe_url(self) -> Optional[str]:
+        return super()._probe_url() or _origin(self.config.endpoint) + "/api/version"
+
+    def _chat_url(self) -> str:
+        endpoint = self.config.endpoint.rstrip("/")
+        if endpoint.endswith("/api/chat"):
+            return endpoint
+        return _origin(endpoint) + "/api/chat"
+
+    def _options(self, base: Optional[dict], kwargs: dict) -> dict:
+        options = {**self.config.options, **(base or {})}
+        num_predict = self._max_tokens(kwargs)
+        if num_predict is not None:
+            options["num_predict"] = num_predict
+        meta = kwargs.get("meta")
+        for key in _META_OPTIONS:
+            value = meta.get(key) if isinstance(meta, dict) else None
+            if value is None:
+                continue
+            try:
+                options[key] = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"meta.{key} must be an integer: {value!r}") from None
+        return options
+
+    def _build_request(self, prompt: str, **kwargs) -> dict:
+        if self.config.body_template is None:
+            model = self._model() or kwargs.get("model")
+            if not model:
+                raise ValueError(
+                    f"Ollama provider {self.config.endpoint}: `model` is not set"
+                )
+            body = {
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "stream": False,
+            }
+            req = {
+                "method": "POST",
+                "url": self._chat_url(),
+                "headers": self._render_headers(**kwargs),
+                "json": body,
+            }
+        else:
+            req = super()._build_request(prompt, **kwargs)
+            body = req.get("json")
+            if not isinstance(body, dict):
+                return req
+            # Ollama streams unless told otherwise
+            body.setdefault("stream", False)
+        if self.config.keep_alive is not None:
+            body.setdefault("keep_alive", self.config.keep_alive)
+        options = self._options(body.get("options"), kwargs)
+        if options:
+            body["options"] = options
+        return req
+
+    def _model(self) -> Optional[str]:
+        if self.config.model:
+            return self.config.model
+        # Otherwise the model named in the body template, if any
+        try:
+            body = codec.loads(self._body_template.render(prompt=""))
+        except ValueError:
+            return None
+        return body.get("model") if isinstance(body, dict) else None
+
+    async def awarm(self, models: bool = True) -> bool:
+        model = self._model() if models else None
+        if model is None:
+            return await super().awarm(models)
+        # A request without prompt only loads the model (and keeps it loaded
+        # for `keep_alive`)
+        body = {"model": model}
+        if self.config.keep_alive is not None:
+            body["keep_alive"] = self.config.keep_alive
+        resp = await self.aclient.post(
+            _origin(self.config.endpoint) + "/api/generate",
+            headers=self._render_headers(),
+            json=body,
+        )
+        if resp.is_error:
+            self._parse_response(resp)
+        return True
+
+    def _parse_response(self, resp: httpx.Response) -> str:
+        if not resp.is_error and "ndjson" in resp.headers.get("content-type", ""):
+            # Streamed answer to a template that asks for `"stream": true`
+            deltas = (self._parse_stream_line(line)[0] for line in resp.iter_lines())
+            return "".join(d for d in deltas if d)
+        return super()._parse_response(resp)
+
+    def _extract(self, data: Any) -> Optional[str]:
+        return super()._extract(data) or _ollama_text(data)
+
+    def _record_usage(self, data: Any) -> None:
+        if not isinstance(data, dict) or not data.get("done"):
+            return
+        name = self._metrics_name()
+        metrics.record_usage(
+            name,
+            {
+                "prompt_tokens": data.get("prompt_eval_count"),
+                "completion_tokens": data.get("eval_count"),
+            },
+        )
+        for phase in ("load", "prompt_eval", "eval"):
+            ns = data.get(f"{phase}_duration")
+            if isinstance(ns, (int, float)) and ns > 0:
+                metrics.OLLAMA_DURATION.labels(name, phase).observe(ns / 1e9)
+
+    def _build_stream_request(self, prompt: str, **kwargs) -> Optional[dict]:
+        req = self._build_request(prompt, **kwargs)
+        if "json" not in req:
+            return None
+        req["json"]["stream"] = True
+        return req
+
+    def _parse_stream_line(self, line: str) -> Tuple[Optional[str], bool]:
+        # Ollama streams NDJSON: one object per line, the last one has done=true
+        if not line.strip():
+            return None, False
+        obj = codec.loads(line)
+        if obj.get("error"):
+            raise RuntimeError(f"Ollama error from {self.config.endpoint}: {obj}")
+        done = bool(obj.get("done"))
+        if done:
+            self._record_usage(obj)
+        return _ollama_text(obj), done
 
 
 class MistralProvider(GenericHTTPProvider):
     def __init__(self, config: ProviderConfig):
         super().__init__(config)
 
-    def generate(self, prompt: str, **kwargs) -> str:
+    def _probe_url(self) -> Optional[str]:
+        return super()._probe_url() or _origin(self.config.endpoint) + "/v1/models"
+
+    def _build_request(self, prompt: str, **kwargs) -> dict:
         # Build payload using Python dicts to avoid pitfalls
         model = (
             getattr(self.config, "model", None)
@@ -103,34 +558,83 @@ class MistralProvider(GenericHTTPProvider):
         payload = {
             "model": model,
             "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": kwargs.get("max_tokens", 512),
+            "max_tokens": self._max_tokens(kwargs, 512),
             "stream": False,
         }
-        headers = {
-            k: Template(v).render(**kwargs)
-            for k, v in (self.config.headers or {}).items()
+        return {
+            "method": "POST",
+            "url": self.config.endpoint,
+            "headers": self._render_headers(**kwargs),
+            "json": payload,
         }
-        resp = httpx.post(
-            self.config.endpoint,
-            headers=headers,
-            json=payload,
-            timeout=30.0,
-        )
-        try:
-            resp.raise_for_status()
-        except httpx.HTTPStatusError as exc:
-            content = None
-            try:
-                content = resp.json()
-            except Exception:
-                content = resp.text
-            raise RuntimeError(
-                f"HTTP {resp.status_code} from {self.config.endpoint}: {content}"
-            ) from exc
 
-        try:
-            data = resp.json()
-        except Exception:
-            return resp.text
-        extracted = _extract_path(data, self.config.response_path)
-        return extracted or (resp.text if isinstance(resp.text, str) else str(data))
+    def _completion(self, resp: httpx.Response) -> Tuple[str, Optional[str]]:
+        """The generated text and its `finish_reason`."""
+        text, data = self._parse_data(resp)
+        finish = None
+        if isinstance(data, dict):
+            choices = data.get("choices")
+            if isinstance(choices, list) and choices and isinstance(choices[0], dict):
+                finish = choices[0].get("finish_reason")
+        return text, finish
+
+    @staticmethod
+    def _continuation(req: dict, text: str) -> dict:
+        # The answer so far as an assistant prefix: the model picks up where
+        # it stopped instead of starting over
+        payload = dict(req["json"])
+        payload["messages"] = [
+            payload["messages"][0],
+            {"role": "assistant", "content": text, "prefix": True},
+        ]
+        return {**req, "json": payload}
+
+    @staticmethod
+    def _extend(text: str, delta: str) -> str:
+        # In prefix mode the reply starts with the prefix itself
+        if text and delta.startswith(text):
+            delta = delta[len(text) :]
+        return text + delta
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        req = self._build_request(prompt, **kwargs)
+        text = ""
+        for _ in range(self.config.continuations + 1):
+            resp = self.client.request(**_encoded(req))
+            delta, finish = self._completion(resp)
+            text = self._extend(text, delta)
+            if finish != "length":
+                break
+            req = self._continuation(req, text)
+        return text
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        req = self._build_request(prompt, **kwargs)
+        text = ""
+        for _ in range(self.config.continuations + 1):
+            resp = await self.aclient.request(**_encoded(req))
+            delta, finish = self._completion(resp)
+            text = self._extend(text, delta)
+            if finish != "length":
+                break
+            req = self._continuation(req, text)
+        return text
+
+    def _build_stream_request(self, prompt: str, **kwargs) -> Optional[dict]:
+        req = self._build_request(prompt, **kwargs)
+        req["json"]["stream"] = True
+        return req
+
+    def _parse_stream_line(self, line: str) -> Tuple[Optional[str], bool]:
+        # Server-Sent Events: `data: {...}` lines, terminated by `data: [DONE]`
+        if not line.startswith("data:"):
+            return None, False
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return None, True
+        obj = codec.loads(data)
+        # The last event carries the `usage` of the whole completion
+        self._record_usage(obj)
+        choices = obj.get("choices") or [{}]
+        delta = (choices[0].get("delta") or {}).get("content")
+        return delta, False
@@ -0,0 +1,127 @@
+"""Hot reload of config files: watch, validate off the request path, swap.
+
+`ConfigWatcher` notices changes to the config files loaded by the settings
+registry (inotify on Linux, polling otherwise) and has the registry reload
+them in a worker thread. New settings replace the old entry in one step:
+requests already holding old provider instances finish on them, and the
+old HTTP pools are closed once their calls are done. A file that does not
+validate is logged and ignored; the last good settings stay live.
+"""
+
+import asyncio
+import contextlib
+import ctypes
+import logging
+import os
+from typing import Optional, Set
+
+from .config import ReloadConfig
+
+log = logging.getLogger(__name__)
+
+# IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+# IN_CREATE | IN_DELETE: editors often write a temporary file and rename it
+_IN_EVENTS = 0x2 | 0x4 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+
+
+class Inotify:
+    """Change notifications for directories (Linux inotify through ctypes).
+
+    Raises `OSError` (or `AttributeError` off Linux) when unavailable.
+    """
+
+    def __init__(self):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._dirs: Set[str] = set()
+
+    def watch(self, directory: str) -> None:
+        if directory in self._dirs:
+            return
+        if self._add_watch(self.fd, os.fsencode(directory), _IN_EVENTS) < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), directory)
+        self._dirs.add(directory)
+
+    def drain(self) -> None:
+        """Discard the pending events (the watcher re-checks every file)."""
+        with contextlib.suppress(BlockingIOError):
+            while os.read(self.fd, 65536):
+                pass
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class ConfigWatcher:
+    """Background task reloading the registry's config files on change.
+
+    With inotify, a change in the directory of a loaded config triggers a
+    check after `debounce` seconds; every file is also polled each
+    `interval` seconds, which is the only detection without inotify.
+    """
+
+    def __init__(self, registry, config: ReloadConfig):
+        self.registry = registry
+        self.config = config
+        self.mode: Optional[str] = None  # "inotify" or "polling" once running
+        self._changed = asyncio.Event()
+
+    def _open_inotify(self) -> Optional[Inotify]:
+        if not self.config.inotify:
+            return None
+        try:
+            return Inotify()
+        except (OSError, AttributeError) as e:
+            log.warning("inotify unavailable, polling config files: %s", e)
+            return None
+
+    def _on_events(self, inotify: Inotify) -> None:
+        # The reader is level-triggered: read the events now, or the loop
+        # calls back again and again until the debounce is over
+        inotify.drain()
+        self._changed.set()
+
+    async def check(self) -> int:
+        """Reload the changed files, then close drained pools; returns how
+        many new configs went live."""
+        swapped = 0
+        for path in self.registry.paths():
+            if await asyncio.to_thread(self.registry.reload, path):
+                swapped += 1
+        await self.registry.adrain(self.config.drain_timeout)
+        return swapped
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        inotify = self._open_inotify()
+        self.mode = "inotify" if inotify is not None else "polling"
+        if inotify is not None:
+            loop.add_reader(inotify.fd, self._on_events, inotify)
+        # Lookups stop checking the files: this task does it
+        self.registry.watched = True
+        try:
+            while True:
+                if inotify is not None:
+                    for path in self.registry.paths():
+                        with contextlib.suppress(OSError):
+                            inotify.watch(os.path.dirname(path))
+                # Not wait_for: on 3.11 it can swallow a cancellation that
+                # races with the event being set
+                with contextlib.suppress(TimeoutError):
+                    async with asyncio.timeout(self.config.interval):
+                        await self._changed.wait()
+                if self._changed.is_set():
+                    await asyncio.sleep(self.config.debounce)
+                    self._changed.clear()
+                await self.check()
+        finally:
+            self.registry.watched = False
+            if inotify is not None:
+                loop.remove_reader(inotify.fd)
+                inotify.close()
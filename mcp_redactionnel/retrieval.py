@@ -0,0 +1,169 @@
+"""Lexical passage retrieval (BM25) over source documents.
+
+Documents are cut into passages of a few hundred characters and indexed
+once (`PassageIndex`, serializable so it can be stored next to the cached
+document). At query time the indexes of the request's documents form one
+corpus: passages are scored against the sujet with Okapi BM25 and the best
+ones are kept until the token budget is spent.
+"""
+
+import json
+import math
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+# Bump when tokenization or chunking changes: stored indexes are rebuilt
+INDEX_VERSION = 1
+
+_WORD = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+_STOPWORDS = frozenset("""
+    a au aux avec ce ces cet cette dans de des du elle en est et il ils je la le
+    les leur lui ma mais me meme mes moi mon ne nos notre nous on ou par pas
+    pour qu que qui sa se ses son sont sur ta te tes toi ton tu un une vos votre
+    vous y ete etre avoir fait comme plus tout tous aussi dont cela ca si
+    the of and to in is are for on with as by an be this that it or from at
+    """.split())
+
+
+def _fold(text: str) -> str:
+    # Lowercase without accents: "Économie" and "economie" are one term
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        t
+        for t in _WORD.findall(_fold(text))
+        if len(t) > 1 and t not in _STOPWORDS and not t.isdigit()
+    ]
+
+
+def estimate_tokens(text: str) -> int:
+    # Same ~4 characters per token rule as the outbound limiter
+    return max(1, len(text) // 4)
+
+
+def split_passages(text: str, size: int) -> List[str]:
+    """Passages of about `size` characters, cut at line then sentence ends."""
+    pieces: List[str] = []
+    for line in text.split("\n"):
+        if len(line) <= size:
+            pieces.append(line)
+            continue
+        sentences = _SENTENCE_END.split(line)
+        for sentence in sentences:
+            while len(sentence) > size:
+                cut = sentence.rfind(" ", 0, size)
+                cut = cut if cut > size // 2 else size
+                pieces.append(sentence[:cut])
+                sentence = sentence[cut:].lstrip()
+            pieces.append(sentence)
+
+    passages: List[str] = []
+    current = ""
+    for piece in pieces:
+        if not piece.strip():
+            continue
+        if current and len(current) + 1 + len(piece) > size:
+            passages.append(current)
+            current = piece
+        else:
+            current = f"{current}\n{piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+@dataclass
+class PassageIndex:
+    """Term statistics of one document's passages."""
+
+    passages: List[str]
+    term_freqs: List[Dict[str, int]]
+    lengths: List[int]
+    doc_freqs: Dict[str, int]  # passages of this document containing a term
+
+    @classmethod
+    def build(cls, text: str, passage_chars: int) -> "PassageIndex":
+        passages = split_passages(text, passage_chars)
+        term_freqs, lengths = [], []
+        doc_freqs: Counter = Counter()
+        for passage in passages:
+            terms = tokenize(passage)
+            counts = Counter(terms)
+            term_freqs.append(dict(counts))
+            lengths.append(len(terms))
+            doc_freqs.update(counts.keys())
+        return cls(passages, term_freqs, lengths, dict(doc_freqs))
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "passages": self.passages,
+                "term_freqs": self.term_freqs,
+                "lengths": self.lengths,
+                "doc_freqs": self.doc_freqs,
+            },
+            ensure_ascii=False,
+        )
+
+    @classmethod
+    def from_json(cls, data: str) -> "PassageIndex":
+        return cls(**json.loads(data))
+
+
+def rank_passages(
+    indexes: Sequence[PassageIndex],
+    query: str,
+    k1: float = 1.5,
+    b: float = 0.75,
+) -> List[Tuple[float, int, int]]:
+    """`(score, document, passage)` of every passage matching `query`,
+    best first, scored with BM25 over the passages of all `indexes`."""
+    terms = set(tokenize(query))
+    total = sum(len(index.passages) for index in indexes)
+    if not terms or not total:
+        return []
+    average = sum(sum(index.lengths) for index in indexes) / total or 1.0
+    idf = {}
+    for term in terms:
+        df = sum(index.doc_freqs.get(term, 0) for index in indexes)
+        if df:
+            idf[term] = math.log(1 + (total - df + 0.5) / (df + 0.5))
+
+    ranked = []
+    for d, index in enumerate(indexes):
+        for p, (freqs, length) in enumerate(zip(index.term_freqs, index.lengths)):
+            score = 0.0
+            norm = k1 * (1 - b + b * length / average)
+            for term, weight in idf.items():
+                tf = freqs.get(term)
+                if tf:
+                    score += weight * tf * (k1 + 1) / (tf + norm)
+            if score > 0:
+                ranked.append((score, d, p))
+    ranked.sort(key=lambda r: (-r[0], r[1], r[2]))
+    return ranked
+
+
+def select_passages(
+    indexes: Sequence[PassageIndex], query: str, token_budget: int
+) -> List[List[int]]:
+    """Positions of the passages kept for each document, in reading order.
+
+    The best passages are taken while they fit in `token_budget`; a passage
+    too large for what is left is skipped in favour of smaller ones.
+    """
+    selected: List[List[int]] = [[] for _ in indexes]
+    remaining = token_budget
+    for _, d, p in rank_passages(indexes, query):
+        cost = estimate_tokens(indexes[d].passages[p])
+        if cost <= remaining:
+            selected[d].append(p)
+            remaining -= cost
+    return [sorted(positions) for positions in selected]
@@ -0,0 +1,31 @@
+import random
+from typing import Any
+
+from .config import RetryPolicy
+from .providers import ProviderHTTPError
+
+_NO_RETRY = RetryPolicy()
+
+
+def retry_policy(provider: Any) -> RetryPolicy:
+    return getattr(getattr(provider, "config", None), "retry", None) or _NO_RETRY
+
+
+def should_retry(policy: RetryPolicy, exc: BaseException) -> bool:
+    if isinstance(exc, ProviderHTTPError):
+        return exc.status_code in policy.retry_on_status
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    return not names.isdisjoint(policy.retry_on_exceptions)
+
+
+def backoff_delay(policy: RetryPolicy, attempt: int, exc: BaseException) -> float:
+    """Delay before attempt `attempt + 1`: jittered exponential backoff.
+
+    An upstream `Retry-After` is honoured as a lower bound.
+    """
+    delay = min(policy.backoff_max, policy.backoff_base * 2 ** (attempt - 1))
+    delay -= delay * policy.jitter * random.random()
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, policy.backoff_max))
+    return delay
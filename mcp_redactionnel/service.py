@@ -1,17 +1,63 @@
+import asyncio
+import contextlib
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Sequence, Tuple, Union
 
 import yaml
 
-from .config import Settings
+from . import metrics
+from .cache import ResponseCache
+from .cleaning import HTMLStreamCleaner
+from .cleaning import clean_html_fragment as _clean_html_fragment
+from .config import LongTextConfig, Settings, WarmupConfig
+from .health import ProviderHealth
+from .limits import ProviderLimiter, estimate_tokens
+from .longtext import Stitcher, split_text, stitch
 from .providers import (
     BaseProvider,
     GenericHTTPProvider,
     MistralProvider,
     OllamaProvider,
+    ProviderHTTPError,
+)
+from .retry import backoff_delay, retry_policy, should_retry
+from .similar import SimilarCache
+from .singleflight import SingleFlight
+from .sources import SourceFetcher, is_url
+from .templating import CompiledTemplate, compile_template
+
+log = logging.getLogger(__name__)
+
+RELOADS = metrics.counter(
+    "mcp_config_reloads_total",
+    "Config files reloaded after a change, by result (ok, rejected).",
+    ("result",),
 )
 
 _prompts = None
+_prompt_templates: Dict[str, CompiledTemplate] = {}
+
+_HTML_INSTRUCTION = (
+    "Retourne uniquement un fragment HTML accessible "
+    "(balises sémantiques, titres, paragraphes, listes "
+    "si besoin, et attributs ARIA appropriés). "
+    "Ne fournis pas de page complète ni de styles CSS "
+    "externes."
+)
+_PART_INSTRUCTION = (
+    "Ce texte est la suite d'un document déjà commencé : n'ajoute ni titre "
+    "<h1> ni <article> englobant ; utilise des <section> et des titres <h2> "
+    "à <h6>."
+)
 
 
 def load_prompts(path: str = ""):
@@ -20,9 +66,21 @@ def load_prompts(path: str = ""):
         path = path or str(Path(__file__).parent / "prompts.yaml")
         with open(path, "r") as f:
             _prompts = yaml.safe_load(f) or {}
+        _prompt_templates.clear()
     return _prompts
 
 
+def _prompt_template(name: str, default: str, prefix: str = "") -> CompiledTemplate:
+    """Compiled prompt from `prompts.yaml`, built on first use."""
+    prompts = load_prompts()
+    key = f"{prefix}\0{name}"
+    tpl = _prompt_templates.get(key)
+    if tpl is None:
+        tpl = compile_template(prefix + prompts.get(name, default))
+        _prompt_templates[key] = tpl
+    return tpl
+
+
 _PROVIDER_TYPES = {
     "generic": GenericHTTPProvider,
     "ollama": OllamaProvider,
@@ -34,6 +92,7 @@ class ProviderManager:
     def __init__(self, settings: Settings):
         self._settings = settings
         self._instances: Dict[str, BaseProvider] = {}
+        self._lock = threading.Lock()
 
     def get(self, name: str) -> BaseProvider:
         if name in self._instances:
@@ -41,57 +100,1094 @@ class ProviderManager:
         cfg = self._settings.providers.get(name)
         if not cfg:
             raise KeyError(f"Provider {name} not found")
-        cls = _PROVIDER_TYPES.get(cfg.type, GenericHTTPProvider)
-        inst = cls(cfg)
-        self._instances[name] = inst
+        with self._lock:
+            # Another thread may have built it while we were waiting
+            if name in self._instances:
+                return self._instances[name]
+            cls = _PROVIDER_TYPES.get(cfg.type, GenericHTTPProvider)
+            inst = cls(cfg)
+            inst.name = name
+            inst.limiter = ProviderLimiter.from_config(cfg)
+            inst.health = ProviderHealth.from_config(cfg)
+            self._instances[name] = inst
         return inst
 
+    def limiter_stats(self) -> dict:
+        with self._lock:
+            instances = dict(self._instances)
+        return {
+            name: inst.limiter.stats()
+            for name, inst in instances.items()
+            if getattr(inst, "limiter", None) is not None
+        }
+
+    def breaker_stats(self) -> dict:
+        """Breaker counters of the providers instantiated so far."""
+        with self._lock:
+            instances = dict(self._instances)
+        return {
+            name: inst.health.breaker.stats()
+            for name, inst in instances.items()
+            if getattr(getattr(inst, "health", None), "breaker", None) is not None
+        }
+
+    def in_flight(self) -> int:
+        """Upstream calls in progress on this manager's providers."""
+        with self._lock:
+            instances = list(self._instances.values())
+        return sum(getattr(inst, "in_flight", 0) for inst in instances)
+
+    def instances(self) -> List[BaseProvider]:
+        """Every configured provider, instantiated on demand."""
+        return [self.get(name) for name in self._settings.providers]
+
+    def health_stats(self) -> dict:
+        return {
+            inst.name: inst.health.stats()
+            for inst in self.instances()
+            if getattr(inst, "health", None) is not None
+        }
+
+    def _drain(self) -> list:
+        with self._lock:
+            instances = list(self._instances.values())
+            self._instances.clear()
+        return instances
+
+    def close(self) -> None:
+        """Close the HTTP pools of every provider instance."""
+        for inst in self._drain():
+            close = getattr(inst, "close", None)
+            if close is not None:
+                close()
+
+    async def aclose(self) -> None:
+        for inst in self._drain():
+            aclose = getattr(inst, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            elif getattr(inst, "close", None) is not None:
+                inst.close()
+
+
+# Output budget of a redaction: French prose runs about 1.6 tokens per word
+# with the Mistral / Llama tokenizers, models overshoot the requested length,
+# and accessible HTML wraps the same text in tags and attributes
+_TOKENS_PER_WORD = 1.6
+_LENGTH_MARGIN = 1.25
+_HTML_OVERHEAD = 1.5
+_DEFAULT_WORDS = 300
+_NUMBER = re.compile(r"\d+")
+
+
+def _redaction_max_tokens(meta: dict | None, format: str) -> int:
+    """`max_tokens` for a redaction of `meta.length` words ("400", "300-400
+    mots": the largest number), capped per provider by its `max_tokens`."""
+    length = meta.get("length") if isinstance(meta, dict) else None
+    numbers = [int(n) for n in _NUMBER.findall(str(length or ""))]
+    words = max(numbers) if numbers else _DEFAULT_WORDS
+    tokens = words * _TOKENS_PER_WORD * _LENGTH_MARGIN
+    if format == "html":
+        tokens *= _HTML_OVERHEAD
+    return max(256, math.ceil(tokens))
+
+
+def _render_redaction_prompt(sujet: str, sources: str, format: str) -> str:
+    # If HTML requested, prefix an instruction that asks for accessible HTML output
+    tpl = _prompt_template(
+        "redaction",
+        "Rédige un texte sur: {{ sujet }}. Sources: {{ sources }}",
+        prefix=_HTML_INSTRUCTION + "\n" if format == "html" else "",
+    )
+    return tpl.render(sujet=sujet, sources=sources)
+
+
+def _fetches(sources: list | None, fetcher: SourceFetcher | None) -> bool:
+    return fetcher is not None and any(is_url(s) for s in sources or ())
+
+
+def _sources_text(
+    sources: list | None, fetcher: SourceFetcher | None, query: str
+) -> str:
+    """Passages of the fetched sources relevant to `query`, or the list as
+    given without a fetcher."""
+    if not _fetches(sources, fetcher):
+        return str(sources or "")
+    return fetcher.render(sources, query)
+
+
+async def _asources_text(
+    sources: list | None, fetcher: SourceFetcher | None, query: str
+) -> str:
+    if not _fetches(sources, fetcher):
+        return str(sources or "")
+    return await fetcher.arender(sources, query)
+
+
+def _render_mise_en_forme_prompt(texte: str, continuation: bool = False) -> str:
+    # Parts after the first of a long document must not restart the outline
+    tpl = _prompt_template(
+        "mise_en_forme",
+        "Formate le texte suivant en HTML accessible: {{ texte }}",
+        prefix=_PART_INSTRUCTION + "\n" if continuation else "",
+    )
+    return tpl.render(texte=texte)
+
+
+# Identical generations in flight at the same time share one upstream call
+_flights = SingleFlight()
+
+
+def get_flights() -> SingleFlight:
+    return _flights
+
+
+Chain = Union[BaseProvider, Sequence[BaseProvider]]
+
+
+def _as_chain(provider: Chain) -> List[BaseProvider]:
+    if isinstance(provider, (list, tuple)):
+        if not provider:
+            raise ValueError("Empty provider chain")
+        return list(provider)
+    return [provider]
+
+
+def _provider_name(provider: BaseProvider) -> str:
+    return getattr(provider, "name", type(provider).__name__)
+
+
+def _request_key(chain: List[BaseProvider], prompt: str, kwargs: dict) -> str:
+    """Normalized key of a generation, used by the cache and single-flight."""
+    targets = []
+    for provider in chain:
+        config = getattr(provider, "config", None)
+        targets.append(
+            (
+                _provider_name(provider),
+                getattr(config, "endpoint", None),
+                getattr(config, "model", None) or kwargs.get("model"),
+            )
+        )
+    return ResponseCache.make_key(
+        targets,
+        prompt,
+        kwargs.get("max_tokens"),
+        kwargs.get("format"),
+        kwargs.get("meta"),
+    )
+
+
+def _cache_store(
+    cache: ResponseCache, key: str, provider: BaseProvider, out: str
+) -> None:
+    ttl = getattr(getattr(provider, "config", None), "cache_ttl", None)
+    cache.set(key, out, ttl=ttl, provider=_provider_name(provider))
+
+
+async def _acache_store(
+    cache: ResponseCache, key: str, provider: BaseProvider, out: str
+) -> None:
+    ttl = getattr(getattr(provider, "config", None), "cache_ttl", None)
+    await cache.aset(key, out, ttl=ttl, provider=_provider_name(provider))
+
+
+def _cache_lookup(
+    cache: ResponseCache | None,
+    no_cache: bool,
+    key: str,
+    info: dict | None,
+) -> str | None:
+    if cache is None or no_cache:
+        return None
+    hit = cache.get(key)
+    if hit is not None and info is not None:
+        info.update(provider=None, attempts=0, cached=True)
+    return hit
+
+
+async def _acache_lookup(
+    cache: ResponseCache | None,
+    no_cache: bool,
+    key: str,
+    info: dict | None,
+) -> str | None:
+    if cache is None or no_cache:
+        return None
+    hit = await cache.aget(key)
+    if hit is not None and info is not None:
+        info.update(provider=None, attempts=0, cached=True)
+    return hit
+
+
+def _similar_bucket(
+    chain: List[BaseProvider], sources: list | None, meta: dict | None, format: str
+) -> str:
+    """Near-duplicate cache bucket: everything but the sujet."""
+    targets = [
+        (_provider_name(p), getattr(getattr(p, "config", None), "model", None))
+        for p in chain
+    ]
+    return ResponseCache.make_key(targets, format, meta, sources)
+
+
+def _similar_lookup(
+    similar: SimilarCache | None,
+    no_cache: bool,
+    bucket: str,
+    sujet: str,
+    info: dict | None,
+) -> str | None:
+    if similar is None or no_cache:
+        return None
+    hit = similar.get(bucket, sujet)
+    if hit is None:
+        return None
+    if info is not None:
+        info.update(provider=None, attempts=0, cached=True, similarity=hit[1])
+    return hit[0]
+
+
+def _served_info(
+    info: dict, served_by: BaseProvider, attempts: int, usage: dict
+) -> None:
+    info.update(provider=_provider_name(served_by), attempts=attempts, cached=False)
+    if any(usage.values()):  # providers reporting token counts
+        info["usage"] = usage
+
+
+def _clean(out: str) -> str:
+    with metrics.CLEAN_LATENCY.time():
+        return _clean_html_fragment(out)
+
+
+def _throttle(limiter: ProviderLimiter, exc: ProviderHTTPError) -> None:
+    # Upstream says we are over quota: hold the queue for Retry-After
+    if exc.status_code == 429 or exc.retry_after is not None:
+        limiter.pause(exc.retry_after if exc.retry_after is not None else 1.0)
+
+
+def _tracked(provider: BaseProvider):
+    # Circuit breaker + latency bookkeeping; checked before queueing so an
+    # open breaker fails fast
+    health = getattr(provider, "health", None)
+    return health.track() if health is not None else contextlib.nullcontext()
+
+
+_in_flight_lock = threading.Lock()
+
+
+def _count_in_flight(provider: BaseProvider, delta: int) -> None:
+    # Per instance, so a config reload can wait for its old providers
+    with _in_flight_lock:
+        provider.in_flight = getattr(provider, "in_flight", 0) + delta
+
+
+@contextlib.contextmanager
+def _upstream(provider: BaseProvider):
+    # Upstream latency (excluding the limiter queue) and in-flight calls
+    name = _provider_name(provider)
+    in_flight = metrics.UPSTREAM_IN_FLIGHT.labels(name)
+    in_flight.inc()
+    _count_in_flight(provider, 1)
+    status = "ok"
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        status = metrics.status_of(e)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        in_flight.dec()
+        _count_in_flight(provider, -1)
+        metrics.UPSTREAM_LATENCY.labels(name, status).observe(elapsed)
+
+
+def _generate_once(provider: BaseProvider, prompt: str, kwargs: dict) -> str:
+    with _upstream(provider):
+        return provider.generate(prompt, **kwargs)
+
+
+def _call(provider: BaseProvider, prompt: str, kwargs: dict) -> str:
+    with _tracked(provider):
+        limiter = getattr(provider, "limiter", None)
+        if limiter is None:
+            return _generate_once(provider, prompt, kwargs)
+        with limiter.slot(estimate_tokens(prompt, kwargs.get("max_tokens"))):
+            try:
+                return _generate_once(provider, prompt, kwargs)
+            except ProviderHTTPError as e:
+                _throttle(limiter, e)
+                raise
+
+
+def _run_chain(
+    chain: List[BaseProvider], prompt: str, kwargs: dict
+) -> Tuple[str, BaseProvider, int]:
+    """Try each provider in order, retrying per its policy.
+
+    Returns `(text, provider that served it, total attempts)`; if every
+    provider fails, the last error is raised.
+    """
+    attempts = 0
+    for index, provider in enumerate(chain):
+        is_last = index == len(chain) - 1
+        policy = retry_policy(provider)
+        for attempt in range(1, policy.max_attempts + 1):
+            attempts += 1
+            try:
+                return _call(provider, prompt, kwargs), provider, attempts
+            except Exception as e:
+                if attempt < policy.max_attempts and should_retry(policy, e):
+                    time.sleep(backoff_delay(policy, attempt, e))
+                    continue
+                if is_last:
+                    raise
+                break  # fail over to the next provider
+    raise AssertionError("unreachable")
+
+
+def _generate(
+    provider: Chain,
+    prompt: str,
+    cache: ResponseCache | None = None,
+    no_cache: bool = False,
+    info: dict | None = None,
+    **kwargs,
+) -> str:
+    """Run a generation through the response cache, single-flight, retries
+    and failover chain.
+
+    `no_cache` skips the cache lookup but still stores the fresh result.
+    `info`, if given, is filled with the provider that served the result,
+    the number of attempts and whether it came from the cache.
+    """
+    chain = _as_chain(provider)
+    key = _request_key(chain, prompt, kwargs)
+    hit = _cache_lookup(cache, no_cache, key, info)
+    if hit is not None:
+        return hit
+    with metrics.usage_scope() as usage:
+        out, served_by, attempts = _flights.do(
+            key, lambda: _run_chain(chain, prompt, kwargs)
+        )
+    if cache is not None:
+        _cache_store(cache, key, served_by, out)
+    if info is not None:
+        _served_info(info, served_by, attempts, usage)
+    return out
+
+
+async def _acall_unlimited(provider: BaseProvider, prompt: str, kwargs: dict) -> str:
+    # Providers that do not derive from BaseProvider may only offer `generate`
+    agenerate = getattr(provider, "agenerate", None)
+    with _upstream(provider):
+        if agenerate is not None:
+            return await agenerate(prompt, **kwargs)
+        return await asyncio.to_thread(provider.generate, prompt, **kwargs)
+
+
+async def _acall(provider: BaseProvider, prompt: str, kwargs: dict) -> str:
+    with _tracked(provider):
+        limiter = getattr(provider, "limiter", None)
+        if limiter is None:
+            return await _acall_unlimited(provider, prompt, kwargs)
+        async with limiter.aslot(estimate_tokens(prompt, kwargs.get("max_tokens"))):
+            try:
+                return await _acall_unlimited(provider, prompt, kwargs)
+            except ProviderHTTPError as e:
+                _throttle(limiter, e)
+                raise
+
+
+async def _arun_chain(
+    chain: List[BaseProvider], prompt: str, kwargs: dict
+) -> Tuple[str, BaseProvider, int]:
+    """Async variant of `_run_chain`."""
+    attempts = 0
+    for index, provider in enumerate(chain):
+        is_last = index == len(chain) - 1
+        policy = retry_policy(provider)
+        for attempt in range(1, policy.max_attempts + 1):
+            attempts += 1
+            try:
+                return await _acall(provider, prompt, kwargs), provider, attempts
+            except Exception as e:
+                if attempt < policy.max_attempts and should_retry(policy, e):
+                    await asyncio.sleep(backoff_delay(policy, attempt, e))
+                    continue
+                if is_last:
+                    raise
+                break  # fail over to the next provider
+    raise AssertionError("unreachable")
+
+
+async def _agenerate(
+    provider: Chain,
+    prompt: str,
+    cache: ResponseCache | None = None,
+    no_cache: bool = False,
+    info: dict | None = None,
+    **kwargs,
+) -> str:
+    chain = _as_chain(provider)
+    key = _request_key(chain, prompt, kwargs)
+    hit = await _acache_lookup(cache, no_cache, key, info)
+    if hit is not None:
+        return hit
+    # The leader's task inherits the scope: identical calls joining it are
+    # not charged for its tokens
+    with metrics.usage_scope() as usage:
+        out, served_by, attempts = await _flights.ado(
+            key, lambda: _arun_chain(chain, prompt, kwargs)
+        )
+    if cache is not None:
+        await _acache_store(cache, key, served_by, out)
+    if info is not None:
+        _served_info(info, served_by, attempts, usage)
+    return out
+
+
+async def _astream_one(
+    provider: BaseProvider, prompt: str, kwargs: dict
+) -> AsyncIterator[str]:
+    stream = getattr(provider, "agenerate_stream", None)
+    if stream is None:
+        yield await _agenerate(provider, prompt, **kwargs)
+        return
+    limiter = getattr(provider, "limiter", None)
+    slot = (
+        limiter.aslot(estimate_tokens(prompt, kwargs.get("max_tokens")))
+        if limiter is not None
+        else contextlib.nullcontext()
+    )
+    with _tracked(provider):
+        async with slot:
+            try:
+                with _upstream(provider):
+                    async for chunk in stream(prompt, **kwargs):
+                        yield chunk
+            except ProviderHTTPError as e:
+                if limiter is not None:
+                    _throttle(limiter, e)
+                raise
+
+
+async def _agenerate_stream(
+    provider: Chain, prompt: str, clean: bool, **kwargs
+) -> AsyncIterator[str]:
+    """Stream from the first provider of the chain that starts answering.
+
+    Failover only happens before the first chunk: once text has been sent
+    to the client, an error ends the stream.
+    """
+    chain = _as_chain(provider)
+    cleaner = HTMLStreamCleaner() if clean else None
+    for index, candidate in enumerate(chain):
+        started = False
+        try:
+            async for chunk in _astream_one(candidate, prompt, kwargs):
+                started = True
+                if cleaner is not None:
+                    chunk = cleaner.feed(chunk)
+                if chunk:
+                    yield chunk
+            break
+        except Exception:
+            if started or index == len(chain) - 1:
+                raise
+    if cleaner is not None:
+        tail = cleaner.flush()
+        if tail:
+            yield tail
+
 
 def redaction(
-    provider: BaseProvider,
+    provider: Chain,
     sujet: str,
     sources: list | None = None,
     meta: dict | None = None,
     format: str = "text",
+    cache: ResponseCache | None = None,
+    no_cache: bool = False,
+    info: dict | None = None,
+    fetcher: SourceFetcher | None = None,
+    similar: SimilarCache | None = None,
 ) -> str:
     """
     Generate a redaction.
     If format=='html', instruct the model to return accessible HTML.
+    `provider` may be a list of providers, tried in order (failover chain).
+    If a `cache` is given, identical requests are served from it unless
+    `no_cache` is set. `info`, if given, receives the provider that served
+    the result and the number of attempts. With a `fetcher`, the URLs of
+    `sources` are downloaded and excerpts of them go into the prompt.
+    With a `similar` cache, a near-duplicate sujet asked before with the
+    same provider, format, meta and sources is served without fetching or
+    generating; `info["similarity"]` then tells how close it was.
     """
-    prompts = load_prompts()
-    template = prompts.get(
-        "redaction", "Rédige un texte sur: {{ sujet }}. Sources: {{ sources }}"
+    bucket = _similar_bucket(_as_chain(provider), sources, meta, format)
+    hit = _similar_lookup(similar, no_cache, bucket, sujet, info)
+    if hit is not None:
+        return hit
+    rendered = _render_redaction_prompt(
+        sujet, _sources_text(sources, fetcher, sujet), format
     )
-    # If HTML requested, prefix an instruction that asks for accessible HTML output
+    out = _generate(
+        provider,
+        rendered,
+        cache=cache,
+        no_cache=no_cache,
+        info=info,
+        sujet=sujet,
+        sources=sources,
+        meta=meta,
+        format=format,
+        max_tokens=_redaction_max_tokens(meta, format),
+    )
+    # If HTML output requested, apply the same cleaning to ensure it's storable
     if format == "html":
-        html_instr = (
-            "Retourne uniquement un fragment HTML accessible "
-            "(balises sémantiques, titres, paragraphes, listes "
-            "si besoin, et attributs ARIA appropriés). "
-            "Ne fournis pas de page complète ni de styles CSS "
-            "externes."
-        )
-        template = html_instr + "\n" + template
+        out = _clean(out)
+    if similar is not None:
+        similar.set(bucket, sujet, out)
+    return out
+
 
-    rendered = template.replace("{{ sujet }}", sujet).replace(
-        "{{ sources }}", str(sources or "")
+async def aredaction(
+    provider: Chain,
+    sujet: str,
+    sources: list | None = None,
+    meta: dict | None = None,
+    format: str = "text",
+    cache: ResponseCache | None = None,
+    no_cache: bool = False,
+    info: dict | None = None,
+    fetcher: SourceFetcher | None = None,
+    similar: SimilarCache | None = None,
+) -> str:
+    """Async variant of `redaction`."""
+    bucket = _similar_bucket(_as_chain(provider), sources, meta, format)
+    hit = _similar_lookup(similar, no_cache, bucket, sujet, info)
+    if hit is not None:
+        return hit
+    rendered = _render_redaction_prompt(
+        sujet, await _asources_text(sources, fetcher, sujet), format
     )
-    out = provider.generate(
+    out = await _agenerate(
+        provider,
         rendered,
+        cache=cache,
+        no_cache=no_cache,
+        info=info,
         sujet=sujet,
         sources=sources,
         meta=meta,
         format=format,
+        max_tokens=_redaction_max_tokens(meta, format),
     )
-    # If HTML output requested, apply the same cleaning to ensure it's storable
     if format == "html":
-        out = _clean_html_fragment(out)
+        out = _clean(out)
+    if similar is not None:
+        similar.set(bucket, sujet, out)
     return out
 
 
+@dataclass
+class _RegistryEntry:
+    settings: Settings
+    manager: ProviderManager
+    cache: ResponseCache | None
+    fetcher: SourceFetcher | None
+    similar: SimilarCache | None
+    mtime_ns: int
+    size: int
+    digest: str
+    retired_at: float = 0.0
+    rejected: str = ""  # digest of the last invalid version of the file
+    requests: int = 0  # entry-point calls holding it (see `hold`)
+    drained: bool = False  # its pools were closed once retired
+
+
+class SettingsRegistry:
+    """Process-wide cache of parsed settings and their `ProviderManager`.
+
+    Entries are keyed by the resolved config path and reused until the file's
+    mtime/size changes *and* its content hash differs, so touching the file
+    without editing it does not drop the provider instances. An edited file
+    that does not validate is rejected (and logged): the last good settings
+    stay live.
+
+    While a `ConfigWatcher` runs (`watched`), lookups trust the loaded
+    entries without a `stat` and the watcher calls `reload` on changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _RegistryEntry] = {}
+        # Entries replaced after a config change; their providers may still
+        # serve in-flight calls, so their pools are closed by `adrain` once
+        # idle (or on shutdown).
+        self._retired: List[_RegistryEntry] = []
+        self.watched = False
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.rejected = 0
+
+    def _load(
+        self, key: str, st: os.stat_result, entry: _RegistryEntry | None
+    ) -> _RegistryEntry:
+        """Parse `key` and swap it in; the caller holds the lock."""
+        with open(key, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if entry is not None and digest in (entry.digest, entry.rejected):
+            entry.mtime_ns, entry.size = st.st_mtime_ns, st.st_size
+            return entry
+        try:
+            with metrics.SETTINGS_LOAD.time():
+                settings = Settings.from_yaml(raw)
+        except Exception as e:
+            if entry is None:
+                raise
+            # Keep serving the last good version of the file
+            entry.mtime_ns, entry.size, entry.rejected = (
+                st.st_mtime_ns,
+                st.st_size,
+                digest,
+            )
+            self.rejected += 1
+            RELOADS.labels("rejected").inc()
+            log.error("Invalid config %s, keeping the previous one: %s", key, e)
+            return entry
+        new = _RegistryEntry(
+            settings=settings,
+            manager=ProviderManager(settings),
+            cache=(
+                ResponseCache.from_config(settings.cache)
+                if settings.cache.enabled
+                else None
+            ),
+            fetcher=SourceFetcher.from_config(settings.sources),
+            similar=(
+                SimilarCache.from_config(settings.cache.similar)
+                if settings.cache.similar.enabled
+                else None
+            ),
+            mtime_ns=st.st_mtime_ns,
+            size=st.st_size,
+            digest=digest,
+        )
+        if entry is not None:
+            if entry.cache is not None:
+                entry.cache.close()  # a closed cache only skips its disk tier
+            entry.retired_at = time.monotonic()
+            self._retired.append(entry)
+            self.reloads += 1
+            RELOADS.labels("ok").inc()
+            log.info("Reloaded config %s", key)
+        self._entries[key] = new
+        self.misses += 1
+        return new
+
+    def _entry(self, path: str) -> _RegistryEntry:
+        key = str(Path(path).resolve())
+        if self.watched:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+        st = os.stat(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and entry.mtime_ns == st.st_mtime_ns
+                and entry.size == st.st_size
+            ):
+                self.hits += 1
+                return entry
+            loaded = self._load(key, st, entry)
+            if loaded is entry:
+                self.hits += 1
+            return loaded
+
+    def reload(self, path: str) -> bool:
+        """Load `path` again if it changed; True if new settings went live.
+
+        Called by the watcher from a worker thread, so parsing and
+        validation stay off the request path.
+        """
+        key = str(Path(path).resolve())
+        try:
+            st = os.stat(key)
+        except OSError:
+            return False  # deleted or being replaced: keep the loaded one
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and entry.mtime_ns == st.st_mtime_ns
+                and entry.size == st.st_size
+            ):
+                return False
+            return self._load(key, st, entry) is not entry
+
+    def paths(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def settings(self, path: str) -> Settings:
+        return self._entry(path).settings
+
+    def manager(self, path: str) -> ProviderManager:
+        return self._entry(path).manager
+
+    def cache(self, path: str) -> ResponseCache | None:
+        return self._entry(path).cache
+
+    def fetcher(self, path: str) -> SourceFetcher | None:
+        return self._entry(path).fetcher
+
+    def similar(self, path: str) -> SimilarCache | None:
+        return self._entry(path).similar
+
+    @contextlib.contextmanager
+    def hold(self, path: str) -> Iterator[_RegistryEntry]:
+        """The entry of `path`, held for the duration of one request.
+
+        If the file is reloaded meanwhile, the retired entry's pools stay
+        open until every request holding it has ended (or `drain_timeout`).
+        """
+        while True:
+            entry = self._entry(path)
+            with self._lock:
+                if not entry.drained:  # else retired and closed: look again
+                    entry.requests += 1
+                    break
+        try:
+            yield entry
+        finally:
+            with self._lock:
+                entry.requests -= 1
+
+    def clear(self) -> None:
+        """Forget every entry, closing its caches and pools."""
+        with self._lock:
+            entries = list(self._entries.values()) + self._retired
+            self._entries.clear()
+            self._retired = []
+            self.hits = 0
+            self.misses = 0
+        for entry in entries:
+            entry.drained = True
+            if entry.cache is not None:
+                entry.cache.close()
+            if entry.fetcher is not None:
+                entry.fetcher.close()
+            entry.manager.close()
+
+    def _take_retired(self, timeout: float | None = None) -> List[_RegistryEntry]:
+        """Retired entries to close: all of them, or (with `timeout`) those
+        without in-flight calls or retired for longer than `timeout`."""
+        now = time.monotonic()
+        with self._lock:
+            done, kept = [], []
+            for entry in self._retired:
+                # Requests still queued or fetching sources have no upstream
+                # call in flight yet, but will use the pools
+                idle = entry.requests == 0 and entry.manager.in_flight() == 0
+                if timeout is None or idle or now - entry.retired_at >= timeout:
+                    entry.drained = True
+                    done.append(entry)
+                else:
+                    kept.append(entry)
+            self._retired = kept
+        return done
+
+    async def adrain(self, timeout: float) -> int:
+        """Close the pools of replaced configs once their calls are done;
+        returns how many were closed."""
+        done = self._take_retired(timeout)
+        for entry in done:
+            await entry.manager.aclose()
+            if entry.fetcher is not None:
+                await entry.fetcher.aclose()
+                entry.fetcher.close()
+        return len(done)
+
+    def _current(self) -> List[_RegistryEntry]:
+        with self._lock:
+            return list(self._entries.values())
+
+    def close(self) -> None:
+        """Close every provider HTTP pool (entries stay cached)."""
+        for entry in self._current() + self._take_retired():
+            entry.manager.close()
+            if entry.retired_at and entry.fetcher is not None:
+                entry.fetcher.close()
+
+    async def aclose(self) -> None:
+        for entry in self._current() + self._take_retired():
+            await entry.manager.aclose()
+            if entry.fetcher is not None:
+                await entry.fetcher.aclose()
+                if entry.retired_at:
+                    entry.fetcher.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "reloads": self.reloads,
+                "rejected": self.rejected,
+                "draining": len(self._retired),
+            }
+
+    def providers(self, *paths: str) -> List[BaseProvider]:
+        """Provider instances of every loaded config, plus `paths` (loaded
+        if they exist)."""
+        for path in paths:
+            if os.path.exists(path):
+                self._entry(path)
+        with self._lock:
+            managers = [e.manager for e in self._entries.values()]
+        return [inst for manager in managers for inst in manager.instances()]
+
+    def limit_stats(self) -> dict:
+        """Outbound limiter statistics, keyed by config path then provider."""
+        with self._lock:
+            managers = {k: e.manager for k, e in self._entries.items()}
+        stats = {path: m.limiter_stats() for path, m in managers.items()}
+        return {path: s for path, s in stats.items() if s}
+
+    def breaker_stats(self) -> dict:
+        """Circuit breaker counters, keyed by config path then provider."""
+        with self._lock:
+            managers = {k: e.manager for k, e in self._entries.items()}
+        stats = {path: m.breaker_stats() for path, m in managers.items()}
+        return {path: s for path, s in stats.items() if s}
+
+    def cache_stats(self) -> dict:
+        """Response cache statistics, keyed by config path."""
+        with self._lock:
+            caches = {k: e.cache for k, e in self._entries.items() if e.cache}
+        return {path: cache.stats() for path, cache in caches.items()}
+
+    def similar_stats(self) -> dict:
+        """Near-duplicate cache statistics, keyed by config path."""
+        with self._lock:
+            caches = {k: e.similar for k, e in self._entries.items() if e.similar}
+        return {path: cache.stats() for path, cache in caches.items()}
+
+
+_registry = SettingsRegistry()
+
+
+def get_registry() -> SettingsRegistry:
+    return _registry
+
+
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def _collect_metrics() -> list:
+    """Scrape-time metric families read from the registry, the response
+    caches, the limiters, the breakers and single-flight."""
+    registry = get_registry()
+    settings = registry.stats()
+    flights = _flights.stats()
+    caches = registry.cache_stats()
+    similar = registry.similar_stats()
+    limits = registry.limit_stats()
+    breakers = registry.breaker_stats()
+
+    def per_provider(stats: dict, field: str) -> list:
+        return [
+            ({"config": path, "provider": name}, s[field])
+            for path, by_name in stats.items()
+            for name, s in by_name.items()
+        ]
+
+    def per_config(field: str, stats: dict = caches, **labels) -> list:
+        return [({"config": path, **labels}, s[field]) for path, s in stats.items()]
+
+    return [
+        metrics.family(
+            "mcp_settings_lookups_total",
+            "counter",
+            "Config registry lookups, by result.",
+            [
+                ({"result": "hit"}, settings["hits"]),
+                ({"result": "miss"}, settings["misses"]),
+            ],
+        ),
+        metrics.family(
+            "mcp_singleflight_leaders_total",
+            "counter",
+            "Generations actually sent upstream by single-flight.",
+            [({}, flights["leaders"])],
+        ),
+        metrics.family(
+            "mcp_singleflight_deduplicated_total",
+            "counter",
+            "Callers that joined an identical generation in flight.",
+            [({}, flights["deduplicated"])],
+        ),
+        metrics.family(
+            "mcp_singleflight_in_flight",
+            "gauge",
+            "Distinct generations in flight.",
+            [({}, flights["in_flight"])],
+        ),
+        metrics.family(
+            "mcp_cache_lookups_total",
+            "counter",
+            "Response cache lookups, by result.",
+            per_config("memory_hits", result="memory_hit")
+            + per_config("disk_hits", result="disk_hit")
+            + per_config("misses", result="miss"),
+        ),
+        metrics.family(
+            "mcp_cache_evictions_total",
+            "counter",
+            "Entries evicted from the in-memory response cache.",
+            per_config("evictions"),
+        ),
+        metrics.family(
+            "mcp_cache_entries",
+            "gauge",
+            "Entries in the response cache, by tier.",
+            per_config("memory_entries", tier="memory")
+            + per_config("disk_entries", tier="disk"),
+        ),
+        metrics.family(
+            "mcp_cache_disk_bytes",
+            "gauge",
+            "Size of the responses stored on disk.",
+            per_config("disk_bytes"),
+        ),
+        metrics.family(
+            "mcp_similar_cache_lookups_total",
+            "counter",
+            "Near-duplicate sujet cache lookups, by result.",
+            per_config("hits", similar, result="hit")
+            + per_config("misses", similar, result="miss"),
+        ),
+        metrics.family(
+            "mcp_similar_cache_entries",
+            "gauge",
+            "Sujets indexed by the near-duplicate cache.",
+            per_config("entries", similar),
+        ),
+        metrics.family(
+            "mcp_limiter_queue_depth",
+            "gauge",
+            "Calls waiting for an outbound slot.",
+            per_provider(limits, "queue_depth"),
+        ),
+        metrics.family(
+            "mcp_limiter_in_flight",
+            "gauge",
+            "Calls holding an outbound slot.",
+            per_provider(limits, "in_flight"),
+        ),
+        metrics.family(
+            "mcp_limiter_admitted_total",
+            "counter",
+            "Calls admitted by the outbound limiter.",
+            per_provider(limits, "admitted"),
+        ),
+        metrics.family(
+            "mcp_limiter_rejected_total",
+            "counter",
+            "Calls rejected by the outbound limiter (queue full or timeout).",
+            per_provider(limits, "rejected"),
+        ),
+        metrics.family(
+            "mcp_limiter_pauses_total",
+            "counter",
+            "Pauses triggered by an upstream 429 / Retry-After.",
+            per_provider(limits, "pauses"),
+        ),
+        metrics.family(
+            "mcp_limiter_wait_seconds_total",
+            "counter",
+            "Time spent waiting for an outbound slot.",
+            per_provider(limits, "wait_seconds_total"),
+        ),
+        metrics.family(
+            "mcp_breaker_state",
+            "gauge",
+            "Circuit breaker state: 0 closed, 1 half-open, 2 open.",
+            [
+                (labels, _BREAKER_STATES.get(state, 0))
+                for labels, state in per_provider(breakers, "state")
+            ],
+        ),
+        metrics.family(
+            "mcp_breaker_opened_total",
+            "counter",
+            "Times the circuit breaker opened.",
+            per_provider(breakers, "opened"),
+        ),
+        metrics.family(
+            "mcp_breaker_rejected_total",
+            "counter",
+            "Calls rejected while the breaker was open.",
+            per_provider(breakers, "rejected"),
+        ),
+    ]
+
+
+metrics.REGISTRY.add_collector(_collect_metrics)
+
+
 # Convenience helpers to use the service from a config file or CLI
 def load_settings(path: str = "config.yaml") -> Settings:
-    return Settings.load(path)
+    return _registry.settings(path)
+
+
+def get_manager(path: str = "config.yaml") -> ProviderManager:
+    return _registry.manager(path)
+
+
+def get_cache(path: str = "config.yaml") -> ResponseCache | None:
+    return _registry.cache(path)
+
+
+def get_fetcher(path: str = "config.yaml") -> SourceFetcher | None:
+    return _registry.fetcher(path)
+
+
+def get_similar(path: str = "config.yaml") -> SimilarCache | None:
+    return _registry.similar(path)
+
+
+def _resolve(settings: Settings, manager: ProviderManager, name: str) -> Chain:
+    chain = settings.chains.get(name)
+    if chain:
+        return [manager.get(member) for member in chain]
+    return manager.get(name)
+
+
+def resolve_provider(name: str, config_path: str = "config.yaml") -> Chain:
+    """Provider instance for `name`, or the provider list of a named chain."""
+    return _resolve(load_settings(config_path), get_manager(config_path), name)
+
+
+async def _held_stream(
+    config_path: str, stream: Callable[[_RegistryEntry], AsyncIterator[str]]
+) -> AsyncIterator[str]:
+    # The entry is held from the first chunk to the last: a stream that is
+    # never iterated holds nothing
+    with _registry.hold(config_path) as entry:
+        async with contextlib.aclosing(stream(entry)) as chunks:
+            async for chunk in chunks:
+                yield chunk
 
 
 def redaction_by_name(
@@ -101,65 +1197,414 @@ def redaction_by_name(
     meta: dict | None = None,
     config_path: str = "config.yaml",
     format: str = "text",
+    no_cache: bool = False,
+    info: dict | None = None,
 ) -> str:
-    """Load settings from `config_path`, create provider and run redaction."""
-    settings = load_settings(config_path)
-    pm = ProviderManager(settings)
-    prov = pm.get(provider_name)
-    return redaction(prov, sujet, sources=sources, meta=meta, format=format)
+    """Load settings from `config_path`, create provider and run redaction.
 
-
-def _clean_html_fragment(s: str) -> str:
-    """
-    Clean HTML fragment from common LLM artifacts:
-    - Remove Markdown code fences (```html or ```)
-    - Replace literal backslash-n with real newlines
-    - Replace literal backslash-quote with real quotes
+    `provider_name` may also name a failover chain from the config.
     """
-    import re
+    with _registry.hold(config_path) as entry:
+        return redaction(
+            _resolve(entry.settings, entry.manager, provider_name),
+            sujet,
+            sources=sources,
+            meta=meta,
+            format=format,
+            cache=entry.cache,
+            no_cache=no_cache,
+            info=info,
+            fetcher=entry.fetcher,
+            similar=entry.similar,
+        )
 
-    if s is None:
-        return s
-    text = s.strip()
 
-    # Remove Markdown fences like ```html or ```
-    m = re.search(r"^```(?:html)?\s*(.*)\s*```$", text, flags=re.S)
-    if m:
-        text = m.group(1).strip()
+def aredaction_stream(
+    provider: Chain,
+    sujet: str,
+    sources: list | None = None,
+    meta: dict | None = None,
+    format: str = "text",
+    fetcher: SourceFetcher | None = None,
+) -> AsyncIterator[str]:
+    """Stream a redaction as text deltas (cleaned on the fly for html)."""
 
-    # Critical: Replace LITERAL \n sequences (two chars: backslash + n)
-    # NOT Python escape sequences (which would be \\n in source)
-    # The LLM outputs the actual characters '\' followed by 'n'
-    text = text.replace(r"\n", "\n")  # literal \n → real newline
-    text = text.replace(r"\t", "\t")  # literal \t → real tab
-    text = text.replace(r"\"", '"')  # literal \" → real quote
-    text = text.replace(r"\'", "'")  # literal \' → real quote
+    async def chunks() -> AsyncIterator[str]:
+        # Sources are fetched before the first chunk, when iteration starts
+        rendered = _render_redaction_prompt(
+            sujet, await _asources_text(sources, fetcher, sujet), format
+        )
+        async for chunk in _agenerate_stream(
+            provider,
+            rendered,
+            clean=(format == "html"),
+            sujet=sujet,
+            sources=sources,
+            meta=meta,
+            format=format,
+            max_tokens=_redaction_max_tokens(meta, format),
+        ):
+            yield chunk
 
-    # Strip surrounding whitespace again
-    text = text.strip()
-    return text
+    return chunks()
 
 
-def mise_en_forme(provider: BaseProvider, texte: str) -> str:
-    prompts = load_prompts()
-    template = prompts.get(
-        "mise_en_forme", "Formate le texte suivant en HTML accessible: {{ texte }}"
+async def aredaction_by_name(
+    provider_name: str,
+    sujet: str,
+    sources: list | None = None,
+    meta: dict | None = None,
+    config_path: str = "config.yaml",
+    format: str = "text",
+    no_cache: bool = False,
+    info: dict | None = None,
+) -> str:
+    """Async variant of `redaction_by_name`."""
+    with _registry.hold(config_path) as entry:
+        return await aredaction(
+            _resolve(entry.settings, entry.manager, provider_name),
+            sujet,
+            sources=sources,
+            meta=meta,
+            format=format,
+            cache=entry.cache,
+            no_cache=no_cache,
+            info=info,
+            fetcher=entry.fetcher,
+            similar=entry.similar,
+        )
+
+
+def aredaction_stream_by_name(
+    provider_name: str,
+    sujet: str,
+    sources: list | None = None,
+    meta: dict | None = None,
+    config_path: str = "config.yaml",
+    format: str = "text",
+) -> AsyncIterator[str]:
+    resolve_provider(provider_name, config_path)  # unknown names fail now
+    return _held_stream(
+        config_path,
+        lambda entry: aredaction_stream(
+            _resolve(entry.settings, entry.manager, provider_name),
+            sujet,
+            sources=sources,
+            meta=meta,
+            format=format,
+            fetcher=entry.fetcher,
+        ),
+    )
+
+
+def _long_parts(texte: str, long_text: LongTextConfig | None) -> List[str] | None:
+    """Parts of `texte` when it is long enough for the long-document mode."""
+    long_text = long_text or LongTextConfig()
+    if not long_text.threshold or len(texte) <= long_text.threshold:
+        return None
+    parts = split_text(texte, long_text.chunk_chars)
+    return parts if len(parts) > 1 else None
+
+
+def _mise_en_forme_max_tokens(texte: str) -> int:
+    # HTML output runs about twice the token count of the text it wraps
+    return max(512, len(texte) // 2)
+
+
+def _merge_info(info: dict | None, infos: List[dict]) -> None:
+    if info is None:
+        return
+    served = [i["provider"] for i in infos if i.get("provider")]
+    info.update(
+        provider=", ".join(dict.fromkeys(served)) or None,
+        attempts=sum(i.get("attempts", 0) for i in infos),
+        cached=all(i.get("cached", False) for i in infos),
+        parts=len(infos),
+    )
+    usages = [i["usage"] for i in infos if i.get("usage")]
+    if usages:
+        info["usage"] = {
+            kind: sum(u[kind] for u in usages)
+            for kind in ("prompt_tokens", "completion_tokens")
+        }
+
+
+def _mise_en_forme_long(
+    provider: Chain,
+    parts: List[str],
+    concurrency: int,
+    cache: ResponseCache | None,
+    no_cache: bool,
+    info: dict | None,
+) -> str:
+    infos: List[dict] = [{} for _ in parts]
+
+    def run(index: int) -> str:
+        part = parts[index]
+        out = _generate(
+            provider,
+            _render_mise_en_forme_prompt(part, continuation=index > 0),
+            cache=cache,
+            no_cache=no_cache,
+            info=infos[index],
+            texte=part,
+            max_tokens=_mise_en_forme_max_tokens(part),
+        )
+        return _clean(out)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        fragments = list(pool.map(run, range(len(parts))))
+    _merge_info(info, infos)
+    return stitch(fragments)
+
+
+def _amise_en_forme_parts(
+    provider: Chain,
+    parts: List[str],
+    concurrency: int,
+    cache: ResponseCache | None,
+    no_cache: bool,
+    infos: List[dict],
+) -> List[asyncio.Task]:
+    """One task per part, at most `concurrency` of them calling at once."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index: int) -> str:
+        part = parts[index]
+        async with semaphore:
+            out = await _agenerate(
+                provider,
+                _render_mise_en_forme_prompt(part, continuation=index > 0),
+                cache=cache,
+                no_cache=no_cache,
+                info=infos[index],
+                texte=part,
+                max_tokens=_mise_en_forme_max_tokens(part),
+            )
+        return _clean(out)
+
+    return [asyncio.ensure_future(run(i)) for i in range(len(parts))]
+
+
+def _cancel(tasks: List[asyncio.Task]) -> None:
+    for task in tasks:
+        task.cancel()
+
+
+def mise_en_forme(
+    provider: Chain,
+    texte: str,
+    cache: ResponseCache | None = None,
+    no_cache: bool = False,
+    info: dict | None = None,
+    long_text: LongTextConfig | None = None,
+) -> str:
+    """Format `texte` as an accessible HTML fragment.
+
+    Above `long_text.threshold` characters the texte is split at section and
+    paragraph boundaries, the parts are formatted concurrently and stitched
+    into one `<article>` (see `longtext`).
+    """
+    parts = _long_parts(texte, long_text)
+    if parts is not None:
+        concurrency = (long_text or LongTextConfig()).concurrency
+        return _mise_en_forme_long(provider, parts, concurrency, cache, no_cache, info)
+    rendered = _render_mise_en_forme_prompt(texte)
+    out = _generate(
+        provider,
+        rendered,
+        cache=cache,
+        no_cache=no_cache,
+        info=info,
+        texte=texte,
+        max_tokens=_mise_en_forme_max_tokens(texte),
     )
-    rendered = template.replace("{{ texte }}", texte)
-    out = provider.generate(rendered, texte=texte)
     # Clean typical artifacts (fenced code blocks, escaped newlines, etc.)
-    return _clean_html_fragment(out)
+    return _clean(out)
+
+
+async def amise_en_forme(
+    provider: Chain,
+    texte: str,
+    cache: ResponseCache | None = None,
+    no_cache: bool = False,
+    info: dict | None = None,
+    long_text: LongTextConfig | None = None,
+) -> str:
+    """Async variant of `mise_en_forme`."""
+    parts = _long_parts(texte, long_text)
+    if parts is not None:
+        infos: List[dict] = [{} for _ in parts]
+        tasks = _amise_en_forme_parts(
+            provider,
+            parts,
+            (long_text or LongTextConfig()).concurrency,
+            cache,
+            no_cache,
+            infos,
+        )
+        try:
+            fragments = await asyncio.gather(*tasks)
+        finally:
+            _cancel(tasks)  # no-op unless a part failed
+        _merge_info(info, infos)
+        return stitch(fragments)
+    rendered = _render_mise_en_forme_prompt(texte)
+    out = await _agenerate(
+        provider,
+        rendered,
+        cache=cache,
+        no_cache=no_cache,
+        info=info,
+        texte=texte,
+        max_tokens=_mise_en_forme_max_tokens(texte),
+    )
+    return _clean(out)
+
+
+def amise_en_forme_stream(
+    provider: Chain, texte: str, long_text: LongTextConfig | None = None
+) -> AsyncIterator[str]:
+    """Stream the HTML of `mise_en_forme`, cleaned on the fly.
+
+    Long textes are sent part by part, in order, as soon as each part and
+    the ones before it are formatted.
+    """
+    parts = _long_parts(texte, long_text)
+    if parts is None:
+        rendered = _render_mise_en_forme_prompt(texte)
+        return _agenerate_stream(
+            provider,
+            rendered,
+            clean=True,
+            texte=texte,
+            max_tokens=_mise_en_forme_max_tokens(texte),
+        )
+    concurrency = (long_text or LongTextConfig()).concurrency
+
+    async def chunks() -> AsyncIterator[str]:
+        infos: List[dict] = [{} for _ in parts]
+        tasks = _amise_en_forme_parts(provider, parts, concurrency, None, False, infos)
+        stitcher = Stitcher()
+        try:
+            for index, task in enumerate(tasks):
+                html = stitcher.add(await task)
+                # The opening tag is the first part's own, known once it is done
+                yield (stitcher.opening if index == 0 else "\n") + html
+            yield stitcher.closing
+        finally:
+            _cancel(tasks)
+
+    return chunks()
 
 
 def mise_en_forme_by_name(
-    provider_name: str, texte: str, config_path: str = "config.yaml"
+    provider_name: str,
+    texte: str,
+    config_path: str = "config.yaml",
+    no_cache: bool = False,
+    info: dict | None = None,
 ) -> str:
-    settings = load_settings(config_path)
-    pm = ProviderManager(settings)
-    prov = pm.get(provider_name)
-    return mise_en_forme(prov, texte)
+    with _registry.hold(config_path) as entry:
+        return mise_en_forme(
+            _resolve(entry.settings, entry.manager, provider_name),
+            texte,
+            cache=entry.cache,
+            no_cache=no_cache,
+            info=info,
+            long_text=entry.settings.long_text,
+        )
+
+
+async def amise_en_forme_by_name(
+    provider_name: str,
+    texte: str,
+    config_path: str = "config.yaml",
+    no_cache: bool = False,
+    info: dict | None = None,
+) -> str:
+    with _registry.hold(config_path) as entry:
+        return await amise_en_forme(
+            _resolve(entry.settings, entry.manager, provider_name),
+            texte,
+            cache=entry.cache,
+            no_cache=no_cache,
+            info=info,
+            long_text=entry.settings.long_text,
+        )
+
+
+def amise_en_forme_stream_by_name(
+    provider_name: str, texte: str, config_path: str = "config.yaml"
+) -> AsyncIterator[str]:
+    resolve_provider(provider_name, config_path)  # unknown names fail now
+    return _held_stream(
+        config_path,
+        lambda entry: amise_en_forme_stream(
+            _resolve(entry.settings, entry.manager, provider_name),
+            texte,
+            long_text=entry.settings.long_text,
+        ),
+    )
 
 
 def list_providers(config_path: str = "config.yaml") -> list:
     settings = load_settings(config_path)
     return list(settings.providers.keys())
+
+
+def _compile_prompts() -> None:
+    # Builds every prompt template variant used by the generation paths
+    for format in ("text", "html"):
+        _render_redaction_prompt("", "", format)
+    _render_mise_en_forme_prompt("")
+    _render_mise_en_forme_prompt("", continuation=True)
+
+
+async def _awarm_provider(provider: BaseProvider, warmup: WarmupConfig) -> dict:
+    start = time.monotonic()
+    try:
+        warmed = await asyncio.wait_for(
+            provider.awarm(models=warmup.models), warmup.timeout
+        )
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        return {
+            "ok": False,
+            "seconds": round(time.monotonic() - start, 3),
+            "error": f"{type(e).__name__}: {e}",
+        }
+    return {"ok": True, "warmed": warmed, "seconds": round(time.monotonic() - start, 3)}
+
+
+async def awarm_up(config_path: str = "config.yaml") -> dict:
+    """Load `config_path` and get its providers ready for the first request.
+
+    Raises if the config is invalid. A provider that cannot be reached is
+    reported (`ok: false`) without failing the warm-up: its breaker and the
+    health prober take over from there.
+    """
+    start = time.monotonic()
+    settings = load_settings(config_path)
+    report: dict = {"config": config_path, "providers": {}}
+    warmup = settings.warmup
+    if warmup.enabled:
+        _compile_prompts()
+        providers = get_manager(config_path).instances()
+        if warmup.connections:
+            results = await asyncio.gather(
+                *(_awarm_provider(p, warmup) for p in providers)
+            )
+            report["providers"] = {p.name: r for p, r in zip(providers, results)}
+        else:
+            report["providers"] = {
+                p.name: {"ok": True, "warmed": False} for p in providers
+            }
+    report["seconds"] = round(time.monotonic() - start, 3)
+    return report
+
+
+def provider_health(config_path: str = "config.yaml") -> dict:
+    """Breaker state, last probe and rolling latencies of each provider."""
+    return get_manager(config_path).health_stats()
@@ -0,0 +1,254 @@
+"""Near-duplicate cache of redactions, keyed by a normalized `sujet`.
+
+Editors ask for the same topic with trivial variations ("Qu'est-ce que
+l'économie circulaire ?" / "qu'est ce que l'economie circulaire"). Each
+sujet is normalized (case, accents, punctuation, whitespace), cut into
+character shingles and indexed with a MinHash signature split into LSH
+bands, one index per bucket (provider chain, format, meta, sources). A
+lookup only compares the sujet with the entries sharing a band, and
+returns a stored result when their Jaccard similarity reaches the
+threshold and both sujets have the same key tokens (`key_tokens`):
+"élections municipales de 2020 à Lyon" is 0.87 similar to the 2026 ones,
+or to "... à Lille", but is not the same article.
+"""
+
+import hashlib
+import random
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from .config import SimilarCacheConfig
+
+_PRIME = (1 << 61) - 1
+_NON_WORD = re.compile(r"[\W_]+")
+_WORD = re.compile(r"[^\W_]+")
+_NEGATIONS = frozenset(
+    {"ne", "n", "pas", "non", "sans", "jamais", "ni", "aucun", "aucune", "rien"}
+)
+
+
+def normalize_sujet(sujet: str) -> str:
+    """Lower case, no accents, punctuation and whitespace runs as one space."""
+    decomposed = unicodedata.normalize("NFKD", sujet.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", stripped).strip()
+
+
+def key_tokens(sujet: str) -> FrozenSet[str]:
+    """Words two near-duplicate sujets must share, normalized: numbers,
+    capitalized words past the first one (names, places) and negations."""
+    key = set()
+    for index, word in enumerate(_WORD.findall(sujet)):
+        normalized = normalize_sujet(word)
+        if (
+            any(c.isdigit() for c in word)
+            or (index and word[0].isupper())
+            or normalized in _NEGATIONS
+        ):
+            key.add(normalized)
+    return frozenset(key)
+
+
+def shingles(normalized: str, size: int = 3) -> FrozenSet[str]:
+    """Character `size`-grams of a normalized sujet (itself if shorter)."""
+    if len(normalized) <= size:
+        return frozenset([normalized])
+    return frozenset(
+        normalized[i : i + size] for i in range(len(normalized) - size + 1)
+    )
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """MinHash signatures with `num_perm` universal hash functions.
+
+    Each shingle is hashed once (blake2b), then permuted as `(a*x + b) mod p`;
+    the coefficients come from a fixed seed so signatures are stable.
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._coeffs = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, items: FrozenSet[str]) -> Tuple[int, ...]:
+        hashes = [
+            int.from_bytes(
+                hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big"
+            )
+            for s in items
+        ]
+        return tuple(min((a * x + b) % _PRIME for x in hashes) for a, b in self._coeffs)
+
+
+@dataclass
+class _Entry:
+    normalized: str
+    shingles: FrozenSet[str]
+    key: FrozenSet[str]
+    bands: Tuple[Tuple[int, ...], ...]
+    value: str
+    expires: float
+
+
+class _Bucket:
+    """Entries of one (provider, format, meta, sources) bucket."""
+
+    def __init__(self, bands: int):
+        self.entries: Dict[str, _Entry] = {}  # by normalized sujet
+        self.index: List[Dict[Tuple[int, ...], Set[str]]] = [{} for _ in range(bands)]
+
+    def add(self, entry: _Entry) -> None:
+        self.discard(entry.normalized)
+        self.entries[entry.normalized] = entry
+        for table, band in zip(self.index, entry.bands):
+            table.setdefault(band, set()).add(entry.normalized)
+
+    def discard(self, normalized: str) -> None:
+        entry = self.entries.pop(normalized, None)
+        if entry is None:
+            return
+        for table, band in zip(self.index, entry.bands):
+            members = table.get(band)
+            if members is not None:
+                members.discard(normalized)
+                if not members:
+                    del table[band]
+
+    def candidates(self, bands: Tuple[Tuple[int, ...], ...]) -> Set[str]:
+        found: Set[str] = set()
+        for table, band in zip(self.index, bands):
+            found |= table.get(band, set())
+        return found
+
+
+class SimilarCache:
+    """In-memory near-duplicate index of redaction results.
+
+    `get` returns `(result, similarity)` for the most similar stored sujet
+    of the bucket at or above `threshold` with the same key tokens, None
+    otherwise. At most
+    `max_entries` sujets are kept overall, the least recently used going
+    first.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3,
+        max_entries: int = 10_000,
+        ttl: float = 86400.0,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._rows = num_perm // bands
+        self._hasher = MinHasher(num_perm)
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lru: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_config(cls, config: SimilarCacheConfig) -> "SimilarCache":
+        return cls(
+            threshold=config.threshold,
+            num_perm=config.num_perm,
+            bands=config.bands,
+            shingle_size=config.shingle_size,
+            max_entries=config.max_entries,
+            ttl=config.ttl,
+        )
+
+    def _features(self, sujet: str):
+        normalized = normalize_sujet(sujet)
+        items = shingles(normalized, self.shingle_size)
+        sig = self._hasher.signature(items)
+        rows = self._rows
+        bands = tuple(sig[i * rows : (i + 1) * rows] for i in range(self.bands))
+        return normalized, items, key_tokens(sujet), bands
+
+    def get(self, bucket: str, sujet: str) -> Optional[Tuple[str, float]]:
+        normalized, items, key, bands = self._features(sujet)
+        now = time.time()
+        with self._lock:
+            entries = self._buckets.get(bucket)
+            best: Optional[_Entry] = None
+            score = 0.0
+            if entries is not None:
+                exact = entries.entries.get(normalized)
+                if exact is not None and exact.expires > now:
+                    best, score = exact, 1.0
+                else:
+                    for candidate in entries.candidates(bands):
+                        entry = entries.entries[candidate]
+                        if entry.expires <= now or entry.key != key:
+                            continue
+                        similarity = jaccard(items, entry.shingles)
+                        if similarity >= self.threshold and similarity > score:
+                            best, score = entry, similarity
+            if best is None:
+                self.misses += 1
+                return None
+            self._lru.move_to_end((bucket, best.normalized))
+            self.hits += 1
+            if score == 1.0:
+                self.exact_hits += 1
+            return best.value, score
+
+    def set(self, bucket: str, sujet: str, value: str) -> None:
+        if self.ttl <= 0:
+            return
+        normalized, items, key, bands = self._features(sujet)
+        entry = _Entry(normalized, items, key, bands, value, time.time() + self.ttl)
+        with self._lock:
+            self._buckets.setdefault(bucket, _Bucket(self.bands)).add(entry)
+            self._lru[(bucket, normalized)] = None
+            self._lru.move_to_end((bucket, normalized))
+            while len(self._lru) > self.max_entries:
+                (old_bucket, old), _ = self._lru.popitem(last=False)
+                entries = self._buckets[old_bucket]
+                entries.discard(old)
+                if not entries.entries:
+                    del self._buckets[old_bucket]
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self._lru.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "exact_hits": self.exact_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._lru),
+                "buckets": len(self._buckets),
+            }
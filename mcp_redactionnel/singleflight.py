@@ -0,0 +1,116 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "cancelled", "waiters", "task")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.cancelled = False
+        # (loop, future) of the async callers waiting for this call
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self.task: asyncio.Task | None = None  # strong ref for async leaders
+
+
+def _resolve(fut: asyncio.Future, call: _Call) -> None:
+    if fut.done():
+        return  # that caller was cancelled meanwhile
+    if call.cancelled:
+        fut.cancel()
+    elif call.error is not None:
+        fut.set_exception(call.error)
+    else:
+        fut.set_result(call.result)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share the same key.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is in flight wait for and share its result or exception.
+    Sync callers (`do`) and async callers (`ado`) share the same flights, so
+    a request on the async API can join one started from the CLI thread pool
+    and vice versa. Nothing is kept once the call completes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.leaders = 0
+        self.deduplicated = 0
+
+    def _join(self, key: str) -> Tuple[_Call, bool]:
+        # Caller holds the lock
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = _Call()
+            self.leaders += 1
+            return call, True
+        self.deduplicated += 1
+        return call, False
+
+    def _finish(self, key: str, call: _Call) -> None:
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            waiters, call.waiters = call.waiters, []
+            call.done.set()
+        for loop, fut in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, fut, call)
+            except RuntimeError:
+                pass  # that caller's event loop is already closed
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call, leader = self._join(key)
+        if not leader:
+            call.done.wait()
+            if call.cancelled:
+                raise asyncio.CancelledError()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+        return call.result
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._lock:
+            call, leader = self._join(key)
+            call.waiters.append((loop, fut))
+        if leader:
+            # Run the call in its own task: if the leader's client goes away,
+            # the followers still get the result.
+            task = call.task = loop.create_task(fn())
+
+            def done(t: asyncio.Task) -> None:
+                if t.cancelled():
+                    call.cancelled = True
+                elif t.exception() is not None:
+                    call.error = t.exception()
+                else:
+                    call.result = t.result()
+                self._finish(key, call)
+
+            task.add_done_callback(done)
+        return await fut
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "deduplicated": self.deduplicated,
+                "in_flight": len(self._calls),
+            }
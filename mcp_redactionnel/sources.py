@@ -0,0 +1,597 @@
+"""Fetching of the web pages listed in `sources`.
+
+Every http(s) entry of a request's `sources` is downloaded concurrently with
+one pooled `httpx.AsyncClient` (bounded per host), reduced to its main text
+and cached in SQLite. A cached page is reused as is for `fresh_for` seconds,
+then revalidated with `If-None-Match` / `If-Modified-Since`; if the site is
+down, the stale copy is used.
+
+The prompt receives the passages of the documents most relevant to the
+sujet (BM25, see `retrieval`) within a token budget; the passage index of a
+document is stored with it, so it is only built once per version of the
+page. Without a sujet to rank against, or when retrieval is disabled, the
+beginning of each document is used instead, within a character budget.
+"""
+
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from . import metrics
+from .config import SourcesConfig
+from .outbound import OutboundPolicy
+from .providers import retire_client
+from .retrieval import INDEX_VERSION, PassageIndex, select_passages
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    url TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    text TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS passage_indexes (
+    url TEXT NOT NULL,
+    digest TEXT NOT NULL,  -- text, passage size and index version
+    data TEXT NOT NULL,
+    PRIMARY KEY (url, digest)
+)
+"""
+
+FETCHES = metrics.counter(
+    "mcp_source_fetches_total",
+    "Source documents resolved, by outcome "
+    "(fetched, cached, revalidated, stale, error).",
+    ("status",),
+)
+FETCH_LATENCY = metrics.histogram(
+    "mcp_source_fetch_duration_seconds",
+    "Time spent downloading a source document (excluding the per-host queue).",
+)
+INDEX_LOOKUPS = metrics.counter(
+    "mcp_source_index_lookups_total",
+    "Passage indexes needed for a request, by origin (memory, disk, built).",
+    ("origin",),
+)
+
+
+@dataclass
+class SourceDocument:
+    url: str
+    title: str = ""
+    text: str = ""
+    # fetched, cached (fresh copy), revalidated (304), stale (site down,
+    # cached copy used) or error
+    status: str = "fetched"
+    error: Optional[str] = None
+
+
+def is_url(value) -> bool:
+    if not isinstance(value, str):
+        return False
+    parts = urlsplit(value.strip())
+    return parts.scheme in ("http", "https") and bool(parts.netloc)
+
+
+# Elements whose text is never article content
+_SKIP = {
+    "script",
+    "style",
+    "noscript",
+    "template",
+    "svg",
+    "nav",
+    "header",
+    "footer",
+    "aside",
+    "form",
+    "button",
+    "iframe",
+    "select",
+}
+# Elements that end a line of text
+_BLOCK = {
+    "p",
+    "div",
+    "section",
+    "article",
+    "main",
+    "br",
+    "li",
+    "ul",
+    "ol",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "table",
+    "tr",
+    "blockquote",
+    "pre",
+    "dd",
+    "dt",
+    "figcaption",
+}
+_MAIN = {"article", "main"}
+_INDEXES_IN_MEMORY = 128
+_SPACES = re.compile(r"[ \t\r\f\v\xa0]+")
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title: List[str] = []
+        self.all: List[str] = []
+        self.main: List[str] = []
+        self._skip = 0
+        self._main = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP:
+            self._skip += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in _MAIN:
+            self._main += 1
+        if tag in _BLOCK:
+            self._emit("\n")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP:
+            self._skip = max(0, self._skip - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif tag in _MAIN:
+            self._main = max(0, self._main - 1)
+        if tag in _BLOCK:
+            self._emit("\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title.append(data)
+        elif not self._skip:
+            self._emit(data)
+
+    def _emit(self, text: str) -> None:
+        self.all.append(text)
+        if self._main:
+            self.main.append(text)
+
+
+def _normalize(pieces: List[str]) -> str:
+    lines = (_SPACES.sub(" ", line).strip() for line in "".join(pieces).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def extract_text(html: str) -> Tuple[str, str]:
+    """`(title, main text)` of an HTML page.
+
+    Scripts, styles and page furniture (navigation, header, footer, forms)
+    are dropped. If the page has `<article>`/`<main>` elements holding a
+    reasonable share of the text, only their content is kept.
+    """
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    title = _normalize(parser.title).replace("\n", " ")
+    text = _normalize(parser.all)
+    main = _normalize(parser.main)
+    if main and len(main) >= min(500, len(text) // 4):
+        text = main
+    return title, text
+
+
+def trim(text: str, limit: int) -> str:
+    """`text` cut to at most `limit` characters, at a sentence or word end."""
+    if len(text) <= limit:
+        return text
+    marker = " […]"
+    if limit <= len(marker):
+        return ""
+    cut = text[: limit - len(marker)]
+    sentence = max(cut.rfind(". "), cut.rfind(".\n"), cut.rfind("\n"))
+    if sentence >= len(cut) * 0.6:
+        return cut[: sentence + 1].rstrip() + marker
+    space = cut.rfind(" ")
+    if space > 0:
+        cut = cut[:space]
+    return cut.rstrip() + marker
+
+
+def _allocate(lengths: Sequence[int], budget: int) -> List[int]:
+    """Split `budget` between documents; what short ones leave unused goes
+    to the longer ones."""
+    shares = [0] * len(lengths)
+    remaining = budget
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    for position, index in enumerate(order):
+        fair = remaining // (len(order) - position)
+        shares[index] = min(lengths[index], fair)
+        remaining -= shares[index]
+    return shares
+
+
+def render_sources(
+    sources: Sequence,
+    documents: Dict[str, SourceDocument],
+    budget: int,
+    passages: Optional[Dict[str, List[str]]] = None,
+) -> str:
+    """Text injected in the prompt for `sources`.
+
+    Fetched URLs become numbered excerpts (title, URL, text) sharing
+    `budget` characters; URLs that could not be fetched are listed with the
+    error, and entries that are not URLs (notes) are kept verbatim. With
+    `passages` (selected passages by URL), those replace the excerpts.
+    """
+    entries = [documents.get(s) if is_url(s) else s for s in sources]
+    # A URL listed twice is one document: its share is counted once
+    readable = list(
+        {id(e): e for e in entries if isinstance(e, SourceDocument) and e.text}.values()
+    )
+    shares = dict(
+        zip(map(id, readable), _allocate([len(d.text) for d in readable], budget))
+    )
+    blocks = []
+    for number, entry in enumerate(entries, start=1):
+        if not isinstance(entry, SourceDocument):
+            blocks.append(f"[{number}] {entry}")
+        elif entry.text:
+            heading = f"{entry.title} — {entry.url}" if entry.title else entry.url
+            if passages is None:
+                body = trim(entry.text, shares[id(entry)])
+            else:
+                body = "\n[…]\n".join(passages.get(entry.url, ())) or "(hors sujet)"
+            blocks.append(f"[{number}] {heading}\n{body}")
+        else:
+            reason = entry.error or "aucun texte exploitable"
+            blocks.append(f"[{number}] {entry.url} (inaccessible : {reason})")
+    return "\n" + "\n\n".join(blocks) if blocks else ""
+
+
+class DocumentCache:
+    """Extracted text of fetched pages, with their HTTP validators."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def get(self, url: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT title, text, etag, last_modified, fetched_at"
+                " FROM documents WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("title", "text", "etag", "last_modified", "fetched_at"), row))
+
+    def put(
+        self,
+        url: str,
+        title: str,
+        text: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+    ) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO documents"
+                " (url, title, text, etag, last_modified, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (url, title, text, etag, last_modified, time.time()),
+            )
+
+    def get_index(self, url: str, digest: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM passage_indexes WHERE url = ? AND digest = ?",
+                (url, digest),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_index(self, url: str, digest: str, data: str) -> None:
+        # Only the index of the current version of the page is kept
+        with self._lock:
+            self._db.execute("DELETE FROM passage_indexes WHERE url = ?", (url,))
+            self._db.execute(
+                "INSERT INTO passage_indexes (url, digest, data) VALUES (?, ?, ?)",
+                (url, digest, data),
+            )
+
+    def touch(self, url: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE documents SET fetched_at = ? WHERE url = ?", (time.time(), url)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class _Pool:
+    """HTTP client and per-host slots, bound to the loop that opened them."""
+
+    def __init__(self, fetcher: "SourceFetcher"):
+        config = fetcher.config
+        self.fetcher = fetcher
+        self.loop = asyncio.get_running_loop()
+        limits = httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_connections,
+        )
+        self.client = httpx.AsyncClient(
+            limits=limits,
+            timeout=config.timeout,
+            follow_redirects=True,
+            headers={"User-Agent": config.user_agent},
+            # Connects to the addresses the policy vetted, not a new lookup
+            transport=fetcher._transport or fetcher.policy.transport(limits),
+            # Checked before each request, redirects included
+            event_hooks={"request": [fetcher.policy.request_hook]},
+        )
+        self._per_host = config.per_host
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+
+    def slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        slot = self._hosts.get(host)
+        if slot is None:
+            slot = self._hosts[host] = asyncio.Semaphore(self._per_host)
+        return slot
+
+
+# Set by `SourceFetcher.render` for the duration of its call
+_call_pool: ContextVar[Optional[_Pool]] = ContextVar("sources_pool", default=None)
+
+
+class SourceFetcher:
+    """Concurrent, cached fetching of source URLs (one per config)."""
+
+    def __init__(
+        self,
+        config: SourcesConfig,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.config = config
+        self._cache: Optional[DocumentCache] = None
+        self._cache_lock = threading.Lock()
+        self._transport = transport
+        self.policy = OutboundPolicy(config.allowed_hosts, config.allow_private)
+        # Client and host slots of the async path, for one event loop
+        self._pool: Optional[_Pool] = None
+        self._pool_lock = threading.Lock()
+        # Recently used passage indexes, in front of the SQLite copies
+        self._indexes: "OrderedDict[Tuple[str, str], PassageIndex]" = OrderedDict()
+        self._indexes_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: SourcesConfig) -> Optional["SourceFetcher"]:
+        return cls(config) if config.enabled else None
+
+    @property
+    def cache(self) -> Optional[DocumentCache]:
+        """The document cache, opened (and its file created) by the first
+        fetch rather than when the config is loaded."""
+        if self._cache is None and self.config.cache_path:
+            with self._cache_lock:
+                if self._cache is None:
+                    self._cache = DocumentCache(self.config.cache_path)
+        return self._cache
+
+    async def _acache(self) -> Optional[DocumentCache]:
+        if self._cache is not None or not self.config.cache_path:
+            return self._cache
+        # Opening (and creating) the file is disk I/O too
+        return await asyncio.to_thread(lambda: self.cache)
+
+    def _pool_for_loop(self) -> "_Pool":
+        """The pool of the running loop: `render`'s own, or the shared one."""
+        pool = _call_pool.get()
+        if pool is not None and pool.fetcher is self:
+            return pool
+        loop = asyncio.get_running_loop()
+        with self._pool_lock:
+            old = self._pool
+            if old is not None and old.loop is loop:
+                return old
+            pool = self._pool = _Pool(self)
+        if old is not None:
+            retire_client(old.client, old.loop)
+        return pool
+
+    async def fetch(self, url: str) -> SourceDocument:
+        doc = await self._fetch(url)
+        FETCHES.labels(doc.status).inc()
+        return doc
+
+    async def _fetch(self, url: str) -> SourceDocument:
+        # SQLite calls run in worker threads: the fetches of one render run
+        # concurrently on the loop
+        cache = await self._acache()
+        cached = await asyncio.to_thread(cache.get, url) if cache is not None else None
+        if cached and time.time() - cached["fetched_at"] < self.config.fresh_for:
+            return SourceDocument(url, cached["title"], cached["text"], "cached")
+        headers = {}
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        pool = self._pool_for_loop()
+        try:
+            async with pool.slot(url):
+                with FETCH_LATENCY.time():
+                    async with asyncio.timeout(self.config.timeout):
+                        resp, body = await self._download(pool.client, url, headers)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            if cached:
+                return SourceDocument(
+                    url, cached["title"], cached["text"], "stale", error
+                )
+            return SourceDocument(url, status="error", error=error)
+
+        if resp.status_code == 304 and cached:
+            await asyncio.to_thread(cache.touch, url)
+            return SourceDocument(url, cached["title"], cached["text"], "revalidated")
+        if resp.is_error:
+            error = f"HTTP {resp.status_code}"
+            if cached:
+                return SourceDocument(
+                    url, cached["title"], cached["text"], "stale", error
+                )
+            return SourceDocument(url, status="error", error=error)
+
+        content_type = resp.headers.get("content-type", "text/html").lower()
+        text = body.decode(resp.encoding or "utf-8", errors="replace")
+        if "html" in content_type:
+            title, text = extract_text(text)
+        elif content_type.startswith("text/"):
+            title, text = "", _normalize([text])
+        else:
+            error = f"unsupported content type {content_type.split(';')[0]}"
+            return SourceDocument(url, status="error", error=error)
+        if cache is not None:
+            await asyncio.to_thread(
+                cache.put,
+                url,
+                title,
+                text,
+                resp.headers.get("etag"),
+                resp.headers.get("last-modified"),
+            )
+        return SourceDocument(url, title, text, "fetched")
+
+    async def _download(
+        self, client: httpx.AsyncClient, url: str, headers: dict
+    ) -> Tuple[httpx.Response, bytes]:
+        # Read at most `max_bytes`: a truncated page still yields text
+        chunks, size = [], 0
+        async with client.stream("GET", url, headers=headers) as resp:
+            async for chunk in resp.aiter_bytes():
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= self.config.max_bytes:
+                    break
+        return resp, b"".join(chunks)[: self.config.max_bytes]
+
+    async def fetch_all(self, urls: Sequence[str]) -> Dict[str, SourceDocument]:
+        """Fetch every distinct URL concurrently, keyed by URL."""
+        unique = list(dict.fromkeys(urls))
+        docs = await asyncio.gather(*(self.fetch(url) for url in unique))
+        return dict(zip(unique, docs))
+
+    def index(self, doc: SourceDocument) -> PassageIndex:
+        """Passage index of `doc`: from memory, from the cache, or built.
+
+        Blocking (SQLite, CPU): `arender` calls it from a worker thread.
+        """
+        size = self.config.passage_chars
+        digest = hashlib.sha256(
+            f"{INDEX_VERSION}:{size}:{doc.text}".encode("utf-8")
+        ).hexdigest()
+        key = (doc.url, digest)
+        with self._indexes_lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+        origin = "memory"
+        if index is None:
+            cache = self.cache
+            data = cache.get_index(*key) if cache is not None else None
+            if data is not None:
+                index, origin = PassageIndex.from_json(data), "disk"
+            else:
+                index, origin = PassageIndex.build(doc.text, size), "built"
+                if cache is not None:
+                    cache.put_index(doc.url, digest, index.to_json())
+            with self._indexes_lock:
+                self._indexes[key] = index
+                while len(self._indexes) > _INDEXES_IN_MEMORY:
+                    self._indexes.popitem(last=False)
+        INDEX_LOOKUPS.labels(origin).inc()
+        return index
+
+    def _render_ranked(
+        self, sources: Sequence, documents: Dict[str, SourceDocument], query: str
+    ) -> str:
+        readable = [d for d in documents.values() if d.text]
+        indexes = [self.index(d) for d in readable]
+        selected = select_passages(indexes, query, self.config.token_budget)
+        if not any(selected):
+            # Nothing matches the sujet: fall back to the beginning of each page
+            return render_sources(sources, documents, self.config.budget)
+        passages = {
+            doc.url: [index.passages[p] for p in positions]
+            for doc, index, positions in zip(readable, indexes, selected)
+        }
+        return render_sources(sources, documents, self.config.budget, passages)
+
+    async def arender(self, sources: Sequence, query: Optional[str] = None) -> str:
+        """Prompt text for `sources`: with a `query` (the sujet), the most
+        relevant passages; otherwise leading excerpts."""
+        documents = await self.fetch_all([s for s in sources if is_url(s)])
+        if query and self.config.retrieval and any(d.text for d in documents.values()):
+            # Indexing is CPU work: keep it off the event loop
+            return await asyncio.to_thread(
+                self._render_ranked, sources, documents, query
+            )
+        return render_sources(sources, documents, self.config.budget)
+
+    def render(self, sources: Sequence, query: Optional[str] = None) -> str:
+        """Blocking variant of `arender`, for the sync code path."""
+
+        async def run() -> str:
+            # A client and host slots of its own: other threads may be
+            # rendering at the same time, each on its own loop
+            pool = _Pool(self)
+            token = _call_pool.set(pool)
+            try:
+                return await self.arender(sources, query)
+            finally:
+                _call_pool.reset(token)
+                await pool.client.aclose()
+
+        return asyncio.run(run())
+
+    async def aclose(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        if pool.loop is asyncio.get_running_loop():
+            await pool.client.aclose()
+        else:
+            retire_client(pool.client, pool.loop)
+
+    def close(self) -> None:
+        """Close the document cache (the HTTP client goes with its loop)."""
+        with self._cache_lock:
+            cache, self._cache = self._cache, None
+        if cache is not None:
+            cache.close()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""Benchmark : nettoyage du HTML généré (1 Ko à 1 Mo).
+
+Compare l'ancien `_clean_html_fragment` (regex DOTALL + quatre `replace`
+systématiques) à `mcp_redactionnel.cleaning.clean_html_fragment`, et mesure
+le nettoyage incrémental (`HTMLStreamCleaner`, morceaux de 64 caractères
+comme un flux SSE). Deux sorties types : HTML propre, et HTML entouré d'une
+fence avec des `\\n` / `\\"` littéraux.
+
+Usage:
+  python scripts/bench_cleaning.py [--number 20]
+"""
+
+import argparse
+import re
+import timeit
+
+from mcp_redactionnel.cleaning import HTMLStreamCleaner, clean_html_fragment
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+CLEAN_UNIT = (
+    '<section aria-labelledby="s1">\n  <h2 id="s1">Titre</h2>\n'
+    "  <p>L'économie circulaire vise à réduire les déchets.</p>\n</section>\n"
+)
+ESCAPED_UNIT = CLEAN_UNIT.replace("\n", r"\n").replace('"', r"\"").replace("'", r"\'")
+
+
+def legacy_clean(s: str) -> str:
+    text = s.strip()
+    m = re.search(r"^```(?:html)?\s*(.*)\s*```$", text, flags=re.S)
+    if m:
+        text = m.group(1).strip()
+    text = text.replace(r"\n", "\n")
+    text = text.replace(r"\t", "\t")
+    text = text.replace(r"\"", '"')
+    text = text.replace(r"\'", "'")
+    return text.strip()
+
+
+def stream_clean(s: str, size: int = 64) -> str:
+    cleaner = HTMLStreamCleaner()
+    out = [cleaner.feed(s[i : i + size]) for i in range(0, len(s), size)]
+    out.append(cleaner.flush())
+    return "".join(out)
+
+
+def sample(unit: str, size: int, fenced: bool) -> str:
+    body = unit * max(1, size // len(unit))
+    return f"```html\\n{body}```" if fenced else body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", "-n", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'entrée':<30}{'ancien':>12}{'nouveau':>12}{'gain':>8}{'flux':>12}")
+    for label, unit, fenced in (
+        ("propre", CLEAN_UNIT, False),
+        ("fence + échappements", ESCAPED_UNIT, True),
+    ):
+        for size in SIZES:
+            raw = sample(unit, size, fenced)
+            assert clean_html_fragment(raw) == legacy_clean(raw)
+            assert stream_clean(raw) == legacy_clean(raw)
+            timings = [
+                timeit.timeit(lambda: fn(raw), number=args.number) / args.number
+                for fn in (legacy_clean, clean_html_fragment, stream_clean)
+            ]
+            old, new, stream = (t * 1e3 for t in timings)
+            name = f"{label} {size // 1000} Ko"
+            print(
+                f"{name:<30}{old:>9.3f} ms{new:>9.3f} ms"
+                f"{old / new:>7.1f}x{stream:>9.3f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
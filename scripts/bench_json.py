@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""Benchmark : décodage des réponses des providers (100 Ko à 1 Mo).
+
+Compare l'ancien `_parse_response` (`resp.json()`, `response_path` redécoupé
+à chaque réponse, `resp.text` décodé une seconde fois en repli) au chemin
+actuel (corps décodé une fois, chemin précompilé), avec le codec de la
+bibliothèque standard puis avec orjson s'il est installé. Mesure aussi
+l'encodage d'une ligne NDJSON / d'un événement SSE contenant le résultat.
+
+Usage:
+  python scripts/bench_json.py [--number 50]
+"""
+
+import argparse
+import json
+import timeit
+
+import httpx
+
+from mcp_redactionnel import codec
+from mcp_redactionnel.config import ProviderConfig
+from mcp_redactionnel.providers import MistralProvider
+
+SIZES = [100_000, 300_000, 1_000_000]
+PATH = "choices.0.message.content"
+UNIT = (
+    '<section aria-labelledby="s1">\n  <h2 id="s1">Titre</h2>\n'
+    "  <p>L'économie circulaire « réduit » les déchets.</p>\n</section>\n"
+)
+
+
+def legacy_extract(obj, path):
+    cur = obj
+    try:
+        for p in path.split("."):
+            cur = cur[int(p)] if isinstance(cur, list) else cur.get(p)
+    except Exception:
+        return None
+    return cur if isinstance(cur, str) else (None if cur is None else str(cur))
+
+
+def legacy_parse(resp: httpx.Response) -> str:
+    resp.raise_for_status()
+    data = json.loads(resp.text)  # httpx < 0.28 : `resp.json()` passe par `text`
+    extracted = legacy_extract(data, PATH)
+    return extracted or resp.text
+
+
+def completion(size: int) -> bytes:
+    content = UNIT * max(1, size // len(UNIT))
+    return json.dumps(
+        {
+            "id": "cmpl-1",
+            "choices": [{"index": 0, "message": {"content": content}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": size // 4},
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+
+def response(body: bytes) -> httpx.Response:
+    # A fresh response each time: `text` is cached on the instance
+    return httpx.Response(200, content=body, request=httpx.Request("POST", "http://x"))
+
+
+def timed(fn, number: int) -> float:
+    fn()
+    return timeit.timeit(fn, number=number) / number * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", "-n", type=int, default=50)
+    args = parser.parse_args()
+
+    prov = MistralProvider(
+        ProviderConfig(type="mistral", endpoint="http://x", response_path=PATH)
+    )
+    prov.name = "bench"
+    orjson = codec.orjson
+    backends = [("json", None)] + ([("orjson", orjson)] if orjson else [])
+    if orjson is None:
+        print("orjson non installé : seul le codec standard est mesuré.")
+
+    header = f"{'taille':>9}{'ancien':>11}"
+    for name, _ in backends:
+        header += f"{'décodage ' + name:>18}{'ligne ' + name:>15}"
+    print(header + "   (ms/réponse)")
+    for size in SIZES:
+        body = completion(size)
+        result = json.loads(body)["choices"][0]["message"]["content"]
+        row = f"{len(body) // 1000:>7}Ko"
+        row += f"{timed(lambda: legacy_parse(response(body)), args.number):>11.3f}"
+        for _, module in backends:
+            codec.orjson = module
+            assert prov._parse_response(response(body)) == result
+            parse = timed(lambda: prov._parse_response(response(body)), args.number)
+            line = timed(lambda: codec.dumps({"result": result}), args.number)
+            row += f"{parse:>18.3f}{line:>15.3f}"
+        codec.orjson = orjson
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+"""Test de charge de bout en bout : API HTTP + faux serveur LLM.
+
+Démarre `mcp_redactionnel.fake_llm` et `mcp_redactionnel.api` (uvicorn, ports
+libres), puis envoie des requêtes aux endpoints choisis à concurrence fixe.
+Pour chaque (endpoint, concurrence) : requêtes/s, latences p50/p95/p99 et
+surcoût par requête, c'est-à-dire la latence mesurée moins le temps passé
+dans le faux LLM pour cette requête (repérée par un marqueur `[bench:<id>]`
+dans le sujet). Les résultats sont écrits en JSON pour suivre les
+régressions d'une version à l'autre (`--baseline` compare à un précédent).
+
+Usage:
+  python scripts/bench_load.py --concurrency 1 8 32 --requests 200 \\
+      --latency lognormal:0.2:0.5 --output bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+
+import httpx
+import uvicorn
+
+from mcp_redactionnel.fake_llm import FakeLLMSettings, create_app
+
+ENDPOINTS = ("redaction", "mise_en_forme", "redaction/stream")
+CONFIG = """\
+providers:
+  fake_mistral:
+    type: mistral
+    endpoint: "{url}/v1/chat/completions"
+    model: "fake-small"
+    response_path: "choices.0.message.content"
+  fake_ollama:
+    type: ollama
+    endpoint: "{url}/api/chat"
+    model: "fake"
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class BackgroundServer:
+    """uvicorn in a daemon thread, for the duration of the benchmark."""
+
+    def __init__(self, app, port: int):
+        config = uvicorn.Config(
+            app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"
+        )
+        self.server = uvicorn.Server(config)
+        self.url = f"http://127.0.0.1:{port}"
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    values = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(values[min(len(values) - 1, int(q * len(values)))] * 1e3, 3)
+
+    return {
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "mean": round(sum(values) / len(values) * 1e3, 3),
+    }
+
+
+async def one_request(client, api_url, endpoint, config, provider, marker) -> dict:
+    sujet = f"Économie circulaire [bench:{marker}]"
+    if endpoint.startswith("mise_en_forme"):
+        body = {"provider": provider, "texte": sujet, "no_cache": True}
+    else:
+        body = {"provider": provider, "sujet": sujet, "no_cache": True}
+    url = f"{api_url}/{endpoint}"
+    start = time.perf_counter()
+    first_byte = None
+    async with client.stream("POST", url, params={"config": config}, json=body) as r:
+        async for _ in r.aiter_raw():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+    return {
+        "marker": marker,
+        "status": r.status_code,
+        "latency": time.perf_counter() - start,
+        "ttfb": first_byte,
+    }
+
+
+async def run_level(api_url, fake_url, endpoint, provider, config, concurrency, total):
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    results = []
+    counter = iter(range(total))
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        # Warm-up: connections, provider instances, templates
+        for _ in range(min(concurrency, 4)):
+            await one_request(client, api_url, endpoint, config, provider, "warmup")
+        await client.get(f"{fake_url}/_fake/stats", params={"reset": True})
+
+        async def worker():
+            for _ in counter:
+                marker = uuid.uuid4().hex[:12]
+                results.append(
+                    await one_request(
+                        client, api_url, endpoint, config, provider, marker
+                    )
+                )
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        duration = time.perf_counter() - start
+        upstream = (
+            await client.get(f"{fake_url}/_fake/stats", params={"reset": True})
+        ).json()
+
+    ok = [r for r in results if r["status"] == 200]
+    service_times = upstream["service_times"]
+    overheads = [
+        r["latency"] - service_times[r["marker"]]
+        for r in ok
+        if r["marker"] in service_times
+    ]
+    run = {
+        "endpoint": endpoint,
+        "provider": provider,
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "status_counts": dict(Counter(str(r["status"]) for r in results)),
+        "upstream_requests": upstream["requests"],
+        "upstream_rate_limited": upstream["rate_limited"],
+        "duration_s": round(duration, 3),
+        "rps": round(len(results) / duration, 2),
+        "latency_ms": percentiles([r["latency"] for r in ok]),
+        "overhead_ms": percentiles(overheads),
+    }
+    if endpoint.endswith("/stream"):
+        run["ttfb_ms"] = percentiles([r["ttfb"] for r in ok if r["ttfb"] is not None])
+    return run
+
+
+def metadata(args, settings: FakeLLMSettings) -> dict:
+    try:
+        rev = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        rev = None
+    try:
+        from importlib.metadata import version
+
+        package_version = version("mcp_redactionnel")
+    except Exception:
+        package_version = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "version": package_version,
+        "git": rev,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "requests_per_level": args.requests,
+        "fake_llm": settings.model_dump(),
+    }
+
+
+def print_table(runs: list, baseline: dict) -> None:
+    previous = {
+        (r["endpoint"], r["provider"], r["concurrency"]): r
+        for r in (baseline or {}).get("runs", [])
+    }
+    print(
+        f"{'endpoint':<22}{'conc.':>6}{'req/s':>10}{'p50':>9}{'p95':>9}"
+        f"{'p99':>9}{'surcoût p50':>13}{'erreurs':>9}"
+    )
+    for r in runs:
+        lat, over = r["latency_ms"], r["overhead_ms"]
+        line = (
+            f"{r['endpoint']:<22}{r['concurrency']:>6}{r['rps']:>10.1f}"
+            f"{_ms(lat['p50'])}{_ms(lat['p95'])}{_ms(lat['p99'])}"
+            f"{_ms(over['p50'], 13)}{r['errors']:>9}"
+        )
+        before = previous.get((r["endpoint"], r["provider"], r["concurrency"]))
+        if before:
+            line += f"   req/s {_delta(before['rps'], r['rps'])}"
+            line += f", p95 {_delta(before['latency_ms']['p95'], lat['p95'])}"
+        print(line)
+    print("(latences en ms)")
+
+
+def _ms(value, width: int = 9) -> str:
+    return f"{'-':>{width}}" if value is None else f"{value:>{width}.1f}"
+
+
+def _delta(before, after) -> str:
+    if not before or after is None:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS))
+    parser.add_argument(
+        "--provider", choices=["fake_mistral", "fake_ollama"], default="fake_mistral"
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", "-n", type=int, default=200)
+    parser.add_argument("--latency", default="fixed:0.05", help="voir fake_llm")
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", "-o", help="fichier JSON des résultats")
+    parser.add_argument("--baseline", help="JSON d'un run précédent à comparer")
+    args = parser.parse_args()
+
+    settings = FakeLLMSettings(
+        latency=args.latency,
+        chunk_delay=args.chunk_delay,
+        words=args.words,
+        rate_limit_ratio=args.rate_limit_ratio,
+        seed=args.seed,
+    )
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    from mcp_redactionnel.api import app as api_app
+
+    runs = []
+    with (
+        tempfile.TemporaryDirectory() as tmp,
+        BackgroundServer(create_app(settings), free_port()) as fake,
+        BackgroundServer(api_app, free_port()) as api,
+    ):
+        config = os.path.join(tmp, "config.yaml")
+        with open(config, "w", encoding="utf-8") as f:
+            f.write(CONFIG.format(url=fake.url))
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                runs.append(
+                    asyncio.run(
+                        run_level(
+                            api.url,
+                            fake.url,
+                            endpoint,
+                            args.provider,
+                            config,
+                            concurrency,
+                            args.requests,
+                        )
+                    )
+                )
+
+    report = {"meta": metadata(args, settings), "runs": runs}
+    print_table(runs, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Résultats écrits dans {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
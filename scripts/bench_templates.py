@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""Micro-benchmark : coût de rendu des templates par requête.
+
+Compare l'ancien chemin (un `jinja2.Template(...)` compilé à chaque appel pour
+le corps et chaque en-tête, prompts rendus par `str.replace` successifs) au
+chemin précompilé (`mcp_redactionnel.templating`).
+
+Usage:
+  python scripts/bench_templates.py [--number 2000]
+"""
+
+import argparse
+import timeit
+
+from jinja2 import Template
+
+from mcp_redactionnel.config import ProviderConfig
+from mcp_redactionnel.providers import GenericHTTPProvider
+from mcp_redactionnel.service import _render_redaction_prompt, load_prompts
+
+BODY = '{"model": "mistral", "prompt": "{{ prompt }}", "options": {"num_ctx": 4096}}'
+HEADERS = {
+    "Authorization": "Bearer {{ MISTRAL_API_KEY }}",
+    "Content-Type": "application/json",
+}
+SUJET = "Qu'est-ce que l'économie circulaire ?"
+SOURCES = ["https://example.com/article"]
+
+
+def old_request(prompt: str) -> None:
+    Template(BODY).render(prompt=prompt, MISTRAL_API_KEY="k")
+    {k: Template(v).render(MISTRAL_API_KEY="k") for k, v in HEADERS.items()}
+
+
+def old_prompt() -> str:
+    template = load_prompts()["redaction"]
+    return template.replace("{{ sujet }}", SUJET).replace(
+        "{{ sources }}", str(SOURCES or "")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", "-n", type=int, default=2000)
+    args = parser.parse_args()
+
+    prov = GenericHTTPProvider(
+        ProviderConfig(
+            type="generic", endpoint="http://x", body_template=BODY, headers=HEADERS
+        )
+    )
+    cases = [
+        ("requête (corps + en-têtes), ancien", lambda: old_request("Bonjour")),
+        (
+            "requête (corps + en-têtes), précompilé",
+            lambda: prov._build_request("Bonjour", MISTRAL_API_KEY="k"),
+        ),
+        ("prompt rédaction, str.replace", old_prompt),
+        (
+            "prompt rédaction, précompilé",
+            lambda: _render_redaction_prompt(SUJET, SOURCES, "text"),
+        ),
+    ]
+    for label, fn in cases:
+        fn()  # warm-up (loads prompts.yaml, compiles once)
+        per_call = timeit.timeit(fn, number=args.number) / args.number
+        print(f"{label:<45} {per_call * 1e6:9.1f} µs/appel")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,22 @@
 Usage example:
   python scripts/redact.py --provider mistral_api --sujet "Sujet" \
     [--sources s1 s2] [--config config.yaml]
+
+Batch mode (one JSON object per line: sujet, provider, sources, meta, format, id):
+  python scripts/redact.py --batch sujets.jsonl --output resultats.jsonl \
+    [--provider mistral_api] [--concurrency 4] [--provider-concurrency p=2]
+
+Results are appended to `--output` in completion order; re-running the same
+command skips the items already completed without error.
 """
 
 import argparse
+import asyncio
+import json
+import sys
 
-from mcp_redactionnel.service import list_providers, redaction_by_name
-
+# Only what the command needs is imported: the config for --list, the
+# service (without FastAPI and the other server modules) for a rédaction
 parser = argparse.ArgumentParser(description="MCP Rédactionnel - CLI")
 parser.add_argument(
     "--provider", "-p", required=False, help="Nom du provider (ex: mistral_api)"
@@ -29,18 +39,84 @@ parser.add_argument(
 parser.add_argument(
     "--list", action="store_true", help="Lister les providers disponibles"
 )
+parser.add_argument("--batch", help="Fichier JSONL de sujets à rédiger en lot")
+parser.add_argument(
+    "--output", "-o", help="Fichier JSONL de résultats (sert aussi de reprise)"
+)
+parser.add_argument(
+    "--concurrency",
+    type=int,
+    default=4,
+    help="Appels simultanés maximum par provider en mode lot (défaut: 4)",
+)
+parser.add_argument(
+    "--provider-concurrency",
+    nargs="*",
+    default=[],
+    metavar="NOM=N",
+    help="Concurrence propre à un provider, ex: mistral_api=2",
+)
 
 args = parser.parse_args()
 
+
+async def run_batch_file() -> int:
+    from mcp_redactionnel.batch import completed_ids, run_batch
+
+    with open(args.batch, "r", encoding="utf-8") as f:
+        items = [json.loads(line) for line in f if line.strip()]
+    for i, item in enumerate(items):
+        item.setdefault("id", str(i))
+        if args.provider:
+            item.setdefault("provider", args.provider)
+        item.setdefault("format", args.format)
+    provider_concurrency = {}
+    for spec in args.provider_concurrency:
+        name, _, limit = spec.partition("=")
+        provider_concurrency[name] = int(limit)
+
+    skip = completed_ids(args.output) if args.output else set()
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    skipped = sum(1 for item in items if str(item["id"]) in skip)
+    failed = 0
+    try:
+        async for rec in run_batch(
+            items,
+            config_path=args.config,
+            concurrency=args.concurrency,
+            provider_concurrency=provider_concurrency,
+            skip=skip,
+        ):
+            failed += rec["error"] is not None
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(
+        f"{len(items) - skipped} élément(s) traité(s), {failed} en erreur, "
+        f"{skipped} déjà fait(s)",
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
+
+
 if args.list:
-    providers = list_providers(args.config)
+    from mcp_redactionnel.config import Settings
+
+    providers = list(Settings.load(args.config).providers)
     print("Providers:", ", ".join(providers))
     raise SystemExit(0)
 
+if args.batch:
+    raise SystemExit(asyncio.run(run_batch_file()))
+
 if not args.provider or not args.sujet:
     parser.print_help()
     raise SystemExit(1)
 
+from mcp_redactionnel.service import redaction_by_name  # noqa: E402
+
 out = redaction_by_name(
     args.provider,
     args.sujet,
@@ -0,0 +1,78 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from mcp_redactionnel import api
+
+
+class DummyProvider:
+    def generate(self, prompt, **kwargs):
+        return "DUMMY:" + kwargs.get("sujet", kwargs.get("texte", ""))
+
+
+def _config(tmp_path):
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text(
+        "providers:\n  dummy:\n    type: generic\n    endpoint: 'http://example'\n"
+    )
+    return str(cfg)
+
+
+def test_post_redaction(monkeypatch, tmp_path):
+    cfg = _config(tmp_path)
+    monkeypatch.setattr(
+        "mcp_redactionnel.service.ProviderManager.get",
+        lambda self, name: DummyProvider(),
+    )
+    client = TestClient(api.app)
+    r = client.post(
+        "/redaction", params={"config": cfg}, json={"provider": "d", "sujet": "Vélo"}
+    )
+    assert r.status_code == 200
+    assert r.json() == {
+        "result": "DUMMY:Vélo",
+        "provider_used": "DummyProvider",
+        "attempts": 1,
+        "cached": False,
+        "usage": None,
+    }
+
+    r = client.post(
+        "/mise_en_forme", params={"config": cfg}, json={"provider": "d", "texte": "T"}
+    )
+    assert r.status_code == 200
+    assert r.json()["result"] == "DUMMY:T"
+
+
+def test_unknown_provider_is_500(tmp_path):
+    client = TestClient(api.app)
+    r = client.post(
+        "/redaction",
+        params={"config": _config(tmp_path)},
+        json={"provider": "absent", "sujet": "x"},
+    )
+    assert r.status_code == 500
+
+
+def test_post_mise_en_forme_stream(monkeypatch, tmp_path):
+    class StreamingProvider:
+        async def agenerate_stream(self, prompt, **kwargs):
+            for chunk in ["```html\\n<p>", "Bon", "jour</p>\\n", "```"]:
+                yield chunk
+
+    monkeypatch.setattr(
+        "mcp_redactionnel.service.ProviderManager.get",
+        lambda self, name: StreamingProvider(),
+    )
+    client = TestClient(api.app)
+    r = client.post(
+        "/mise_en_forme/stream",
+        params={"config": _config(tmp_path)},
+        json={"provider": "d", "texte": "Bonjour"},
+    )
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = [e for e in r.text.split("\n\n") if e]
+    assert events[-1] == "event: done\ndata: {}"
+    deltas = [json.loads(e[len("data: ") :])["delta"] for e in events[:-1]]
+    assert "".join(deltas) == "<p>Bonjour</p>"
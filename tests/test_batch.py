@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from mcp_redactionnel import api
+from mcp_redactionnel.batch import completed_ids, run_batch
+
+
+class SlowProvider:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def agenerate(self, prompt, **kwargs):
+        if kwargs["sujet"] == "boom":
+            raise RuntimeError("upstream down")
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return "OK:" + kwargs["sujet"]
+
+
+def _config(tmp_path):
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text("providers:\n  p:\n    type: generic\n    endpoint: 'http://x'\n")
+    return str(cfg)
+
+
+def test_run_batch_bounded_concurrency_and_errors(monkeypatch, tmp_path):
+    prov = SlowProvider()
+    monkeypatch.setattr(
+        "mcp_redactionnel.service.ProviderManager.get", lambda self, name: prov
+    )
+    items = [{"provider": "p", "sujet": f"s{i}"} for i in range(6)]
+    items.append({"provider": "p", "sujet": "boom"})
+
+    async def collect():
+        return [
+            rec
+            async for rec in run_batch(
+                items, config_path=_config(tmp_path), concurrency=2, skip={"0"}
+            )
+        ]
+
+    results = asyncio.run(collect())
+    assert len(results) == 6
+    assert prov.peak == 2
+    errors = [r for r in results if r["error"]]
+    assert [r["id"] for r in errors] == ["6"]
+    assert "upstream down" in errors[0]["error"]
+
+
+def test_completed_ids_ignores_errors_and_partial_lines(tmp_path):
+    out = tmp_path / "out.jsonl"
+    out.write_text(
+        json.dumps({"id": "a", "result": "x", "error": None})
+        + "\n"
+        + json.dumps({"id": "b", "result": None, "error": "boom"})
+        + "\n"
+        + '{"id": "c", "res'
+    )
+    assert completed_ids(str(out)) == {"a"}
+
+
+def test_post_redaction_batch(monkeypatch, tmp_path):
+    prov = SlowProvider()
+    monkeypatch.setattr(
+        "mcp_redactionnel.service.ProviderManager.get", lambda self, name: prov
+    )
+    client = TestClient(api.app)
+    r = client.post(
+        "/redaction/batch",
+        params={"config": _config(tmp_path)},
+        json={
+            "items": [
+                {"provider": "p", "sujet": "un", "id": "x1"},
+                {"provider": "p", "sujet": "deux"},
+            ]
+        },
+    )
+    assert r.status_code == 200
+    recs = [json.loads(line) for line in r.text.splitlines()]
+    assert {rec["id"]: rec["result"] for rec in recs} == {
+        "x1": "OK:un",
+        "1": "OK:deux",
+    }
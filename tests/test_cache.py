@@ -0,0 +1,119 @@
+import asyncio
+import threading
+
+from mcp_redactionnel.cache import ResponseCache
+from mcp_redactionnel.service import redaction, redaction_by_name
+
+
+class CountingProvider:
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt, **kwargs):
+        self.calls += 1
+        return f"GEN{self.calls}"
+
+
+def test_memory_and_disk_tiers(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache(path=path, memory_entries=1)
+    key = ResponseCache.make_key("p", "m", "prompt", None, "text")
+    assert cache.get(key) is None
+    cache.set(key, "valeur")
+    assert cache.get(key) == "valeur"
+    assert cache.stats()["memory_hits"] == 1
+
+    # Pushed out of the 1-entry LRU, still on disk
+    cache.set("other", "x")
+    assert cache.get(key) == "valeur"
+    assert cache.stats()["disk_hits"] == 1
+    cache.close()
+
+    # Survives a restart
+    reopened = ResponseCache(path=path)
+    assert reopened.get(key) == "valeur"
+    reopened.close()
+
+
+def test_ttl_and_size_eviction(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "c.sqlite3"), max_bytes=10)
+    cache.set("disabled", "x", ttl=0)
+    assert cache.get("disabled") is None
+
+    cache.set("a", "aaaaaa")
+    cache.set("b", "bbbbbb")  # 12 bytes > 10: least recently used goes
+    stats = cache.stats()
+    assert stats["disk_entries"] == 1
+    assert stats["evictions"] == 1
+    cache.close()
+
+
+def test_disk_size_is_tracked_without_summing_the_table(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "c.sqlite3"), max_bytes=100)
+    cache.set("a", "x" * 30)
+    statements = []
+    cache._db.set_trace_callback(statements.append)
+    cache.set("b", "y" * 30)
+    cache.set("a", "z" * 10)  # replaced: 30 bytes less, 10 more
+    summed = [s for s in statements if "SUM(size)" in s and "WHERE" not in s]
+    assert summed == []
+    assert cache._disk_bytes == cache.stats()["disk_bytes"] == 40
+    cache.set("c", "w" * 70)  # over budget: "b" is the least recently used
+    assert cache.stats()["disk_bytes"] == cache._disk_bytes == 80
+    assert cache.get("b") is None
+    cache.close()
+
+
+def test_async_variants_keep_sqlite_off_the_loop(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "c.sqlite3"), memory_entries=1)
+    threads = []
+    for name in ("_disk_get", "_write"):
+        method = getattr(cache, name)
+
+        def spy(*args, method=method):
+            threads.append(threading.get_ident())
+            return method(*args)
+
+        setattr(cache, name, spy)
+
+    async def run():
+        await cache.aset("a", "valeur")
+        await cache.aset("b", "autre")  # pushes "a" out of memory
+        assert await cache.aget("a") == "valeur"  # from disk
+        assert await cache.aget("a") == "valeur"  # from memory
+        assert await cache.aget("absent") is None
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert len(threads) == 4 and loop_thread not in threads
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+    cache.close()
+
+
+def test_redaction_uses_cache_and_no_cache_bypass():
+    cache = ResponseCache(path=None)
+    p = CountingProvider()
+    assert redaction(p, "Sujet", cache=cache) == "GEN1"
+    assert redaction(p, "Sujet", cache=cache) == "GEN1"
+    assert redaction(p, "Sujet", format="html", cache=cache) == "GEN2"
+    # Bypass the lookup, but refresh the stored value
+    assert redaction(p, "Sujet", cache=cache, no_cache=True) == "GEN3"
+    assert redaction(p, "Sujet", cache=cache) == "GEN3"
+    assert p.calls == 3
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_cache_enabled_from_config(monkeypatch, tmp_path):
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text(
+        "cache:\n  enabled: true\n  path: null\n"
+        "providers:\n  dummy:\n    type: generic\n    endpoint: 'http://x'\n"
+    )
+    p = CountingProvider()
+    monkeypatch.setattr(
+        "mcp_redactionnel.service.ProviderManager.get", lambda self, name: p
+    )
+    redaction_by_name("dummy", "Sujet", config_path=str(cfg))
+    redaction_by_name("dummy", "Sujet", config_path=str(cfg))
+    assert p.calls == 1
@@ -0,0 +1,127 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from mcp_redactionnel.config import ProviderConfig
+from mcp_redactionnel.fake_llm import FakeLLMSettings, create_app, parse_latency
+from mcp_redactionnel.providers import (
+    MistralProvider,
+    OllamaProvider,
+    ProviderHTTPError,
+)
+
+
+def _mistral(app):
+    return _provider(
+        MistralProvider,
+        app,
+        "/v1/chat/completions",
+        type="mistral",
+        response_path="choices.0.message.content",
+    )
+
+
+def _provider(cls, app, path, **cfg):
+    prov = cls(ProviderConfig(endpoint=f"http://testserver{path}", **cfg))
+    # TestClient is an httpx.Client talking to the ASGI app in-process
+    prov._client = TestClient(app)
+    return prov
+
+
+def test_parse_latency():
+    import random
+
+    rng = random.Random(1)
+    assert parse_latency("fixed:0.2")(rng) == 0.2
+    assert 0.1 <= parse_latency("uniform:0.1:0.5")(rng) <= 0.5
+    assert parse_latency("normal:0:1")(rng) >= 0
+    assert parse_latency("lognormal:0.3:0.5")(rng) > 0
+    for bad in ("fixed", "uniform:1", "gamma:1", "fixed:x"):
+        with pytest.raises(ValueError):
+            parse_latency(bad)
+
+
+def test_mistral_wire_format_and_usage():
+    app = create_app(FakeLLMSettings(words=10))
+    client = TestClient(app)
+    r = client.post(
+        "/v1/chat/completions",
+        json={"model": "m", "messages": [{"role": "user", "content": "a b"}]},
+    )
+    body = r.json()
+    assert body["object"] == "chat.completion"
+    assert len(body["choices"][0]["message"]["content"].split()) == 10
+    assert body["choices"][0]["finish_reason"] == "stop"
+    assert body["usage"] == {
+        "prompt_tokens": 2,
+        "completion_tokens": 10,
+        "total_tokens": 12,
+    }
+    # max_tokens caps the completion
+    r = client.post(
+        "/v1/chat/completions",
+        json={"messages": [{"role": "user", "content": "x"}], "max_tokens": 3},
+    )
+    assert r.json()["choices"][0]["finish_reason"] == "length"
+
+
+def test_providers_round_trip_through_fake_server():
+    app = create_app(FakeLLMSettings(words=9, words_per_chunk=2))
+    mistral = _mistral(app)
+    text = mistral.generate("[bench:m1] Bonjour")
+    assert len(text.split()) == 9
+    assert "".join(mistral.generate_stream("Bonjour")) == text
+
+    ollama = _provider(
+        OllamaProvider,
+        app,
+        "/api/generate",
+        type="ollama",
+        body_template='{"model": "m", "prompt": "{{ prompt }}", "stream": false}',
+        response_path="response",
+    )
+    assert ollama.generate("[bench:o1] Bonjour") == text
+    assert "".join(ollama.generate_stream("Bonjour")) == text
+
+    stats = TestClient(app).get("/_fake/stats", params={"reset": True}).json()
+    assert stats["requests"] == 4
+    assert set(stats["service_times"]) == {"m1", "o1"}
+    assert TestClient(app).get("/_fake/stats").json()["requests"] == 0
+
+
+def test_ollama_streams_ndjson_by_default():
+    app = create_app(FakeLLMSettings(words=5, words_per_chunk=2))
+    r = TestClient(app).post("/api/generate", json={"prompt": "x"})
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert [line["done"] for line in lines] == [False, False, False, True]
+    assert lines[-1]["eval_count"] == 5
+
+
+def test_ollama_chat_round_trip_without_template():
+    app = create_app(FakeLLMSettings(words=9, words_per_chunk=2))
+    ollama = _provider(OllamaProvider, app, "/api/chat", type="ollama", model="m")
+    text = ollama.generate("Bonjour")
+    assert len(text.split()) == 9
+    assert "".join(ollama.generate_stream("Bonjour")) == text
+    # meta.num_predict reaches the server as an option
+    assert len(ollama.generate("Bonjour", meta={"num_predict": 4}).split()) == 4
+
+    # A template that leaves streaming on gets NDJSON, joined into one text
+    streamed = _provider(
+        OllamaProvider,
+        app,
+        "/api/generate",
+        type="ollama",
+        body_template='{"model": "m", "prompt": "{{ prompt }}", "stream": true}',
+    )
+    assert streamed.generate("Bonjour") == text
+
+
+def test_rate_limited_requests_carry_retry_after():
+    app = create_app(FakeLLMSettings(rate_limit_ratio=1.0, retry_after=2))
+    mistral = _mistral(app)
+    with pytest.raises(ProviderHTTPError) as e:
+        mistral.generate("x")
+    assert e.value.status_code == 429
+    assert e.value.retry_after == 2
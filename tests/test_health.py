@@ -0,0 +1,194 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from mcp_redactionnel import api
+from mcp_redactionnel.config import ProviderConfig
+from mcp_redactionnel.health import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    HealthProber,
+    ProviderHealth,
+)
+from mcp_redactionnel.providers import (
+    BaseProvider,
+    GenericHTTPProvider,
+    OllamaProvider,
+    ProviderHTTPError,
+)
+from mcp_redactionnel.service import redaction
+
+
+class DownProvider(BaseProvider):
+    def __init__(self, threshold=2, cooldown=30.0):
+        self.name = "down"
+        self.health = ProviderHealth(CircuitBreaker(threshold, cooldown))
+        self.calls = 0
+        self.fail = True
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        self.calls += 1
+        if self.fail:
+            raise httpx.ConnectError("connection refused")
+        return "ok"
+
+
+def test_breaker_opens_and_fails_fast():
+    p = DownProvider(threshold=2)
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectError):
+            redaction(p, "x")
+    assert p.health.breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        redaction(p, "x")
+    assert p.calls == 2  # the backend was not hit again
+
+
+def test_breaker_half_opens_after_cooldown():
+    p = DownProvider(threshold=1, cooldown=0.05)
+    with pytest.raises(httpx.ConnectError):
+        redaction(p, "x")
+    time.sleep(0.06)
+    assert p.health.breaker.state == HALF_OPEN
+    # A failed trial re-opens it...
+    with pytest.raises(httpx.ConnectError):
+        redaction(p, "x")
+    assert p.health.breaker.state == OPEN
+    # ...a successful one closes it
+    time.sleep(0.06)
+    p.fail = False
+    assert redaction(p, "x") == "ok"
+    assert p.health.breaker.state == CLOSED
+    assert p.health.stats()["samples"] == 1
+
+
+def test_half_open_admits_a_single_trial():
+    breaker = CircuitBreaker(1, cooldown=0)
+    breaker.record_failure()
+    breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.release()
+    breaker.allow()
+
+
+def test_client_errors_do_not_open_the_breaker():
+    breaker = CircuitBreaker(1)
+    health = ProviderHealth(breaker)
+    with pytest.raises(ProviderHTTPError):
+        with health.track():
+            raise ProviderHTTPError("bad request", 400)
+    assert breaker.state == CLOSED
+
+
+def test_local_errors_do_not_open_the_breaker():
+    breaker = CircuitBreaker(1)
+    health = ProviderHealth(breaker)
+    with pytest.raises(ValueError):
+        with health.track():
+            raise ValueError("no text at response_path")
+    assert breaker.state == CLOSED
+    with pytest.raises(httpx.ReadTimeout):
+        with health.track():
+            raise httpx.ReadTimeout("timed out")
+    assert breaker.state == OPEN
+
+
+def _ollama(handler):
+    cfg = ProviderConfig(
+        type="ollama",
+        endpoint="http://ollama.local:11434/api/generate",
+        health={"probe_interval": 10, "failure_threshold": 5},
+    )
+    p = OllamaProvider(cfg)
+    p.health = ProviderHealth.from_config(cfg)
+    return p
+
+
+def test_prober_trips_and_recovers_breaker():
+    seen = []
+    up = [False]
+
+    def handler(request):
+        seen.append(request.url.path)
+        if not up[0]:
+            raise httpx.ConnectError("refused")
+        return httpx.Response(200, json={"version": "0.3.0"})
+
+    async def scenario():
+        p = _ollama(handler)
+        p._aclients[asyncio.get_running_loop()] = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        )
+        prober = HealthProber(lambda: [p])
+        assert await prober.probe_once() == 1
+        assert p.health.breaker.state == OPEN
+        assert "ConnectError" in p.health.last_probe_error
+        # Not due again before probe_interval
+        assert await prober.probe_once() == 0
+        up[0] = True
+        p.health._next_probe = 0
+        await prober.probe_once()
+        # The next call is the trial that closes it
+        assert p.health.breaker.state == HALF_OPEN
+        assert p.health.last_probe_latency is not None
+        await p.aclose()
+
+    asyncio.run(scenario())
+    assert seen == ["/api/version"] * 2
+
+
+def test_probe_answered_with_a_client_error_keeps_the_breaker_open():
+    def handler(request):
+        return httpx.Response(401, json={"error": "unauthorized"})
+
+    async def scenario():
+        p = _ollama(handler)
+        p._aclients[asyncio.get_running_loop()] = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        )
+        p.health.breaker.trip()
+        await HealthProber(lambda: [p]).probe_once()
+        assert p.health.breaker.state == OPEN
+        assert "HTTP 401" in p.health.last_probe_error
+        # Still enough for the warm-up: the connection is open
+        assert await p.awarm(models=False) is True
+        await p.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_generic_provider_without_probe_url_is_skipped():
+    cfg = ProviderConfig(type="generic", endpoint="http://llm.local/generate")
+    p = GenericHTTPProvider(cfg)
+    p.health = ProviderHealth.from_config(cfg)
+    prober = HealthProber(lambda: [p])
+    assert asyncio.run(prober.probe_once()) == 1
+    assert p.health.probe_supported is False
+    assert asyncio.run(prober.probe_once()) == 0
+
+
+def test_get_providers_reports_health(tmp_path):
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text(
+        "providers:\n"
+        "  local:\n"
+        "    type: ollama\n"
+        "    endpoint: 'http://localhost:1/api/generate'\n"
+        "    health: {failure_threshold: 0}\n"
+        "  remote: {type: mistral, endpoint: 'http://localhost:1/v1'}\n"
+    )
+    client = TestClient(api.app)
+    r = client.get("/providers", params={"config": str(cfg)})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["providers"] == ["local", "remote"]
+    assert body["status"]["local"]["state"] is None
+    assert body["status"]["remote"]["state"] == "closed"
+    assert body["status"]["remote"]["latency_p95"] is None
@@ -33,3 +33,80 @@ def test_clean_html_fragment():
     assert '"title"' in cleaned4
     assert r"\"" not in cleaned4
     assert "```" not in cleaned4
+
+
+def test_stream_cleaner_matches_buffered_cleaning():
+    from mcp_redactionnel.service import HTMLStreamCleaner, _clean_html_fragment
+
+    samples = [
+        r"```html\n<article>\n <p>Bonjour</p>\n</article>\n```",
+        "\n\n<article>\n<p>Test</p>\n</article>\n",
+        r"<p id=\"test\">Content</p>",
+        r"```html\n<article aria-labelledby=\"title\">\n"
+        r"  <h1 id=\"title\">Test</h1>\n</article>\n```",
+        r"<p>a\\n `code` \'b\'</p>\n",
+        r"Voici le HTML demandé :\n```html\n<p id=\"a\">x</p>\n```",
+        "Bien sûr ! Voici le code :\n\n<article><p>x</p></article>",
+        "Voici un texte sans balises.",
+    ]
+    for raw in samples:
+        expected = _clean_html_fragment(raw)
+        # Split the input at every position to exercise held-back state
+        for cut in range(len(raw) + 1):
+            cleaner = HTMLStreamCleaner()
+            out = cleaner.feed(raw[:cut]) + cleaner.feed(raw[cut:]) + cleaner.flush()
+            assert out == expected, (raw, cut)
+        cleaner = HTMLStreamCleaner()
+        out = "".join(cleaner.feed(c) for c in raw) + cleaner.flush()
+        assert out == expected
+
+
+def _legacy_clean_html_fragment(s):
+    # Implementation replaced by mcp_redactionnel.cleaning, kept as reference
+    import re
+
+    text = s.strip()
+    m = re.search(r"^```(?:html)?\s*(.*)\s*```$", text, flags=re.S)
+    if m:
+        text = m.group(1).strip()
+    text = text.replace(r"\n", "\n")
+    text = text.replace(r"\t", "\t")
+    text = text.replace(r"\"", '"')
+    text = text.replace(r"\'", "'")
+    return text.strip()
+
+
+def test_clean_html_fragment_matches_legacy_cleaning():
+    from mcp_redactionnel.service import _clean_html_fragment
+
+    samples = [
+        r"```html\n<article>\n <p>Bonjour</p>\n</article>\n```",
+        "\n\n<article>\n<p>Test</p>\n</article>\n",
+        r"<p id=\"test\">Content</p>",
+        r"```html\n<article aria-labelledby=\"title\">\n"
+        r"  <h1 id=\"title\">Test</h1>\n</article>\n```",
+        "```\n<p>sans langue</p>\n```",
+        "``````",
+        "```html```",
+        "```html<p>fence ouverte seulement</p>",
+        r"<p>\\n\\\"\t</p>",
+        "  <p>sans artefact</p>  ",
+    ]
+    for raw in samples:
+        assert _clean_html_fragment(raw) == _legacy_clean_html_fragment(raw), raw
+
+
+def test_preambles_are_stripped_before_markup():
+    from mcp_redactionnel.service import _clean_html_fragment
+
+    cases = {
+        r"Voici le HTML demandé :\n```html\n<p>l\'eau</p>\n```": "<p>l'eau</p>",
+        "Voilà le résultat HTML.\n\n<article></article>": "<article></article>",
+        r"Here\'s the HTML: <p>x</p>": "<p>x</p>",
+        "J'ai créé ce code\n<section></section>": "<section></section>",
+        # Not a preamble: no sentence end before the markup, or no markup
+        "Voici <b>gras</b>": "Voici <b>gras</b>",
+        "Voici un texte sans balises.": "Voici un texte sans balises.",
+    }
+    for raw, expected in cases.items():
+        assert _clean_html_fragment(raw) == expected, raw
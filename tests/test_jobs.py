@@ -0,0 +1,254 @@
+import asyncio
+import contextlib
+import threading
+import time
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+from mcp_redactionnel import api
+from mcp_redactionnel.config import JobsConfig
+from mcp_redactionnel.jobs import JobStore, JobWorkers
+
+
+class EchoProvider:
+    def __init__(self):
+        self.calls = 0
+
+    async def agenerate(self, prompt, **kwargs):
+        self.calls += 1
+        if kwargs.get("sujet") == "boom":
+            raise RuntimeError("upstream down")
+        await asyncio.sleep(0.01)
+        return "OK:" + (kwargs.get("sujet") or kwargs.get("texte"))
+
+
+def _provider(monkeypatch):
+    prov = EchoProvider()
+    monkeypatch.setattr(
+        "mcp_redactionnel.service.ProviderManager.get", lambda self, name: prov
+    )
+    return prov
+
+
+def _config(tmp_path, extra=""):
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text(
+        "providers:\n  p:\n    type: generic\n    endpoint: 'http://x'\n" + extra
+    )
+    return str(cfg)
+
+
+def _receiver():
+    app = FastAPI()
+    app.state.calls = []
+
+    @app.post("/hook")
+    async def hook(request: Request):
+        app.state.calls.append(await request.json())
+        # The first delivery fails
+        return Response(status_code=500 if len(app.state.calls) == 1 else 204)
+
+    return app
+
+
+async def _drain(workers, store, job_ids, timeout=3.0):
+    task = asyncio.create_task(workers.run())
+    deadline = time.monotonic() + timeout
+    try:
+        while time.monotonic() < deadline:
+            jobs = [store.get(i) for i in job_ids]
+            if all(j["webhook_status"] != "pending" for j in jobs) and all(
+                j["status"] in ("done", "error") for j in jobs
+            ):
+                return jobs
+            await asyncio.sleep(0.01)
+        raise AssertionError("jobs not finished")
+    finally:
+        task.cancel()
+
+
+def test_store_claims_each_job_once_until_its_lease_expires(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    first = store.submit("redaction", {"provider": "p", "sujet": "a"})
+    second = store.submit("mise_en_forme", {"provider": "p", "texte": "b"})
+
+    job = store.claim(lease=60)
+    assert job["id"] == first and job["status"] == "running" and job["claims"] == 1
+    assert store.claim(lease=60)["id"] == second
+    assert store.claim(lease=60) is None  # both leased
+
+    store.finish(first, result="ok", info={"provider": "p", "attempts": 1})
+    assert store.get(first)["status"] == "done"
+    store.release(second)  # clean shutdown: back to the queue
+    again = store.claim(lease=0)
+    assert again["id"] == second and again["claims"] == 1
+    # A worker that stopped renewing loses the job to the next claim
+    assert store.claim(lease=60)["claims"] == 2
+    assert store.counts() == {"done": 1, "running": 1}
+    store.close()
+
+
+def test_workers_run_jobs_and_deliver_webhooks(monkeypatch, tmp_path):
+    prov = _provider(monkeypatch)
+    cfg = _config(tmp_path)
+    receiver = _receiver()
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    # The receiver's host does not resolve: no address check
+    config = JobsConfig(
+        poll_interval=0.01, webhook_attempts=2, webhook_allow_private=True
+    )
+    workers = JobWorkers(store, config, transport=httpx.ASGITransport(app=receiver))
+    # `webhook_attempts` 2 with a 0.5 s backoff: keep the test fast
+    monkeypatch.setattr("mcp_redactionnel.jobs.asyncio.sleep", _fast_sleep)
+
+    ok = store.submit(
+        "redaction", {"provider": "p", "sujet": "vélo"}, cfg, "http://hook.test/hook"
+    )
+    boom = store.submit("redaction", {"provider": "p", "sujet": "boom"}, cfg)
+    page = store.submit("mise_en_forme", {"provider": "p", "texte": "Titre"}, cfg)
+
+    done, failed, formatted = asyncio.run(_drain(workers, store, [ok, boom, page]))
+    assert done["status"] == "done" and done["result"] == "OK:vélo"
+    assert done["provider_used"] == "EchoProvider" and done["attempts"] == 1
+    assert failed["status"] == "error"
+    assert failed["error"] == "RuntimeError: upstream down"
+    assert "OK:Titre" in formatted["result"]
+    # The first delivery failed (HTTP 500) and was retried
+    assert done["webhook_status"] == "delivered"
+    assert [c["id"] for c in receiver.state.calls] == [ok, ok]
+    assert receiver.state.calls[-1]["result"] == "OK:vélo"
+    assert prov.calls == 3
+    store.close()
+
+
+_real_sleep = asyncio.sleep
+
+
+async def _fast_sleep(delay):
+    await _real_sleep(min(delay, 0.01))
+
+
+def test_jobs_of_a_dead_worker_run_again_after_a_restart(monkeypatch, tmp_path):
+    prov = _provider(monkeypatch)
+    cfg = _config(tmp_path)
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path)
+    job_id = store.submit("redaction", {"provider": "p", "sujet": "a"}, cfg)
+    poison = store.submit("redaction", {"provider": "p", "sujet": "b"}, cfg)
+    # A worker claimed the first job, then the process died
+    store.claim(lease=0.05)
+    for _ in range(3):
+        store.claim(lease=0)  # the second one crashed its worker three times
+    assert store.get(poison)["claims"] == 3
+    store.close()
+
+    time.sleep(0.06)
+    store = JobStore(path)
+    workers = JobWorkers(store, JobsConfig(poll_interval=0.01))
+    done, abandoned = asyncio.run(_drain(workers, store, [job_id, poison]))
+    assert done["status"] == "done" and done["result"] == "OK:a"
+    assert abandoned["status"] == "error"
+    assert "abandoned" in abandoned["error"]
+    assert prov.calls == 1
+    store.close()
+
+
+def test_jobs_api_submits_and_polls(monkeypatch, tmp_path):
+    _provider(monkeypatch)
+    monkeypatch.chdir(tmp_path)
+    cfg = _config(tmp_path, "jobs:\n  path: jobs.sqlite3\n  poll_interval: 0.01\n")
+
+    with TestClient(api.app) as client:
+        r = client.post(
+            "/jobs",
+            params={"config": cfg},
+            json={"provider": "p", "sujet": "vélo", "format": "html"},
+        )
+        assert r.status_code == 202
+        job = r.json()
+        assert job["status"] == "queued" and job["kind"] == "redaction"
+        assert r.headers["location"] == f"/jobs/{job['id']}"
+
+        deadline = time.monotonic() + 3
+        while job["status"] != "done" and time.monotonic() < deadline:
+            time.sleep(0.01)
+            job = client.get(f"/jobs/{job['id']}").json()
+        assert job["result"] == "OK:vélo"
+
+        missing = client.post("/jobs", json={"kind": "mise_en_forme", "provider": "p"})
+        assert missing.status_code == 422
+        assert client.get("/jobs/nope").status_code == 404
+    assert (tmp_path / "jobs.sqlite3").exists()
+
+
+def test_wake_from_another_thread_starts_jobs_before_the_poll(monkeypatch, tmp_path):
+    _provider(monkeypatch)
+    cfg = _config(tmp_path)
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    workers = JobWorkers(store, JobsConfig(poll_interval=30))
+    # The loop runs in its own thread, like the API's; this thread plays the
+    # sync endpoint in the threadpool and does nothing that wakes the loop
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(workers.run())
+
+    def serve():
+        with contextlib.suppress(asyncio.CancelledError):
+            loop.run_until_complete(task)
+        loop.run_until_complete(loop.shutdown_default_executor())
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    try:
+        time.sleep(0.2)  # both workers found nothing and went to sleep
+        start = time.monotonic()
+        ids = [
+            store.submit("redaction", {"provider": "p", "sujet": s}, cfg, None)
+            for s in ("un", "deux")
+        ]
+        workers.wake()
+        jobs = []
+        while time.monotonic() - start < 5:
+            jobs = [store.get(i) for i in ids]
+            if all(job["status"] == "done" for job in jobs):
+                break
+            time.sleep(0.01)
+        assert [job["status"] for job in jobs] == ["done", "done"]
+        assert time.monotonic() - start < 2
+    finally:
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join(5)
+        loop.close()
+        store.close()
+
+
+def test_webhooks_to_internal_addresses_are_refused(monkeypatch, tmp_path):
+    _provider(monkeypatch)
+    cfg = _config(tmp_path)
+    receiver = _receiver()
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    workers = JobWorkers(
+        store,
+        JobsConfig(poll_interval=0.01),
+        transport=httpx.ASGITransport(app=receiver),
+    )
+    job_id = store.submit(
+        "redaction",
+        {"provider": "p", "sujet": "a"},
+        cfg,
+        "http://169.254.169.254/latest/meta-data/",
+    )
+    (job,) = asyncio.run(_drain(workers, store, [job_id]))
+    assert job["status"] == "done" and job["webhook_status"] == "failed"
+    assert receiver.state.calls == []
+    store.close()
+
+    monkeypatch.chdir(tmp_path)
+    _config(tmp_path, "jobs:\n  webhook_allowed_hosts: ['hooks.example.org']\n")
+    with TestClient(api.app) as client:
+        for webhook in ("file:///etc/passwd", "https://evil.example.com/hook"):
+            r = client.post(
+                "/jobs", json={"provider": "p", "sujet": "a", "webhook": webhook}
+            )
+            assert r.status_code == 422 and "webhook refusé" in r.json()["detail"]
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from mcp_redactionnel.limits import ProviderLimiter, RateLimitTimeout
+from mcp_redactionnel.providers import ProviderHTTPError, _parse_retry_after
+from mcp_redactionnel.service import redaction
+
+
+def test_max_concurrency_is_enforced():
+    limiter = ProviderLimiter(max_concurrency=2)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with limiter.slot():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    with ThreadPoolExecutor(6) as pool:
+        list(pool.map(lambda _: work(), range(6)))
+    assert peak[0] == 2
+    assert limiter.stats()["admitted"] == 6
+
+
+def test_requests_per_second_spreads_bursts():
+    limiter = ProviderLimiter(requests_per_second=20)
+    start = time.monotonic()
+    for _ in range(25):
+        with limiter.slot():
+            pass
+    # 20 requests fit in the initial bucket, the other 5 need ~0.25s
+    assert time.monotonic() - start >= 0.2
+
+
+def test_bounded_wait_raises_rate_limit_timeout():
+    limiter = ProviderLimiter(max_concurrency=1, max_wait=0.05)
+    limiter.acquire()
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire()
+    limiter.release()
+    stats = limiter.stats()
+    assert stats["rejected"] == 1
+    assert stats["queue_depth"] == 0
+
+
+def test_async_waiters_are_admitted_in_order():
+    limiter = ProviderLimiter(max_concurrency=1)
+    order = []
+
+    async def job(i):
+        async with limiter.aslot():
+            order.append(i)
+            await asyncio.sleep(0.005)
+
+    async def run():
+        await asyncio.gather(*(job(i) for i in range(5)))
+
+    asyncio.run(run())
+    assert order == [0, 1, 2, 3, 4]
+
+
+def test_upstream_429_pauses_the_queue():
+    class QuotaProvider:
+        calls = 0
+
+        def generate(self, prompt, **kwargs):
+            QuotaProvider.calls += 1
+            if QuotaProvider.calls == 1:
+                raise ProviderHTTPError("HTTP 429", status_code=429, retry_after=0.2)
+            return "OK"
+
+    p = QuotaProvider()
+    p.limiter = ProviderLimiter(max_concurrency=4)
+    with pytest.raises(ProviderHTTPError):
+        redaction(p, "Sujet")
+    assert p.limiter.stats()["pauses"] == 1
+    start = time.monotonic()
+    assert redaction(p, "Sujet") == "OK"
+    assert time.monotonic() - start >= 0.15
+
+
+def test_parse_retry_after():
+    assert _parse_retry_after("3") == 3.0
+    assert _parse_retry_after(None) is None
+    assert _parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
@@ -0,0 +1,147 @@
+import asyncio
+import re
+import threading
+import time
+
+from mcp_redactionnel.config import LongTextConfig
+from mcp_redactionnel.longtext import Stitcher, split_text, stitch
+from mcp_redactionnel.service import (
+    amise_en_forme,
+    amise_en_forme_stream,
+    mise_en_forme,
+)
+
+PARAGRAPH = (
+    "Le réemploi prolonge la vie des objets et limite les déchets. " * 5
+).strip()
+
+
+def _document(sections: int = 6) -> str:
+    blocks = []
+    for n in range(1, sections + 1):
+        blocks += [f"{n}. Partie {n}", PARAGRAPH, PARAGRAPH]
+    return "\n\n".join(blocks)
+
+
+class PartProvider:
+    """Formats each part as an <article> with an h1 and fixed ids."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, **kwargs):
+        with self._lock:
+            self.calls.append((prompt, kwargs))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        title = kwargs["texte"].split("\n", 1)[0]
+        return (
+            "```html\n<article>\n"
+            f'<h1 id="titre">{title}</h1>\n'
+            '<section aria-labelledby="s1"><h2 id="s1">Détail</h2>'
+            '<p><a href="#titre">haut</a></p></section>\n</article>\n```'
+        )
+
+
+def test_split_text_cuts_between_sections():
+    parts = split_text(_document(), 900)
+    assert len(parts) == 6
+    assert all(len(p) <= 900 for p in parts)
+    assert [p.split("\n", 1)[0] for p in parts] == [
+        f"{n}. Partie {n}" for n in range(1, 7)
+    ]
+    assert "\n\n".join(parts) == _document()
+    # A paragraph longer than a part is cut at sentence ends
+    long = split_text("Une phrase. " * 200, 300)
+    assert len(long) > 1 and all(len(p) <= 300 for p in long)
+
+
+def test_stitcher_keeps_one_h1_and_unique_ids():
+    part = (
+        '<article><h1 id="t">Titre</h1><h2 id="a">A</h2>'
+        '<p aria-labelledby="a t"><a href="#a">lien</a></p></article>'
+    )
+    html = stitch([part, part, "<p>Fin</p>"])
+    assert html.startswith("<article>\n<h1") and html.endswith("\n</article>")
+    assert html.count("<article") == 1
+    assert re.findall(r"<h(\d)", html) == ["1", "2", "2", "3"]
+    assert re.findall(r'id="([^"]*)"', html) == ["t", "a", "t-2", "a-2"]
+    assert '<p aria-labelledby="a-2 t-2"><a href="#a-2">' in html
+
+    stitcher = Stitcher()
+    stitcher.add("<h2>Sans h1</h2>")
+    assert stitcher.add("<h1>Plus haut</h1>") == "<h2>Plus haut</h2>"
+
+
+def test_stitcher_unwraps_a_single_outer_article_only():
+    first = (
+        '<article lang="fr" aria-labelledby="t"><h1 id="t">Titre</h1>'
+        "<p>Début</p></article>"
+    )
+    two = "<article><p>A</p></article>\n<article><p>B</p></article>"
+    stitcher = Stitcher()
+    assert stitcher.add(first) == '<h1 id="t">Titre</h1><p>Début</p>'
+    assert stitcher.opening == '<article lang="fr" aria-labelledby="t">\n'
+    # Two sibling articles are not one wrapper: kept whole
+    assert stitcher.add(two) == two
+    html = stitch([first, "<article><p>Suite</p></article>"])
+    assert html.startswith('<article lang="fr" aria-labelledby="t">\n<h1')
+    assert html.count("<article") == 1 and html.endswith("<p>Suite</p>\n</article>")
+
+
+def test_long_mise_en_forme_formats_parts_concurrently():
+    provider = PartProvider(delay=0.05)
+    info = {}
+    config = LongTextConfig(threshold=2000, chunk_chars=900, concurrency=3)
+    html = mise_en_forme(provider, _document(), info=info, long_text=config)
+
+    assert len(provider.calls) == 6 and provider.peak == 3
+    assert info == {
+        "provider": "PartProvider",
+        "attempts": 6,
+        "cached": False,
+        "parts": 6,
+    }
+    assert html.count("<h1") == 1 and html.count("<article") == 1
+    ids = re.findall(r'id="([^"]*)"', html)
+    assert len(ids) == len(set(ids)) == 12
+    assert "```" not in html
+    # Parts after the first are told not to restart the outline
+    prompts = sorted(provider.calls, key=lambda c: c[1]["texte"])
+    assert "suite d'un document" not in prompts[0][0]
+    assert all("suite d'un document" in p for p, _ in prompts[1:])
+    assert all(kw["max_tokens"] >= 512 for _, kw in provider.calls)
+
+    # Short textes keep the single-call path
+    short = PartProvider()
+    mise_en_forme(short, "Bonjour", long_text=config)
+    assert len(short.calls) == 1 and short.calls[0][1]["max_tokens"] == 512
+    mise_en_forme(short, "Bonjour. " * 200, long_text=config)
+    assert short.calls[1][1]["max_tokens"] == 900
+
+
+def test_async_and_stream_match_the_sync_result():
+    config = LongTextConfig(threshold=2000, chunk_chars=900)
+    expected = mise_en_forme(PartProvider(), _document(), long_text=config)
+
+    async def run():
+        buffered = await amise_en_forme(PartProvider(), _document(), long_text=config)
+        chunks = [
+            c
+            async for c in amise_en_forme_stream(
+                PartProvider(), _document(), long_text=config
+            )
+        ]
+        return buffered, chunks
+
+    buffered, chunks = asyncio.run(run())
+    assert buffered == expected
+    assert len(chunks) == 7  # opening with the 1st part, 5 parts, closing
+    assert "".join(chunks) == expected
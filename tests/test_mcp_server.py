@@ -0,0 +1,280 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import httpx
+
+from mcp_redactionnel import mcp_server
+from mcp_redactionnel.providers import GenericHTTPProvider
+from mcp_redactionnel.service import get_manager, get_registry
+
+CONFIG = """
+providers:
+  p:
+    type: generic
+    endpoint: 'http://llm.test/'
+    body_template: '{"sujet": "{{ sujet }}"}'
+"""
+
+
+def _backend(monkeypatch):
+    """Slow local handler echoing the sujet; records each pool opened."""
+    pools = []
+
+    async def handler(request):
+        if request.method == "HEAD":  # warm-up
+            return httpx.Response(200)
+        sujet = json.loads(request.content)["sujet"]
+        await asyncio.sleep(0.2)
+        if sujet == "boom":
+            return httpx.Response(500, text="upstream down")
+        return httpx.Response(200, text="OK " + sujet)
+
+    kwargs = GenericHTTPProvider._client_kwargs
+
+    def client_kwargs(self):
+        pools.append(self)
+        return {**kwargs(self), "transport": httpx.MockTransport(handler)}
+
+    monkeypatch.setattr(GenericHTTPProvider, "_client_kwargs", client_kwargs)
+    return pools
+
+
+class Client:
+    """Test side of the stdio transport, over two pipes."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def send(self, message):
+        self.writer.write(json.dumps({"jsonrpc": "2.0", **message}).encode() + b"\n")
+        await self.writer.drain()
+
+    async def receive(self):
+        return json.loads(await self.reader.readline())
+
+
+async def _session(config, scenario):
+    server_in, client_out = os.pipe()
+    client_in, server_out = os.pipe()
+    server = asyncio.create_task(
+        mcp_server.run(config, os.fdopen(server_in, "rb"), os.fdopen(server_out, "wb"))
+    )
+    reader, writer = await mcp_server.open_streams(
+        os.fdopen(client_in, "rb"), os.fdopen(client_out, "wb")
+    )
+    try:
+        return await scenario(Client(reader, writer))
+    finally:
+        writer.close()  # EOF: the server finishes its calls and exits
+        await asyncio.wait_for(server, 5)
+
+
+def test_concurrent_calls_share_one_warm_provider(monkeypatch, tmp_path):
+    pools = _backend(monkeypatch)
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text(CONFIG)
+
+    def call(msg_id, sujet):
+        return {
+            "id": msg_id,
+            "method": "tools/call",
+            "params": {
+                "name": "redaction",
+                "arguments": {"provider": "p", "sujet": sujet, "no_cache": True},
+            },
+        }
+
+    async def scenario(client):
+        await client.send(
+            {"id": 0, "method": "initialize", "params": {"protocolVersion": "x"}}
+        )
+        init = await client.receive()
+        assert init["result"]["protocolVersion"] == mcp_server.PROTOCOL_VERSIONS[0]
+        await client.send({"method": "notifications/initialized"})
+        await client.send({"id": 1, "method": "tools/list"})
+        tools = (await client.receive())["result"]["tools"]
+        assert [t["name"] for t in tools] == [
+            "redaction",
+            "mise_en_forme",
+            "list_providers",
+        ]
+        provider = get_manager(str(cfg)).get("p")
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for i in range(2, 7):
+            await client.send(call(i, f"sujet {i}"))
+        await client.send(call(7, "boom"))
+        await client.send({"id": 8, "method": "ping"})
+        responses = [await client.receive() for _ in range(7)]
+        elapsed = loop.time() - start
+        assert get_manager(str(cfg)).get("p") is provider
+        return responses, elapsed
+
+    responses, elapsed = asyncio.run(_session(str(cfg), scenario))
+    # The ping is not stuck behind the calls, which ran side by side
+    assert responses[0] == {"jsonrpc": "2.0", "id": 8, "result": {}}
+    assert elapsed < 1.0
+    by_id = {r["id"]: r["result"] for r in responses}
+    for i in range(2, 7):
+        assert by_id[i]["content"][0]["text"] == f"OK sujet {i}"
+        assert by_id[i]["structuredContent"]["provider_used"] == "p"
+        assert by_id[i]["isError"] is False
+    assert by_id[7]["isError"] is True
+    assert "upstream down" in by_id[7]["content"][0]["text"]
+    assert len(pools) == 1  # one pool for the warm-up and every call
+
+
+def test_protocol_errors_and_cancellation(monkeypatch, tmp_path):
+    _backend(monkeypatch)
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text(CONFIG + "warmup:\n  enabled: false\n")
+
+    async def scenario(client):
+        client.writer.write(b"{not json\n")
+        await client.send({"id": 1, "method": "resources/list"})
+        await client.send({"id": 2, "method": "tools/call", "params": {"name": "nope"}})
+        await client.send(
+            {
+                "id": 3,
+                "method": "tools/call",
+                "params": {"name": "mise_en_forme", "arguments": {"provider": "p"}},
+            }
+        )
+        await client.send(
+            {
+                "id": 6,
+                "method": "tools/call",
+                "params": {
+                    "name": "mise_en_forme",
+                    "arguments": {"provider": "p", "texte": "t", "no_cache": "false"},
+                },
+            }
+        )
+        errors = [await client.receive() for _ in range(5)]
+        await client.send(
+            {
+                "id": 4,
+                "method": "tools/call",
+                "params": {
+                    "name": "redaction",
+                    "arguments": {"provider": "p", "sujet": "long"},
+                },
+            }
+        )
+        await asyncio.sleep(0.05)
+        await client.send(
+            {"method": "notifications/cancelled", "params": {"requestId": 4}}
+        )
+        await client.send(
+            {"id": 5, "method": "tools/call", "params": {"name": "list_providers"}}
+        )
+        return errors, await client.receive()
+
+    errors, listing = asyncio.run(_session(str(cfg), scenario))
+    assert [(e["id"], e["error"]["code"]) for e in errors] == [
+        (None, -32700),
+        (1, -32601),
+        (2, -32602),
+        (3, -32602),
+        (6, -32602),
+    ]
+    # The cancelled call gets no response: the next one is the listing
+    assert listing["id"] == 5
+    assert listing["result"]["structuredContent"] == {
+        "providers": {"p": {"type": "generic", "model": None}},
+        "chains": {},
+    }
+
+
+class _Output:
+    """Writer side collecting the server's messages."""
+
+    def __init__(self):
+        self.messages = []
+
+    def write(self, data):
+        self.messages.extend(json.loads(line) for line in data.splitlines())
+
+    async def drain(self):
+        pass
+
+
+def test_bad_lines_and_ids_get_errors_and_serving_goes_on(monkeypatch, tmp_path):
+    _backend(monkeypatch)
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text(CONFIG + "warmup:\n  enabled: false\n")
+    call = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "tools/call",
+        "params": {
+            "name": "redaction",
+            "arguments": {"provider": "p", "sujet": "lent", "no_cache": True},
+        },
+    }
+    lines = [
+        json.dumps(call),
+        json.dumps(call),  # same id while the first one runs
+        '{"id": 2, "method": "ping", "sujet": "' + "x" * 4096 + '"}',
+        '{"id": 3, "method": "ping"}',  # no "jsonrpc"
+        json.dumps({"jsonrpc": "2.0", "id": 4, "method": "ping"}),
+    ]
+
+    async def run():
+        reader = asyncio.StreamReader(limit=1024)
+        reader.feed_data("".join(line + "\n" for line in lines).encode())
+        reader.feed_eof()
+        out = _Output()
+        await mcp_server.MCPServer(str(cfg)).serve(reader, out)
+        await get_registry().aclose()
+        return out.messages
+
+    messages = asyncio.run(run())
+    assert [(m["id"], m.get("error", {}).get("code")) for m in messages] == [
+        (1, -32600),
+        (None, -32700),
+        (3, -32600),
+        (4, None),
+        (1, None),
+    ]
+    assert messages[-1]["result"]["content"][0]["text"] == "OK lent"
+
+
+def test_runs_as_a_module_without_the_http_stack(tmp_path):
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text(CONFIG + "warmup:\n  enabled: false\n")
+    messages = [
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+        {
+            "jsonrpc": "2.0",
+            "id": 2,
+            "method": "tools/call",
+            "params": {"name": "list_providers"},
+        },
+    ]
+    check = (
+        "import sys\n"
+        "from mcp_redactionnel import mcp_server\n"
+        f"mcp_server.main(['--config', {str(cfg)!r}])\n"
+        "server = ('fastapi', 'starlette', 'uvicorn', 'mcp_redactionnel.api')\n"
+        "print(sorted(m for m in server if m in sys.modules), file=sys.stderr)\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", check],
+        input="".join(json.dumps(m) + "\n" for m in messages),
+        capture_output=True,
+        text=True,
+        timeout=30,
+        check=True,
+    )
+    init, listing = [json.loads(line) for line in proc.stdout.splitlines()]
+    assert init["result"]["serverInfo"]["name"] == "mcp-redactionnel"
+    assert listing["result"]["structuredContent"]["providers"] == {
+        "p": {"type": "generic", "model": None}
+    }
+    assert proc.stderr.splitlines()[-1] == "[]"
@@ -0,0 +1,111 @@
+import re
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from mcp_redactionnel import api
+from mcp_redactionnel.config import ProviderConfig
+from mcp_redactionnel.fake_llm import FakeLLMSettings, create_app
+from mcp_redactionnel.metrics import Counter, Histogram, Registry
+from mcp_redactionnel.providers import MistralProvider
+
+
+def _value(text, sample):
+    """Value of one exposition line, 0 if absent."""
+    m = re.search(r"^" + re.escape(sample) + r" (\S+)$", text, flags=re.M)
+    return float(m.group(1)) if m else 0.0
+
+
+def test_exposition_format():
+    registry = Registry()
+    requests = registry.register(Counter("t_requests_total", "Requests.", ("path",)))
+    latency = registry.register(Histogram("t_seconds", "Latency.", buckets=(0.1, 1)))
+    requests.labels('a"b\\c').inc()
+    requests.labels('a"b\\c').inc(2)
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    text = registry.render()
+    assert "# TYPE t_requests_total counter" in text
+    assert 't_requests_total{path="a\\"b\\\\c"} 3' in text
+    assert 't_seconds_bucket{le="0.1"} 1' in text
+    assert 't_seconds_bucket{le="1"} 2' in text
+    assert 't_seconds_bucket{le="+Inf"} 3' in text
+    assert "t_seconds_count 3" in text
+    assert "t_seconds_sum 5.55" in text
+    with pytest.raises(ValueError):
+        requests.labels("a", "b")
+    with pytest.raises(ValueError):
+        registry.register(Counter("t_requests_total", "Again."))
+
+
+def test_metrics_endpoint_records_upstream_calls(monkeypatch, tmp_path):
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text("providers:\n  fake:\n    type: mistral\n    endpoint: 'x'\n")
+    fake = create_app(FakeLLMSettings(words=7))
+    prov = MistralProvider(
+        ProviderConfig(
+            type="mistral",
+            endpoint="http://testserver/v1/chat/completions",
+            response_path="choices.0.message.content",
+        )
+    )
+    prov.name = "fake_mistral"
+    # The API calls `agenerate`: route the async client to the fake app
+    prov._client_kwargs = lambda: {"transport": httpx.ASGITransport(app=fake)}
+    monkeypatch.setattr(
+        "mcp_redactionnel.service.ProviderManager.get", lambda self, name: prov
+    )
+    client = TestClient(api.app)
+    ok = (
+        'mcp_upstream_request_duration_seconds_count{provider="fake_mistral",'
+        'status="ok"}'
+    )
+    tokens = 'mcp_tokens_total{provider="fake_mistral",kind="completion"}'
+    counted = 'mcp_requests_total{endpoint="redaction",format="html"}'
+    http = (
+        'mcp_http_request_duration_seconds_count{endpoint="/redaction",'
+        'method="POST",status="200"}'
+    )
+    before = client.get("/metrics").text
+
+    r = client.post(
+        "/redaction",
+        params={"config": str(cfg)},
+        json={"provider": "fake", "sujet": "Vélo", "format": "html", "no_cache": True},
+    )
+    assert r.status_code == 200
+    r = client.get("/metrics")
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    after = r.text
+    assert _value(after, ok) == _value(before, ok) + 1
+    assert _value(after, tokens) == _value(before, tokens) + 7
+    assert _value(after, counted) == _value(before, counted) + 1
+    assert _value(after, http) == _value(before, http) + 1
+    assert _value(after, "mcp_html_clean_duration_seconds_count") > 0
+    assert 'mcp_settings_lookups_total{result="miss"}' in after
+
+    # Failed calls are labelled with the upstream status
+    fake.state.settings.rate_limit_ratio = 1.0
+    failed = (
+        'mcp_upstream_request_duration_seconds_count{provider="fake_mistral",'
+        'status="429"}'
+    )
+    client.post(
+        "/redaction",
+        params={"config": str(cfg)},
+        json={"provider": "fake", "sujet": "Vélo", "no_cache": True},
+    )
+    assert _value(client.get("/metrics").text, failed) >= 1
+
+    # The client's format string does not become a label value
+    client.post(
+        "/redaction",
+        params={"config": str(cfg)},
+        json={"provider": "fake", "sujet": "Vélo", "format": "x" * 40},
+    )
+    text = client.get("/metrics").text
+    assert "x" * 40 not in text
+    assert 'mcp_requests_total{endpoint="redaction",format="other"}' in text
@@ -0,0 +1,332 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from mcp_redactionnel import codec, metrics
+from mcp_redactionnel.codec import compile_path
+from mcp_redactionnel.config import ProviderConfig, Settings
+from mcp_redactionnel.providers import (
+    GenericHTTPProvider,
+    MistralProvider,
+    OllamaProvider,
+    ProviderHTTPError,
+)
+
+
+def _mock_client(handler):
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+def test_generic_provider_reuses_pooled_client():
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json={"choices": [{"text": "ok"}]})
+
+    cfg = ProviderConfig(
+        type="generic",
+        endpoint="http://llm.local/generate",
+        response_path="choices.0.text",
+    )
+    prov = GenericHTTPProvider(cfg)
+    prov._client = _mock_client(handler)
+    client = prov.client
+
+    assert prov.generate("a") == "ok"
+    assert prov.generate("b") == "ok"
+    assert prov.client is client
+    assert len(seen) == 2
+    prov.close()
+    assert client.is_closed
+
+
+def test_async_clients_of_closed_loops_are_closed():
+    prov = GenericHTTPProvider(
+        ProviderConfig(type="generic", endpoint="http://llm.local/generate")
+    )
+
+    async def use():
+        client = prov.aclient
+        assert prov.aclient is client
+        await asyncio.sleep(0)  # let the previous client's close run
+        return client
+
+    first = asyncio.run(use())
+    second = asyncio.run(use())
+    assert second is not first
+    assert first.is_closed and not second.is_closed
+    assert len(prov._aclients) == 1
+
+    async def close():
+        await prov.aclose()
+
+    asyncio.run(close())
+    assert second.is_closed and not prov._aclients
+
+
+def test_client_settings_come_from_config():
+    cfg = ProviderConfig(
+        type="mistral",
+        endpoint="http://llm.local",
+        timeouts={"connect": 2.0, "read": 90.0},
+        pool={"max_connections": 4, "keepalive_expiry": 60.0},
+    )
+    prov = MistralProvider(cfg)
+    kwargs = prov._client_kwargs()
+    assert kwargs["timeout"].connect == 2.0
+    assert kwargs["timeout"].read == 90.0
+    assert kwargs["limits"].max_connections == 4
+    assert kwargs["limits"].keepalive_expiry == 60.0
+    assert kwargs["http2"] is False
+    assert prov.client.timeout.read == 90.0
+    prov.close()
+
+
+def test_mistral_agenerate_uses_async_client():
+    def handler(request):
+        assert request.method == "POST"
+        return httpx.Response(
+            200, json={"choices": [{"message": {"content": "bonjour"}}]}
+        )
+
+    cfg = ProviderConfig(
+        type="mistral",
+        endpoint="http://llm.local/v1/chat/completions",
+        response_path="choices.0.message.content",
+    )
+    prov = MistralProvider(cfg)
+
+    async def run():
+        prov._aclients[asyncio.get_running_loop()] = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        )
+        try:
+            return await prov.agenerate("Salut")
+        finally:
+            await prov.aclose()
+
+    assert asyncio.run(run()) == "bonjour"
+
+
+def test_mistral_generate_stream_parses_sse():
+    body = (
+        'data: {"choices": [{"delta": {"role": "assistant"}}]}\n\n'
+        'data: {"choices": [{"delta": {"content": "Bon"}}]}\n\n'
+        'data: {"choices": [{"delta": {"content": "jour"}}]}\n\n'
+        "data: [DONE]\n\n"
+    )
+
+    def handler(request):
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, content=body.encode())
+
+    prov = MistralProvider(ProviderConfig(type="mistral", endpoint="http://llm"))
+    prov._client = _mock_client(handler)
+    assert list(prov.generate_stream("Salut")) == ["Bon", "jour"]
+
+
+def test_mistral_caps_max_tokens_and_continues_cut_off_answers():
+    seen = []
+    replies = [("Bon", "length"), ("jour", "stop")]
+
+    def handler(request):
+        body = json.loads(request.content)
+        seen.append(body)
+        content, finish = replies[len(seen) - 1]
+        return httpx.Response(
+            200,
+            json={
+                "choices": [{"message": {"content": content}, "finish_reason": finish}],
+                "usage": {"prompt_tokens": 5, "completion_tokens": 2},
+            },
+        )
+
+    cfg = ProviderConfig(
+        type="mistral",
+        endpoint="http://llm",
+        response_path="choices.0.message.content",
+        max_tokens=600,
+    )
+    prov = MistralProvider(cfg)
+    prov._client = _mock_client(handler)
+    with metrics.usage_scope() as usage:
+        assert prov.generate("Salut", max_tokens=1200) == "Bonjour"
+    assert [body["max_tokens"] for body in seen] == [600, 600]
+    assert seen[1]["messages"] == [
+        {"role": "user", "content": "Salut"},
+        {"role": "assistant", "content": "Bon", "prefix": True},
+    ]
+    assert usage == {"prompt_tokens": 10, "completion_tokens": 4}
+    assert prov._build_request("x")["json"]["max_tokens"] == 512
+
+    # Bounded by `continuations`
+    seen.clear()
+    replies[:] = [("a", "length")] * 3
+    prov = MistralProvider(cfg.copy(update={"continuations": 0}))
+    prov._client = _mock_client(handler)
+    assert prov.generate("Salut") == "a" and len(seen) == 1
+
+    # Replies that repeat the prefix before the new text
+    seen.clear()
+    replies[:] = [
+        ("Il était", "length"),
+        ("Il était une", "length"),
+        ("Il était une fois", "stop"),
+    ]
+    prov = MistralProvider(cfg)
+    prov._client = _mock_client(handler)
+    assert prov.generate("Conte") == "Il était une fois"
+    assert seen[2]["messages"][1]["content"] == "Il était une"
+
+
+def test_ollama_agenerate_stream_parses_ndjson():
+    lines = [
+        {"response": "Bon", "done": False},
+        {"response": "jour", "done": False},
+        {"response": "", "done": True, "eval_count": 2},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines)
+
+    def handler(request):
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, content=body.encode())
+
+    cfg = ProviderConfig(
+        type="ollama",
+        endpoint="http://localhost:11434/api/generate",
+        body_template='{"model": "mistral", "prompt": "{{ prompt }}"}',
+    )
+    prov = OllamaProvider(cfg)
+
+    async def run():
+        prov._aclients[asyncio.get_running_loop()] = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        )
+        return [chunk async for chunk in prov.agenerate_stream("Salut")]
+
+    assert asyncio.run(run()) == ["Bon", "jour"]
+
+
+def test_ollama_native_chat_payload_and_metrics():
+    seen = []
+
+    def handler(request):
+        seen.append(json.loads(request.content))
+        return httpx.Response(
+            200,
+            json={
+                "message": {"role": "assistant", "content": "Bonjour"},
+                "done": True,
+                "prompt_eval_count": 7,
+                "prompt_eval_duration": 250_000_000,
+                "eval_count": 3,
+                "eval_duration": 1_500_000_000,
+            },
+        )
+
+    cfg = ProviderConfig(
+        type="ollama",
+        endpoint="http://localhost:11434",
+        model="mistral",
+        keep_alive="30m",
+        options={"num_ctx": 4096, "temperature": 0.2},
+    )
+    prov = OllamaProvider(cfg)
+    prov.name = "ollama_native"
+    prov._client = _mock_client(handler)
+    req = prov._build_request("x")
+    assert req["url"] == "http://localhost:11434/api/chat"
+
+    eval_time = metrics.OLLAMA_DURATION.labels("ollama_native", "eval")
+    tokens = metrics.TOKENS.labels("ollama_native", "completion")
+    before = (eval_time.sum, tokens.value)
+    assert prov.generate("Salut", meta={"num_ctx": "8192", "num_predict": 64}) == (
+        "Bonjour"
+    )
+    assert seen[0] == {
+        "model": "mistral",
+        "messages": [{"role": "user", "content": "Salut"}],
+        "stream": False,
+        "keep_alive": "30m",
+        "options": {"num_ctx": 8192, "num_predict": 64, "temperature": 0.2},
+    }
+    assert eval_time.sum - before[0] == pytest.approx(1.5)
+    assert tokens.value - before[1] == 3
+
+    with pytest.raises(ValueError, match="num_ctx"):
+        prov._build_request("x", meta={"num_ctx": "large"})
+    with pytest.raises(ValueError, match="model"):
+        OllamaProvider(
+            ProviderConfig(type="ollama", endpoint="http://o")
+        )._build_request("x")
+
+
+def test_response_path_is_compiled_once_and_checked_at_load():
+    path = compile_path("choices.0.message.content")
+    assert compile_path("choices.0.message.content") is path
+    data = {"choices": [{"message": {"content": "ok", "n": 3}}]}
+    assert path.extract(data) == "ok"
+    assert compile_path("choices.-1.message.n").extract(data) == "3"
+    assert compile_path("choices.0").extract({"choices": {"0": "clé"}}) == "clé"
+    for shape in ({}, {"choices": []}, {"choices": "x"}, [1], None):
+        assert path.extract(shape) is None
+    assert compile_path(None) is None
+
+    for bad in ("choices[0].text", "choices..text", "choices. 0", "."):
+        with pytest.raises(ValueError, match="invalid response_path"):
+            compile_path(bad)
+    with pytest.raises(ValueError, match="Provider broken: invalid response_path"):
+        Settings.from_yaml(
+            "providers:\n  broken:\n    type: generic\n    endpoint: x\n"
+            "    response_path: 'choices[0].text'\n"
+        )
+
+
+@pytest.mark.parametrize("backend", ["orjson", "json"])
+def test_codec_backends_agree(monkeypatch, backend):
+    if backend == "json":
+        monkeypatch.setattr(codec, "orjson", None)
+    elif codec.orjson is None:
+        pytest.skip("orjson not installed")
+    obj = {"result": "L'été « chaud »\n</p>", "n": [1, 2.5, None, True]}
+    encoded = codec.dumps(obj)
+    assert encoded == json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+    assert codec.loads(encoded) == codec.loads(encoded.decode()) == obj
+    with pytest.raises(ValueError):
+        codec.loads(b"<html>")
+    # Same verdict whichever backend is installed
+    assert (
+        codec.dumps({1: [2**70], None: True})
+        == b'{"1":[1180591620717411303424],"null":true}'
+    )
+    for value in (float("nan"), float("inf"), -float("inf")):
+        with pytest.raises(ValueError):
+            codec.dumps({"n": [None, value]})
+    for text in (b"[NaN]", b"[Infinity]", b"[-Infinity]", b"[1e999]"):
+        with pytest.raises(ValueError):
+            codec.loads(text)
+    with pytest.raises(TypeError):
+        codec.dumps({(1, 2): "tuple key"})
+
+    def handler(request):
+        assert json.loads(request.content) == {"prompt": "é"}
+        assert request.headers["content-type"] == "application/json"
+        if request.url.path == "/down":
+            return httpx.Response(503, json={"error": "busy"})
+        return httpx.Response(200, json={"out": {"text": "réponse"}})
+
+    prov = GenericHTTPProvider(
+        ProviderConfig(
+            type="generic", endpoint="http://llm/ok", response_path="out.text"
+        )
+    )
+    prov._client = _mock_client(handler)
+    assert prov.generate("é") == "réponse"
+    prov.config.endpoint = "http://llm/down"
+    with pytest.raises(ProviderHTTPError, match="HTTP 503 .*'error': 'busy'"):
+        prov.generate("é")
@@ -1,6 +1,10 @@
+import os
+
+from mcp_redactionnel import metrics
 from mcp_redactionnel.service import (
     list_providers,
     mise_en_forme_by_name,
+    redaction,
     redaction_by_name,
 )
 
@@ -79,3 +83,55 @@ def test_redaction_html_prompt(monkeypatch, tmp_path):
         "sans balises" in call[0] or "paragraph" in call[0] or "paragraphes" in call[0]
         for call in dp.calls
     )
+
+
+def test_settings_registry_reuses_manager(tmp_path):
+    from mcp_redactionnel.service import SettingsRegistry
+
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text("providers:\n  p1:\n    type: generic\n    endpoint: 'http://x'\n")
+
+    reg = SettingsRegistry()
+    pm = reg.manager(str(cfg))
+    assert reg.manager(str(cfg)) is pm
+    assert reg.settings(str(cfg)) is reg.settings(str(cfg))
+    assert reg.stats()["misses"] == 1
+    assert reg.stats()["hits"] == 3
+
+    # Same content with a new mtime: still a hit, same manager
+    os.utime(cfg, ns=(0, 0))
+    assert reg.manager(str(cfg)) is pm
+
+    # Edited content: reload
+    cfg.write_text(
+        "providers:\n  p1:\n    type: generic\n    endpoint: 'http://x'\n"
+        "  p2:\n    type: generic\n    endpoint: 'http://y'\n"
+    )
+    assert reg.manager(str(cfg)) is not pm
+    assert set(reg.settings(str(cfg)).providers) == {"p1", "p2"}
+    assert reg.stats()["misses"] == 2
+
+
+def test_max_tokens_follow_meta_length_and_format():
+    p = DummyProvider()
+    redaction(p, "Sujet")
+    redaction(p, "Sujet", meta={"length": "400"})
+    redaction(p, "Sujet", meta={"length": "400"}, format="html")
+    redaction(p, "Sujet", meta={"length": "300-500 mots"})
+    budgets = [kwargs["max_tokens"] for _, kwargs in p.calls]
+    assert budgets == [600, 800, 1200, 1000]
+
+
+def test_info_reports_the_tokens_of_the_request():
+    class UsageProvider:
+        name = "usage_test"
+
+        def generate(self, prompt, **kwargs):
+            metrics.record_usage(
+                self.name, {"prompt_tokens": 12, "completion_tokens": 30}
+            )
+            return "ok"
+
+    info = {}
+    assert redaction(UsageProvider(), "Sujet", info=info) == "ok"
+    assert info["usage"] == {"prompt_tokens": 12, "completion_tokens": 30}
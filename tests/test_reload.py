@@ -0,0 +1,181 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+from mcp_redactionnel import service
+from mcp_redactionnel.config import ReloadConfig
+from mcp_redactionnel.providers import GenericHTTPProvider
+from mcp_redactionnel.reload import ConfigWatcher, Inotify
+from mcp_redactionnel.service import SettingsRegistry, _acall, aredaction_by_name
+
+GOOD = "providers:\n  p:\n    type: generic\n    endpoint: 'http://{host}/'\n"
+
+
+def _write(cfg, text):
+    # New content with a new mtime, even within the filesystem's resolution
+    cfg.write_text(text)
+    st = os.stat(cfg)
+    os.utime(cfg, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def test_invalid_edit_keeps_the_last_good_config(tmp_path, caplog):
+    cfg = tmp_path / "config.yaml"
+    _write(cfg, GOOD.format(host="a"))
+    reg = SettingsRegistry()
+    manager = reg.manager(str(cfg))
+
+    _write(cfg, "providers:\n  p: {type: generic}\n")  # endpoint missing
+    assert reg.reload(str(cfg)) is False
+    assert reg.manager(str(cfg)) is manager
+    assert "Invalid config" in caplog.text
+    # Not parsed again until the file changes
+    assert reg.manager(str(cfg)) is manager
+    assert reg.stats()["rejected"] == 1
+
+    _write(cfg, GOOD.format(host="b"))
+    assert reg.reload(str(cfg)) is True
+    assert reg.settings(str(cfg)).providers["p"].endpoint == "http://b/"
+    assert reg.stats()["reloads"] == 1 and reg.stats()["draining"] == 1
+
+
+def test_in_flight_calls_finish_on_the_old_pool(monkeypatch, tmp_path):
+    release = None
+
+    async def handler(request):
+        await release.wait()
+        return httpx.Response(200, text=request.url.host)
+
+    kwargs = GenericHTTPProvider._client_kwargs
+    monkeypatch.setattr(
+        GenericHTTPProvider,
+        "_client_kwargs",
+        lambda self: {**kwargs(self), "transport": httpx.MockTransport(handler)},
+    )
+    cfg = tmp_path / "config.yaml"
+    _write(cfg, GOOD.format(host="old"))
+    reg = SettingsRegistry()
+    watcher = ConfigWatcher(reg, ReloadConfig(drain_timeout=60))
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        old = reg.manager(str(cfg)).get("p")
+        call = asyncio.create_task(_acall(old, "prompt", {}))
+        await asyncio.sleep(0.01)
+        assert old.in_flight == 1
+
+        _write(cfg, GOOD.format(host="new"))
+        assert await watcher.check() == 1
+        new = reg.manager(str(cfg)).get("p")
+        assert new is not old
+        assert old._aclients  # still serving its call
+        assert await reg.adrain(60) == 0
+
+        release.set()
+        assert await call == "old"
+        assert await reg.adrain(60) == 1
+        assert not old._aclients  # pool closed once idle
+        assert await _acall(new, "prompt", {}) == "new"
+        await reg.aclose()
+
+    asyncio.run(run())
+
+
+def test_queued_requests_keep_the_old_pool_open(monkeypatch, tmp_path):
+    async def handler(request):
+        return httpx.Response(200, text=request.url.host)
+
+    kwargs = GenericHTTPProvider._client_kwargs
+    monkeypatch.setattr(
+        GenericHTTPProvider,
+        "_client_kwargs",
+        lambda self: {**kwargs(self), "transport": httpx.MockTransport(handler)},
+    )
+    cfg = tmp_path / "config.yaml"
+    _write(cfg, GOOD.format(host="old") + "    max_concurrency: 1\n")
+    reg = SettingsRegistry()
+    monkeypatch.setattr(service, "_registry", reg)
+
+    async def run():
+        old = reg.manager(str(cfg)).get("p")
+        old.aclient  # opened by an earlier request
+        async with old.limiter.aslot():
+            call = asyncio.create_task(
+                aredaction_by_name("p", "sujet", config_path=str(cfg), no_cache=True)
+            )
+            await asyncio.sleep(0.01)
+            assert not getattr(old, "in_flight", 0)  # waiting for the limiter
+            _write(cfg, GOOD.format(host="new"))
+            assert reg.reload(str(cfg))
+            assert await reg.adrain(60) == 0
+        assert await call == "old"
+        assert await reg.adrain(60) == 1
+        assert not old._aclients
+        await reg.aclose()
+
+    asyncio.run(run())
+
+
+def test_clear_closes_the_pools(tmp_path):
+    cfg = tmp_path / "config.yaml"
+    _write(cfg, GOOD.format(host="a"))
+    reg = SettingsRegistry()
+    provider = reg.manager(str(cfg)).get("p")
+    client = provider.client
+
+    async def open_async():
+        return provider.aclient
+
+    aclient = asyncio.run(open_async())
+    reg.clear()
+    assert client.is_closed and aclient.is_closed
+    assert reg.manager(str(cfg)).get("p") is not provider
+
+
+@pytest.mark.parametrize("inotify", [True, False])
+def test_watcher_swaps_edited_configs(tmp_path, inotify):
+    if inotify:
+        try:
+            Inotify().close()
+        except (OSError, AttributeError):
+            pytest.skip("inotify unavailable")
+    cfg = tmp_path / "config.yaml"
+    _write(cfg, GOOD.format(host="a"))
+    reg = SettingsRegistry()
+    # With inotify the slow poll never fires: the event triggers the check
+    interval = 30.0 if inotify else 0.05
+    watcher = ConfigWatcher(reg, ReloadConfig(inotify=inotify, interval=interval))
+    callbacks = []
+    on_events = watcher._on_events
+
+    def counted(inotify):
+        callbacks.append(inotify)
+        on_events(inotify)
+
+    watcher._on_events = counted
+
+    async def run():
+        reg.manager(str(cfg))
+        task = asyncio.create_task(watcher.run())
+        await asyncio.sleep(0.05)
+        assert reg.watched and watcher.mode == ("inotify" if inotify else "polling")
+        # Editors often write a new file and rename it over the old one
+        tmp = tmp_path / ".config.yaml.swp"
+        tmp.write_text(GOOD.format(host="b"))
+        os.replace(tmp, cfg)
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if reg.settings(str(cfg)).providers["p"].endpoint == "http://b/":
+                break
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await reg.aclose()
+
+    asyncio.run(run())
+    assert reg.settings(str(cfg)).providers["p"].endpoint == "http://b/"
+    assert not reg.watched
+    # Events are read as they come, not once per debounce: no busy loop
+    assert len(callbacks) < 10
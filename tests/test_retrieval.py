@@ -0,0 +1,94 @@
+import asyncio
+
+from mcp_redactionnel import retrieval
+from mcp_redactionnel.config import SourcesConfig
+from mcp_redactionnel.retrieval import (
+    PassageIndex,
+    rank_passages,
+    select_passages,
+    split_passages,
+    tokenize,
+)
+from mcp_redactionnel.sources import SourceDocument, SourceFetcher
+
+CORPUS = "\n".join(
+    [
+        "Le compostage transforme les déchets organiques en engrais.",
+        "La réparation des appareils électroniques prolonge leur durée de vie.",
+        "Les ressourceries donnent une seconde vie aux meubles et aux objets.",
+        "Le recyclage du verre se fait à l'infini sans perte de qualité.",
+    ]
+)
+
+
+def test_tokenize_folds_accents_and_drops_stopwords():
+    assert tokenize("L'Économie de la RÉPARATION, 2024") == ["economie", "reparation"]
+
+
+def test_split_passages_respects_size():
+    text = "Une phrase courte. " * 100
+    passages = split_passages(text.strip(), 200)
+    assert all(len(p) <= 200 for p in passages)
+    assert " ".join(passages).split() == text.split()
+
+
+def test_bm25_ranks_the_relevant_passage_first():
+    index = PassageIndex.build(CORPUS, 80)
+    assert len(index.passages) == 4
+    ranked = rank_passages([index], "Réparer et réparation des appareils")
+    assert index.passages[ranked[0][2]].startswith("La réparation")
+    assert rank_passages([index], "le la les") == []
+
+    other = PassageIndex.build("Le verre est recyclable. Le verre brille.", 80)
+    positions = select_passages([index, other], "recyclage du verre", 1000)
+    assert positions == [[3], [0]]
+    # A budget too small for the best passage keeps nothing bigger than it
+    assert select_passages([index, other], "recyclage du verre", 10) == [[], [0]]
+
+
+def test_index_round_trips_through_json():
+    index = PassageIndex.build(CORPUS, 120)
+    assert PassageIndex.from_json(index.to_json()) == index
+
+
+def test_passage_index_is_persisted_with_the_document(monkeypatch, tmp_path):
+    builds = []
+    build = PassageIndex.build.__func__
+    monkeypatch.setattr(
+        PassageIndex,
+        "build",
+        classmethod(lambda cls, *a: builds.append(a) or build(cls, *a)),
+    )
+    config = SourcesConfig(cache_path=str(tmp_path / "s.sqlite3"), passage_chars=80)
+    doc = SourceDocument("http://a.test", "Tri", CORPUS)
+
+    def render(query):
+        fetcher = SourceFetcher(config)
+        out = fetcher._render_ranked([doc.url], {doc.url: doc}, query)
+        fetcher.close()
+        return out
+
+    first = render("ressourceries meubles")
+    assert "[1] Tri — http://a.test\nLes ressourceries" in first
+    assert "compostage" not in first
+    # A new fetcher (e.g. after a restart) reads the stored index back
+    assert "recyclage du verre" in render("verre")
+    assert len(builds) == 1
+    # A new version of the page is indexed again
+    doc.text += "\nNouveau paragraphe sur le verre."
+    render("verre")
+    assert len(builds) == 2
+
+
+def test_ranked_sources_in_arender_fall_back_without_matches(tmp_path):
+    config = SourcesConfig(cache_path=None)
+    fetcher = SourceFetcher(config)
+    doc = SourceDocument("http://a.test", "", CORPUS)
+
+    async def fetch_all(urls):
+        return {doc.url: doc}
+
+    fetcher.fetch_all = fetch_all
+    out = asyncio.run(fetcher.arender([doc.url], "astronomie"))
+    assert out == "\n[1] http://a.test\n" + CORPUS
+    assert retrieval.estimate_tokens("abcd" * 10) == 10
@@ -0,0 +1,124 @@
+import asyncio
+
+import httpx
+import pytest
+
+from mcp_redactionnel.config import ProviderConfig, RetryPolicy, Settings
+from mcp_redactionnel.providers import BaseProvider, ProviderHTTPError
+from mcp_redactionnel.retry import backoff_delay, should_retry
+from mcp_redactionnel.service import aredaction, redaction, redaction_by_name
+
+
+class FlakyProvider(BaseProvider):
+    """Fails with `errors` (in order) before answering."""
+
+    def __init__(self, name, errors=(), max_attempts=1):
+        self.config = ProviderConfig(
+            type="generic",
+            endpoint=f"http://{name}",
+            retry=RetryPolicy(max_attempts=max_attempts, backoff_base=0),
+        )
+        self.name = name
+        self.errors = list(errors)
+        self.calls = 0
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return f"{self.name}:{kwargs.get('sujet')}"
+
+
+def test_should_retry_on_status_and_exception_names():
+    policy = RetryPolicy()
+    assert should_retry(policy, ProviderHTTPError("x", 503))
+    assert not should_retry(policy, ProviderHTTPError("x", 400))
+    # Subclasses of a listed httpx exception match too
+    assert should_retry(policy, httpx.ConnectTimeout("x"))
+    assert not should_retry(policy, ValueError("x"))
+
+
+def test_backoff_is_capped_and_honours_retry_after():
+    policy = RetryPolicy(backoff_base=1, backoff_max=4, jitter=0)
+    assert [backoff_delay(policy, n, ValueError()) for n in (1, 2, 3, 4)] == [
+        1,
+        2,
+        4,
+        4,
+    ]
+    exc = ProviderHTTPError("slow down", 429, retry_after=3)
+    assert backoff_delay(policy, 1, exc) == 3
+    jittered = RetryPolicy(backoff_base=1, jitter=1)
+    assert all(0 <= backoff_delay(jittered, 1, ValueError()) <= 1 for _ in range(20))
+
+
+def test_retry_then_success_reports_attempts():
+    p = FlakyProvider(
+        "a",
+        errors=[ProviderHTTPError("busy", 503), httpx.ReadTimeout("t")],
+        max_attempts=3,
+    )
+    info = {}
+    assert redaction(p, "Vélo", info=info) == "a:Vélo"
+    assert p.calls == 3
+    assert info == {"provider": "a", "attempts": 3, "cached": False}
+
+
+def test_non_retryable_error_is_not_retried():
+    p = FlakyProvider("a", errors=[ProviderHTTPError("bad", 400)], max_attempts=3)
+    with pytest.raises(ProviderHTTPError):
+        redaction(p, "Vélo")
+    assert p.calls == 1
+
+
+def test_chain_fails_over_to_next_provider():
+    first = FlakyProvider(
+        "a", errors=[ProviderHTTPError("down", 502)] * 2, max_attempts=2
+    )
+    second = FlakyProvider("b")
+    info = {}
+    out = asyncio.run(aredaction([first, second], "Vélo", info=info))
+    assert out == "b:Vélo"
+    assert (first.calls, second.calls) == (2, 1)
+    assert info == {"provider": "b", "attempts": 3, "cached": False}
+
+
+def test_chain_raises_last_error_when_all_fail():
+    first = FlakyProvider("a", errors=[ProviderHTTPError("bad", 400)])
+    second = FlakyProvider("b", errors=[ProviderHTTPError("down", 503)])
+    with pytest.raises(ProviderHTTPError) as e:
+        redaction([first, second], "Vélo")
+    assert e.value.status_code == 503
+
+
+def test_named_chain_is_resolved(monkeypatch, tmp_path):
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text(
+        "providers:\n"
+        "  a: {type: generic, endpoint: 'http://a'}\n"
+        "  b: {type: generic, endpoint: 'http://b'}\n"
+        "chains:\n"
+        "  redaction: [a, b]\n"
+    )
+    providers = {
+        "a": FlakyProvider("a", errors=[ProviderHTTPError("down", 503)]),
+        "b": FlakyProvider("b"),
+    }
+    monkeypatch.setattr(
+        "mcp_redactionnel.service.ProviderManager.get",
+        lambda self, name: providers[name],
+    )
+    info = {}
+    out = redaction_by_name("redaction", "Vélo", config_path=str(cfg), info=info)
+    assert out == "b:Vélo"
+    assert info["provider"] == "b"
+
+
+def test_invalid_chains_are_rejected():
+    base = "providers:\n  a: {type: generic, endpoint: 'http://a'}\n"
+    with pytest.raises(ValueError):
+        Settings.from_yaml(base + "chains:\n  c: [a, missing]\n")
+    with pytest.raises(ValueError):
+        Settings.from_yaml(base + "chains:\n  c: []\n")
+    with pytest.raises(ValueError):
+        Settings.from_yaml(base + "chains:\n  a: [a]\n")
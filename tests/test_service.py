@@ -1,4 +1,11 @@
-from mcp_redactionnel.service import mise_en_forme, redaction
+import asyncio
+
+from mcp_redactionnel.service import (
+    amise_en_forme,
+    aredaction,
+    mise_en_forme,
+    redaction,
+)
 
 
 class DummyProvider:
@@ -24,3 +31,13 @@ def test_mise_en_forme_basic():
         out == "GEN:Formate le texte suivant en HTML accessible: Bonjour"
         or out.startswith("GEN:")
     )
+
+
+def test_async_variants_accept_sync_only_providers():
+    p = DummyProvider()
+    out = asyncio.run(aredaction(p, "Le climat", format="html"))
+    assert out.startswith("GEN:")
+    assert p.calls[0][1]["format"] == "html"
+
+    out = asyncio.run(amise_en_forme(p, "Bonjour"))
+    assert out.startswith("GEN:")
@@ -0,0 +1,102 @@
+from fastapi.testclient import TestClient
+
+from mcp_redactionnel import api
+from mcp_redactionnel.service import redaction
+from mcp_redactionnel.similar import SimilarCache, normalize_sujet
+
+
+class CountingProvider:
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt, **kwargs):
+        self.calls += 1
+        return f"GEN{self.calls}"
+
+
+def test_normalized_variants_and_near_duplicates_match():
+    assert (
+        normalize_sujet("Qu'est-ce que l'économie  circulaire ?")
+        == normalize_sujet("qu'est ce que l'economie circulaire")
+        == "qu est ce que l economie circulaire"
+    )
+    cache = SimilarCache(threshold=0.8)
+    cache.set("b", "Qu'est-ce que l'économie circulaire ?", "article")
+    assert cache.get("b", "qu'est ce que l'economie circulaire") == ("article", 1.0)
+    # One typo: close enough, but not identical
+    result, score = cache.get("b", "Qu'est-ce que l'économie circulare ?")
+    assert result == "article" and 0.8 <= score < 1.0
+    assert cache.get("b", "Qu'est-ce que la biodiversité ?") is None
+    assert cache.get("other", "Qu'est-ce que l'économie circulaire ?") is None
+    assert cache.stats()["hits"] == 2 and cache.stats()["exact_hits"] == 1
+
+    # Close in shingles, but another year, place or a negation
+    cache.set("b", "Bilan des élections municipales de 2020 à Lyon", "2020")
+    for other in (
+        "Bilan des élections municipales de 2026 à Lyon",
+        "Bilan des élections municipales de 2020 à Lille",
+        "Bilan des élections non municipales de 2020 à Lyon",
+    ):
+        assert cache.get("b", other) is None
+    assert cache.get("b", "bilan des elections municipales de 2020 a Lyon") == (
+        "2020",
+        1.0,
+    )
+    assert cache.get("b", "Bilan des élections municipale de 2020 à Lyon")[0] == "2020"
+
+    small = SimilarCache(max_entries=1)
+    small.set("b", "Vélo", "1")
+    small.set("b", "Train", "2")
+    assert small.get("b", "vélo") is None
+    assert small.stats()["evictions"] == 1
+
+
+def test_redaction_serves_near_duplicates_per_bucket():
+    similar = SimilarCache()
+    p = CountingProvider()
+    assert redaction(p, "Économie circulaire", similar=similar) == "GEN1"
+    info = {}
+    assert redaction(p, "économie circulaire !", similar=similar, info=info) == "GEN1"
+    assert info == {"provider": None, "attempts": 0, "cached": True, "similarity": 1.0}
+    # Other meta or format: another bucket
+    assert redaction(p, "Économie circulaire", meta={"tone": "x"}, similar=similar) == (
+        "GEN2"
+    )
+    assert redaction(p, "Économie circulaire", format="html", similar=similar) == (
+        "GEN3"
+    )
+    # no_cache skips the lookup and refreshes the stored result
+    assert redaction(p, "Économie circulaire", similar=similar, no_cache=True) == (
+        "GEN4"
+    )
+    assert redaction(p, "economie circulaire", similar=similar) == "GEN4"
+    assert p.calls == 4
+
+
+def test_near_match_header(monkeypatch, tmp_path):
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text(
+        "cache:\n  similar:\n    enabled: true\n    threshold: 0.7\n"
+        "providers:\n  dummy:\n    type: generic\n    endpoint: 'http://x'\n"
+    )
+    p = CountingProvider()
+    monkeypatch.setattr(
+        "mcp_redactionnel.service.ProviderManager.get", lambda self, name: p
+    )
+    client = TestClient(api.app)
+
+    def post(sujet):
+        return client.post(
+            "/redaction",
+            params={"config": str(cfg)},
+            json={"provider": "dummy", "sujet": sujet},
+        )
+
+    first = post("Qu'est-ce que l'économie circulaire ?")
+    assert "X-Near-Match" not in first.headers
+    second = post("Qu'est-ce que l'économie circulaire exactement ?")
+    assert second.json()["result"] == "GEN1" and second.json()["cached"] is True
+    assert 0.7 <= float(second.headers["X-Near-Match"]) < 1.0
+    assert p.calls == 1
+    stats = client.get("/stats").json()["similar"][str(cfg.resolve())]
+    assert stats["hits"] == 1 and stats["entries"] == 1
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from mcp_redactionnel.service import aredaction, get_flights, redaction
+from mcp_redactionnel.singleflight import SingleFlight
+
+
+class GatedProvider:
+    """Blocks every generation until `release` is set."""
+
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def generate(self, prompt, **kwargs):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("HTTP 503")
+        return f"GEN{self.calls}"
+
+
+def test_concurrent_sync_calls_share_one_generation():
+    p = GatedProvider()
+    before = get_flights().stats()["deduplicated"]
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(redaction, p, "Même sujet") for _ in range(3)]
+        p.started.wait(5)
+        # Let the followers join the in-flight call before releasing it
+        while get_flights().stats()["deduplicated"] - before < 2:
+            time.sleep(0.001)
+        p.release.set()
+        results = [f.result() for f in futures]
+    assert results == ["GEN1"] * 3
+    assert p.calls == 1
+
+
+def test_async_callers_share_result_and_exception():
+    class AsyncProvider:
+        calls = 0
+
+        async def agenerate(self, prompt, **kwargs):
+            AsyncProvider.calls += 1
+            await asyncio.sleep(0.05)
+            if kwargs["sujet"] == "boom":
+                raise RuntimeError("HTTP 503")
+            return "OK"
+
+    async def run():
+        p = AsyncProvider()
+        ok = await asyncio.gather(*(aredaction(p, "a") for _ in range(4)))
+        errors = await asyncio.gather(
+            *(aredaction(p, "boom") for _ in range(2)), return_exceptions=True
+        )
+        return ok, errors
+
+    ok, errors = asyncio.run(run())
+    assert ok == ["OK"] * 4
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert AsyncProvider.calls == 2
+
+
+def test_async_follower_joins_sync_leader():
+    flights = SingleFlight()
+    p = GatedProvider(fail=True)
+
+    with ThreadPoolExecutor(1) as pool:
+        leader = pool.submit(flights.do, "k", lambda: p.generate("x"))
+        p.started.wait(5)
+
+        async def follow():
+            waiter = asyncio.ensure_future(flights.ado("k", _never_called))
+            await asyncio.sleep(0.01)
+            p.release.set()
+            return await waiter
+
+        with pytest.raises(RuntimeError, match="503"):
+            asyncio.run(follow())
+        with pytest.raises(RuntimeError):
+            leader.result()
+    assert flights.stats() == {"leaders": 1, "deduplicated": 1, "in_flight": 0}
+
+
+async def _never_called():
+    raise AssertionError("a follower must not run the call")
@@ -0,0 +1,318 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpcore
+import httpx
+import pytest
+from fastapi import FastAPI, Request, Response
+
+from mcp_redactionnel import outbound
+from mcp_redactionnel.config import SourcesConfig
+from mcp_redactionnel.outbound import BlockedURL, OutboundPolicy
+from mcp_redactionnel.service import SettingsRegistry, aredaction
+from mcp_redactionnel.sources import (
+    DocumentCache,
+    SourceDocument,
+    SourceFetcher,
+    extract_text,
+    render_sources,
+    trim,
+)
+
+PAGE = """<html><head><title>Le réemploi</title><style>p {}</style></head>
+<body><nav><a href="/">Accueil</a></nav>
+<article><h1>Le réemploi</h1><p>Réparer&nbsp;prolonge la vie des objets.</p>
+<p>Les ressourceries collectent et revendent.</p></article>
+<footer>Mentions légales</footer><script>track()</script></body></html>"""
+
+
+def _stand_in(delay: float = 0.0):
+    """Local site: `/page/<n>` pages with an ETag, counting requests."""
+    app = FastAPI()
+    app.state.full = 0
+    app.state.active = {}
+    app.state.peak = {}
+
+    @app.get("/page/{n}")
+    async def page(n: int, request: Request):
+        host = request.headers["host"]
+        active = app.state.active
+        active[host] = active.get(host, 0) + 1
+        app.state.peak[host] = max(app.state.peak.get(host, 0), active[host])
+        try:
+            await asyncio.sleep(delay)
+            etag = f'"v{n}"'
+            if request.headers.get("if-none-match") == etag:
+                return Response(status_code=304, headers={"ETag": etag})
+            app.state.full += 1
+            return Response(
+                PAGE.replace("Le réemploi", f"Le réemploi {n}"),
+                media_type="text/html; charset=utf-8",
+                headers={"ETag": etag},
+            )
+        finally:
+            active[host] -= 1
+
+    @app.get("/missing")
+    def missing():
+        return Response("nope", status_code=404)
+
+    return app
+
+
+def _fetcher(app, tmp_path, **cfg):
+    cfg.setdefault("allow_private", True)  # the stand-in hosts do not resolve
+    cfg.setdefault("cache_path", str(tmp_path / "sources.sqlite3"))
+    config = SourcesConfig(**cfg)
+    return SourceFetcher(config, transport=httpx.ASGITransport(app=app))
+
+
+def test_extract_text_keeps_the_article():
+    title, text = extract_text(PAGE)
+    assert title == "Le réemploi"
+    assert text == (
+        "Le réemploi\n"
+        "Réparer prolonge la vie des objets.\n"
+        "Les ressourceries collectent et revendent."
+    )
+
+
+def test_fetch_all_is_concurrent_and_bounded_per_host(tmp_path):
+    app = _stand_in(delay=0.1)
+    fetcher = _fetcher(app, tmp_path, per_host=2)
+    urls = [f"http://a.test/page/{n}" for n in range(4)] + [
+        f"http://b.test/page/{n}" for n in range(4)
+    ]
+
+    async def run():
+        start = time.perf_counter()
+        docs = await fetcher.fetch_all(urls)
+        await fetcher.aclose()
+        return docs, time.perf_counter() - start
+
+    docs, elapsed = asyncio.run(run())
+    assert [d.status for d in docs.values()] == ["fetched"] * 8
+    assert docs["http://a.test/page/3"].title == "Le réemploi 3"
+    assert app.state.peak == {"a.test": 2, "b.test": 2}
+    assert elapsed < 0.35  # 2 rounds per host, hosts in parallel (serial: 0.8 s)
+
+
+def test_cache_revalidates_with_etag(monkeypatch, tmp_path):
+    app = _stand_in()
+    url = "http://a.test/page/1"
+    # Every SQLite call runs off the loop's thread
+    calls = []
+    for name in ("__init__", "get", "touch", "put"):
+        method = getattr(DocumentCache, name)
+
+        def spy(self, *args, method=method, name=name):
+            calls.append((name, threading.get_ident()))
+            return method(self, *args)
+
+        monkeypatch.setattr(DocumentCache, name, spy)
+
+    async def fetch(**cfg):
+        fetcher = _fetcher(app, tmp_path, **cfg)
+        doc = await fetcher.fetch(url)
+        await fetcher.aclose()
+        fetcher.close()
+        return doc
+
+    assert asyncio.run(fetch()).status == "fetched"
+    assert asyncio.run(fetch()).status == "cached"  # fresh: no request
+    revalidated = asyncio.run(fetch(fresh_for=0))
+    assert revalidated.status == "revalidated"
+    assert "ressourceries" in revalidated.text
+    assert app.state.full == 1
+    assert {name for name, _ in calls} == {"__init__", "get", "touch", "put"}
+    assert threading.get_ident() not in {thread for _, thread in calls}
+
+
+def test_render_sources_shares_the_budget():
+    long = SourceDocument("http://a.test", "A", "Phrase longue. " * 200)
+    short = SourceDocument("http://b.test", "", "Court.")
+    failed = SourceDocument("http://c.test", status="error", error="HTTP 404")
+    documents = {d.url: d for d in (long, short, failed)}
+    out = render_sources(
+        ["http://a.test", "note libre", "http://b.test", "http://c.test"],
+        documents,
+        budget=300,
+    )
+    blocks = out.strip().split("\n\n")
+    assert blocks[0].startswith("[1] A — http://a.test\nPhrase longue.")
+    assert blocks[0].endswith("[…]")
+    assert len(blocks[0].split("\n", 1)[1]) <= 300 - len("Court.")
+    assert blocks[1] == "[2] note libre"
+    assert blocks[2] == "[3] http://b.test\nCourt."
+    assert blocks[3] == "[4] http://c.test (inaccessible : HTTP 404)"
+    assert trim("un deux trois", 9) == "un […]"
+
+
+def test_aredaction_puts_excerpts_in_the_prompt(tmp_path):
+    class Recorder:
+        prompt = None
+
+        def generate(self, prompt, **kwargs):
+            Recorder.prompt = prompt
+            return "ok"
+
+    fetcher = _fetcher(_stand_in(), tmp_path)
+    sources = ["http://a.test/page/7", "http://a.test/missing"]
+    assert asyncio.run(aredaction(Recorder(), "Réemploi", sources, fetcher=fetcher))
+    assert "[1] Le réemploi 7 — http://a.test/page/7" in Recorder.prompt
+    assert "Les ressourceries collectent" in Recorder.prompt
+    assert "[2] http://a.test/missing (inaccessible : HTTP 404)" in Recorder.prompt
+    assert str(sources) not in Recorder.prompt
+
+
+def test_document_cache_is_opened_by_the_first_fetch(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text("providers:\n  p:\n    type: generic\n    endpoint: 'http://x'\n")
+    fetcher = SettingsRegistry().fetcher(str(cfg))
+    assert fetcher is not None and fetcher.config.cache_path
+    assert not (tmp_path / ".cache").exists()
+
+    fetcher = _fetcher(_stand_in(), tmp_path)
+    assert not (tmp_path / "sources.sqlite3").exists()
+
+    async def run():
+        await fetcher.fetch("http://a.test/page/1")
+        await fetcher.aclose()
+
+    asyncio.run(run())
+    fetcher.close()
+    assert (tmp_path / "sources.sqlite3").exists()
+
+
+def test_outbound_policy_refuses_internal_addresses(monkeypatch):
+    async def resolve(host, port):
+        public = {"example.org": "93.184.216.34", "docs.example.org": "2606:4700::1"}
+        return [public.get(host, "10.0.0.5")]
+
+    monkeypatch.setattr(outbound, "resolve", resolve)
+    policy = OutboundPolicy()
+    for url in ("file:///etc/passwd", "ftp://example.org/", "http:///x"):
+        with pytest.raises(BlockedURL):
+            policy.check_url(url)
+
+    async def check(policy, url):
+        try:
+            await policy.acheck(url)
+        except BlockedURL as e:
+            return str(e)
+
+    assert asyncio.run(check(policy, "https://example.org/page")) is None
+    assert "10.0.0.5" in asyncio.run(check(policy, "http://intranet.test/"))
+    intranet = OutboundPolicy(allow_private=True)
+    assert asyncio.run(check(intranet, "http://intranet.test/")) is None
+
+    only = OutboundPolicy(["*.example.org"])
+    assert asyncio.run(check(only, "https://docs.example.org/a")) is None
+    assert asyncio.run(check(only, "https://example.org/")) == (
+        "host not allowed: example.org"
+    )
+
+    # Literal addresses are resolved for real
+    monkeypatch.undo()
+    for url in (
+        "http://127.0.0.1:8000/",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://[::1]/",
+        "http://localhost/",
+    ):
+        assert "non-public" in asyncio.run(check(policy, url))
+
+
+def test_connections_go_to_the_vetted_address(monkeypatch):
+    answers = {"rebind.test": [["93.184.216.34"], ["127.0.0.1"]]}
+
+    async def resolve(host, port):
+        # First answer public, then internal: a rebinding DNS server
+        return answers[host].pop(0) if len(answers[host]) > 1 else answers[host][0]
+
+    monkeypatch.setattr(outbound, "resolve", resolve)
+    policy = OutboundPolicy()
+
+    class Recorder(httpcore.AsyncMockBackend):
+        async def connect_tcp(self, host, port, *args, **kwargs):
+            hosts.append(host)
+            return await super().connect_tcp(host, port, *args, **kwargs)
+
+    hosts = []
+    answers["pinned.test"] = [["93.184.216.34"]]
+    backend = outbound._VettedBackend(policy, Recorder([b""]))
+    asyncio.run(backend.connect_tcp("pinned.test", 443))
+    assert hosts == ["93.184.216.34"]
+
+    async def get(url):
+        async with httpx.AsyncClient(
+            transport=policy.transport(),
+            event_hooks={"request": [policy.request_hook]},
+        ) as client:
+            await client.get(url)
+
+    # The hook saw the public address; the connection must not use the next
+    with pytest.raises(BlockedURL, match="127.0.0.1"):
+        asyncio.run(get("http://rebind.test/"))
+    assert OutboundPolicy(allow_private=True).transport() is None
+
+
+def test_redirects_to_internal_addresses_are_refused(monkeypatch, tmp_path):
+    async def resolve(host, port):
+        return ["93.184.216.34" if host == "public.test" else "169.254.169.254"]
+
+    monkeypatch.setattr(outbound, "resolve", resolve)
+    app = FastAPI()
+
+    @app.get("/go")
+    def go(to: str):
+        return Response(status_code=302, headers={"Location": to})
+
+    @app.get("/latest/meta-data/")
+    def metadata():
+        return Response("credentials", media_type="text/plain")
+
+    fetcher = _fetcher(app, tmp_path, allow_private=False)
+
+    async def fetch(url):
+        doc = await fetcher.fetch(url)
+        return doc.status, doc.error, doc.text
+
+    async def run():
+        try:
+            return [
+                await fetch("http://public.test/go?to=/latest/meta-data/"),
+                await fetch(
+                    "http://public.test/go?to=http://metadata.test/latest/meta-data/"
+                ),
+                await fetch("http://metadata.test/latest/meta-data/"),
+            ]
+        finally:
+            await fetcher.aclose()
+            fetcher.close()
+
+    same_host, redirected, direct = asyncio.run(run())
+    # Same public host: followed
+    assert same_host == ("fetched", None, "credentials")
+    for status, error, text in (redirected, direct):
+        assert status == "error" and text == ""
+        assert error.startswith("BlockedURL: metadata.test resolves to a non-public")
+
+
+def test_render_from_several_threads_at_once(tmp_path):
+    fetcher = _fetcher(_stand_in(delay=0.02), tmp_path, per_host=1, cache_path=None)
+
+    def render(n):
+        # Two pages of one host: the second waits for the host slot
+        return fetcher.render([f"http://a.test/page/{n}", f"http://a.test/page/{-n}"])
+
+    with ThreadPoolExecutor(8) as pool:
+        outs = list(pool.map(render, range(1, 17)))
+    for n, out in enumerate(outs, start=1):
+        assert f"[1] Le réemploi {n} — " in out
+        assert f"[2] Le réemploi {-n} — " in out
+    # Each call had its own client and host slots, closed with it
+    assert fetcher._pool is None
@@ -0,0 +1,25 @@
+from jinja2 import Template
+
+from mcp_redactionnel.templating import _Placeholders, compile_template
+
+
+def test_placeholder_templates_render_like_jinja():
+    source = '{"model": "m", "prompt": "{{ prompt }}", "x": "{{missing}}"}'
+    tpl = compile_template(source)
+    assert isinstance(tpl, _Placeholders)
+    kwargs = {"prompt": "Bonjour {{ sujet }}", "meta": None}
+    assert tpl.render(**kwargs) == Template(source).render(**kwargs)
+    assert compile_template("Sujet: {{ meta }}").render(meta=None) == "Sujet: None"
+
+
+def test_constant_and_jinja_fallback():
+    assert compile_template("application/json").render(x=1) == "application/json"
+    tpl = compile_template("{{ prompt | upper }}{% if meta %}!{% endif %}")
+    assert tpl.render(prompt="ok", meta=True) == "OK!"
+
+
+def test_prompt_values_are_not_reinterpreted():
+    # With chained str.replace, a sujet containing "{{ sources }}" was expanded
+    tpl = compile_template("Sujet: {{ sujet }} / Sources: {{ sources }}\n")
+    out = tpl.render(sujet="{{ sources }}", sources="[]")
+    assert out == "Sujet: {{ sources }} / Sources: []\n"
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from fastapi.testclient import TestClient
+
+from mcp_redactionnel import api
+from mcp_redactionnel.config import ProviderConfig
+from mcp_redactionnel.providers import GenericHTTPProvider, OllamaProvider
+from mcp_redactionnel.service import _prompt_templates, awarm_up, get_registry
+
+CONFIG = """
+providers:
+  local:
+    type: ollama
+    endpoint: 'http://ollama.test/api/generate'
+    body_template: '{"model": "mistral", "prompt": "{{ prompt }}"}'
+    keep_alive: -1
+  remote:
+    type: generic
+    endpoint: 'http://down.test/generate'
+"""
+
+
+def _backends(monkeypatch, delay: float = 0.0):
+    """Route every provider client to a local handler recording requests."""
+    seen = []
+
+    async def handler(request: httpx.Request):
+        await asyncio.sleep(delay)
+        if request.url.host == "down.test":
+            raise httpx.ConnectError("refused", request=request)
+        seen.append((request.method, request.url.path, request.content))
+        return httpx.Response(200, json={"model": "mistral", "done": True})
+
+    kwargs = GenericHTTPProvider._client_kwargs
+    monkeypatch.setattr(
+        GenericHTTPProvider,
+        "_client_kwargs",
+        lambda self: {**kwargs(self), "transport": httpx.MockTransport(handler)},
+    )
+    return seen
+
+
+def test_ollama_warm_up_loads_the_model_and_keeps_it(monkeypatch):
+    seen = _backends(monkeypatch)
+    prov = OllamaProvider(
+        ProviderConfig(
+            type="ollama",
+            endpoint="http://ollama.test/api/generate",
+            body_template='{"model": "mistral", "prompt": "{{ prompt }}"}',
+            keep_alive="30m",
+        )
+    )
+    assert prov._build_request("Bonjour")["json"]["keep_alive"] == "30m"
+
+    async def run():
+        try:
+            return await prov.awarm(), await prov.awarm(models=False)
+        finally:
+            await prov.aclose()
+
+    assert asyncio.run(run()) == (True, True)
+    load, probe = seen
+    assert load[:2] == ("POST", "/api/generate")
+    assert json.loads(load[2]) == {"model": "mistral", "keep_alive": "30m"}
+    assert probe[:2] == ("GET", "/api/version")
+
+
+def test_awarm_up_reports_each_provider(monkeypatch, tmp_path):
+    seen = _backends(monkeypatch)
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text(CONFIG)
+    _prompt_templates.clear()
+
+    async def run():
+        try:
+            return await awarm_up(str(cfg))
+        finally:
+            await get_registry().aclose()
+
+    report = asyncio.run(run())
+    assert report["providers"]["local"]["ok"] is True
+    assert report["providers"]["remote"]["ok"] is False
+    assert "ConnectError" in report["providers"]["remote"]["error"]
+    assert json.loads(seen[0][2]) == {"model": "mistral", "keep_alive": -1}
+    assert len(_prompt_templates) == 4  # redaction text/html, mise en forme x2
+
+
+def test_ready_flips_once_warm_up_is_done(monkeypatch, tmp_path):
+    _backends(monkeypatch, delay=0.3)
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config.yaml").write_text(CONFIG + "jobs:\n  enabled: false\n")
+
+    with TestClient(api.app) as client:
+        first = client.get("/ready")
+        assert first.status_code == 503 and first.json()["ready"] is False
+        deadline = time.monotonic() + 3
+        while client.get("/ready").status_code != 200:
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+        warmup = client.get("/ready").json()["warmup"]
+        assert warmup["providers"]["local"]["ok"] is True
+
+    # A default config that is invalid from the start keeps the service unready
+    broken = tmp_path / "broken"
+    broken.mkdir()
+    (broken / "config.yaml").write_text("providers:\n  broken: {type: generic}\n")
+    monkeypatch.chdir(broken)
+    with TestClient(api.app) as client:
+        deadline = time.monotonic() + 3
+        while client.get("/ready").json()["warmup"] is None:
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+        r = client.get("/ready")
+        assert r.status_code == 503
+        assert "ValidationError" in r.json()["warmup"]["error"]
+
+
+def test_cli_does_not_import_server_modules(tmp_path):
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text(CONFIG)
+    script = Path(__file__).parent.parent / "scripts" / "redact.py"
+    check = (
+        "import runpy, sys\n"
+        f"sys.argv = ['redact.py', '--list', '-c', {str(cfg)!r}]\n"
+        "try:\n"
+        f"    runpy.run_path({str(script)!r}, run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "import mcp_redactionnel.batch\n"
+        "server = ('fastapi', 'starlette', 'uvicorn', 'mcp_redactionnel.api',\n"
+        "          'mcp_redactionnel.jobs')\n"
+        "print(sorted(m for m in server if m in sys.modules))\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", check], capture_output=True, text=True, check=True
+    ).stdout
+    assert out.splitlines() == ["Providers: local, remote", "[]"]